@@ -10,9 +10,11 @@ import {
   orderBy,
   serverTimestamp,
   updateDoc,
-  getDoc
+  getDoc,
+  setDoc
 } from 'firebase/firestore';
 import { StructuredDocument } from '../types/document';
+import { ShardedPresentation } from '../lib/pptxApi';
 
 export interface Template {
   id?: string;
@@ -396,4 +398,67 @@ export const getStructuredTemplates = async (): Promise<Template[]> => {
     console.log('=== FIREBASE GET STRUCTURED TEMPLATES FAILED ===');
     return [];
   }
-}; 
\ No newline at end of file
+}; 
+
+// Upload a sharded presentation: the manifest goes on the template document,
+// slides and media chunks into its 'slides' and 'media' subcollections
+export const uploadShardedTemplate = async (
+  templateData: TemplateUploadData,
+  presentation: ShardedPresentation
+): Promise<string | null> => {
+  try {
+    const { originalFile, ...uploadData } = templateData;
+
+    const docRef = await addDoc(collection(db, 'templates'), {
+      ...uploadData,
+      documentType: 'structured',
+      layout: presentation.layout,
+      manifest: presentation.manifest,
+      version: 1,
+      uploadedAt: serverTimestamp(),
+      lastEdited: serverTimestamp(),
+      status: 'active'
+    });
+
+    // Written one document per request: a batch commit is capped at 10 MB
+    await Promise.all([
+      ...presentation.slides.map(({ doc: id, ...slide }) =>
+        setDoc(doc(db, 'templates', docRef.id, 'slides', id), slide)),
+      ...presentation.media.map(({ doc: id, ...chunk }) =>
+        setDoc(doc(db, 'templates', docRef.id, 'media', id), chunk)),
+    ]);
+
+    console.log('Firebase: Sharded template added with ID:', docRef.id);
+    return docRef.id;
+  } catch (error) {
+    console.error('Firebase: Error uploading sharded template:', error);
+    return null;
+  }
+};
+
+// Load one slide of a sharded template, joining its parts and resolving media
+export const getTemplateSlide = async (
+  templateId: string,
+  manifest: ShardedPresentation['manifest'],
+  index: number
+): Promise<any | null> => {
+  try {
+    const entry = manifest.slides[index];
+    const partIds = Array.from({ length: entry.parts }, (_, part) => part ? `${entry.doc}-p${part}` : entry.doc);
+    const parts = await Promise.all(partIds.map((id) => getDoc(doc(db, 'templates', templateId, 'slides', id))));
+    const slide = { ...parts[0].data()?.slide, elements: parts.flatMap((part) => part.data()?.slide.elements || []) };
+
+    await Promise.all(slide.elements.map(async (element: any) => {
+      if (!element.src?.startsWith('media:')) return;
+      const media = manifest.media.find((item) => item.id === element.src.slice('media:'.length));
+      if (!media) return;
+      const chunks = await Promise.all(Array.from({ length: media.parts }, (_, part) =>
+        getDoc(doc(db, 'templates', templateId, 'media', `${media.id}-${part}`))));
+      element.src = `data:${media.type};base64,${chunks.map((chunk) => chunk.data()?.data || '').join('')}`;
+    }));
+    return slide;
+  } catch (error) {
+    console.error('Firebase: Error loading template slide:', error);
+    return null;
+  }
+};
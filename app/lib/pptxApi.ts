@@ -14,6 +14,8 @@ export interface ParsedPresentation {
     presentation_width?: number;
     presentation_height?: number;
   };
+  // Picture backgrounds, rendered at slide size and shared by the slides using them
+  backgrounds?: { id: string; src: string; width: number; height: number }[];
 }
 
 export interface ParsedSlide {
@@ -22,11 +24,13 @@ export interface ParsedSlide {
   content: string;
   elements: SlideElement[];
   background: string;
+  backgroundImage?: string; // id in ParsedPresentation.backgrounds
+  thumbnail?: string; // WebP URL, with ?thumbnails=1
 }
 
 export interface SlideElement {
   id: string;
-  type: 'text' | 'image' | 'shape';
+  type: 'text' | 'image' | 'shape' | 'table' | 'chart';
   x: number;
   y: number;
   width: number;
@@ -37,6 +41,11 @@ export interface SlideElement {
   fontWeight?: string;
   color?: string;
   textAlign?: string;
+  // Text formatted unlike its first run: [character count, spanStyles index] runs
+  // over content, each span style holding only what differs from the element
+  spans?: [number, number][];
+  spanStyles?: (Partial<Pick<SlideElement, 'fontSize' | 'fontFamily' | 'fontWeight' | 'color'>> & { underline?: boolean })[];
+  paragraphs?: [number, { level?: number; align?: string; bullet?: string }][];
   src?: string;
   imageUrl?: string;
   alt?: string;
@@ -44,6 +53,24 @@ export interface SlideElement {
   fillColor?: string;
   strokeColor?: string;
   strokeWidth?: number;
+  // Tables: px column widths and row heights, row-major cell text, merged cells as
+  // [row, column, rowSpan, columnSpan], and [cell count, cellStyles index] runs
+  columns?: number[];
+  rows?: number[];
+  cells?: string[];
+  merges?: [number, number, number, number][];
+  cellStyles?: (Partial<Pick<SlideElement, 'fontSize' | 'fontFamily' | 'fontWeight' | 'color' | 'textAlign'>>
+    & { fill?: string; underline?: boolean; verticalAlign?: 'top' | 'middle' | 'bottom' })[];
+  styleRuns?: [number, number][];
+  header?: boolean;
+  banded?: boolean;
+  // Charts, from the values cached in the chart part; null marks a gap
+  chartType?: string;
+  title?: string | null;
+  categories?: (string | null)[];
+  series?: { name: string | null; values: (number | null)[]; x?: (number | null)[]; color?: string; chartType?: string }[];
+  grouping?: string;
+  legend?: boolean;
 }
 
 export async function parsePptxFile(file: File): Promise<ParsedPresentation> {
@@ -80,12 +107,201 @@ export async function checkBackendHealth(): Promise<boolean> {
   }
 }
 
+export interface BatchFileResult {
+  index: number;
+  name: string;
+  status: 'ok' | 'error';
+  result?: ParsedPresentation;
+  code?: number;
+  error?: string;
+}
+
+// Parse many decks in one request. Results arrive as each deck finishes; shared
+// media is sent once per batch and resolved back into image sources here.
+export async function parsePptxBatch(
+  files: File[],
+  onResult: (result: BatchFileResult) => void
+): Promise<void> {
+  const formData = new FormData();
+  files.forEach((file) => formData.append('files', file));
+
+  const response = await fetch(`${BACKEND_URL}/api/parse-pptx-batch`, {
+    method: 'POST',
+    body: formData,
+  });
+
+  if (!response.ok || !response.body) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.error || `HTTP ${response.status}: ${response.statusText}`);
+  }
+
+  const media = new Map<string, string>();
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+
+  const resolve = (src: string) =>
+    src.startsWith('media:') ? media.get(src.slice('media:'.length)) : src;
+
+  const handleLine = (line: string) => {
+    if (!line.trim()) return;
+    const record = JSON.parse(line);
+    if (record.type === 'media') {
+      media.set(record.id, record.src);
+    } else if (record.type === 'file') {
+      record.result?.slides.forEach((slide: ParsedSlide) => {
+        slide.elements.forEach((element) => {
+          if (element.src) element.src = resolve(element.src);
+        });
+      });
+      // Picture backgrounds are externalized the same way
+      record.result?.backgrounds?.forEach((background: { src: string }) => {
+        background.src = resolve(background.src) ?? background.src;
+      });
+      onResult(record);
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split('\n');
+    buffered = lines.pop() || '';
+    lines.forEach(handleLine);
+  }
+  handleLine(buffered);
+}
+
+export interface ShardedPresentation {
+  layout: 'sharded/1';
+  manifest: Omit<ParsedPresentation, 'slides'> & {
+    slides: { doc: string; parts: number; ids: string[] }[];
+    media: { id: string; type: string; bytes: number; parts: number }[];
+  };
+  slides: { doc: string; index: number; part: number; slide: Partial<ParsedSlide> & { elements: SlideElement[] } }[];
+  media: { doc: string; media: string; part: number; data: string }[];
+}
+
+// Parse a deck into Firestore-sized documents: a manifest, one document per
+// slide and base64 media chunks (image sources are "media:<id>" references)
+export async function parsePptxSharded(file: File): Promise<ShardedPresentation> {
+  const formData = new FormData();
+  formData.append('file', file);
+
+  const response = await fetch(`${BACKEND_URL}/api/parse-pptx?layout=sharded`, {
+    method: 'POST',
+    body: formData,
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.error || `HTTP ${response.status}: ${response.statusText}`);
+  }
+  return response.json();
+}
+
+export interface ParseDiff {
+  slides: { count: number; previous_count: number; changed: ({ slide: number } & Partial<ParsedSlide>)[] };
+  added: { slide: number; element: SlideElement }[];
+  removed: { slide: number; id: string }[];
+  changed: { slide: number; previous_slide?: number; previous: string; element: SlideElement }[];
+  order: { slide: number; ids: string[] }[];
+  backgrounds: NonNullable<ParsedPresentation['backgrounds']>;
+  unchanged: number;
+}
+
+// Re-import a deck as a patch against a previous parse (or sharded manifest)
+export async function diffPptxFile(
+  file: File,
+  previous: ParsedPresentation | ShardedPresentation | ShardedPresentation['manifest']
+): Promise<ParseDiff> {
+  const formData = new FormData();
+  formData.append('file', file);
+  formData.append('previous', new Blob([JSON.stringify(previous)], { type: 'application/json' }), 'previous.json');
+
+  const response = await fetch(`${BACKEND_URL}/api/parse-pptx-diff`, {
+    method: 'POST',
+    body: formData,
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.error || `HTTP ${response.status}: ${response.statusText}`);
+  }
+  return response.json();
+}
+
+// Server-rendered WebP thumbnail of one slide (cached by slide content), as an object URL
+export async function renderSlideThumbnail(
+  presentation: ParsedPresentation,
+  slide: ParsedSlide,
+  width?: number
+): Promise<string> {
+  const response = await fetch(`${BACKEND_URL}/api/slide-thumbnail`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      slide,
+      backgrounds: presentation.backgrounds?.filter((background) => background.id === slide.backgroundImage),
+      slide_width: presentation.metadata.slide_width,
+      slide_height: presentation.metadata.slide_height,
+      width,
+    }),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.error || `HTTP ${response.status}: ${response.statusText}`);
+  }
+  return URL.createObjectURL(await response.blob());
+}
+
+// Export a parsed presentation (full, compact or sharded) back to a PPTX file
+export async function exportPresentationPptx(presentation: ParsedPresentation | ShardedPresentation): Promise<Blob> {
+  const response = await fetch(`${BACKEND_URL}/api/export-pptx`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(presentation),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.error || `HTTP ${response.status}: ${response.statusText}`);
+  }
+  return response.blob();
+}
+
+// Apply a ParseDiff to a full parsed presentation, returning the updated copy
+export function applyParseDiff(presentation: ParsedPresentation, diff: ParseDiff): ParsedPresentation {
+  const slides = presentation.slides.slice(0, diff.slides.count).map((slide) => ({ ...slide, elements: [...slide.elements] }));
+  const slideChanges = new Map(diff.slides.changed.map(({ slide, ...fields }) => [slide, fields]));
+  while (slides.length < diff.slides.count) {
+    // Appended slides come with all their properties in slides.changed
+    slides.push({ content: '', ...slideChanges.get(slides.length), elements: [] } as ParsedSlide);
+  }
+  slideChanges.forEach((fields, slide) => Object.assign(slides[slide], fields));
+
+  const dropped = new Set([...diff.removed.map((entry) => entry.id), ...diff.changed.map((entry) => entry.previous)]);
+  slides.forEach((slide) => { slide.elements = slide.elements.filter((element) => !dropped.has(element.id)); });
+  [...diff.changed, ...diff.added].forEach(({ slide, element }) => slides[slide].elements.push(element));
+
+  diff.order.forEach(({ slide, ids }) => {
+    const byId = new Map(slides[slide].elements.map((element) => [element.id, element]));
+    slides[slide].elements = ids.map((id) => byId.get(id)).filter((element): element is SlideElement => !!element);
+  });
+  const backgrounds = [...(presentation.backgrounds || []), ...diff.backgrounds];
+  return { ...presentation, slides, backgrounds };
+}
+
 // Convert parsed presentation to editor format
 export function convertToEditorFormat(parsedPresentation: ParsedPresentation) {
   console.log('🔄 Converting to editor format:', parsedPresentation);
   
+  const backgroundSources = new Map((parsedPresentation.backgrounds || []).map((background) => [background.id, background.src]));
   const slides = parsedPresentation.slides.map((slide) => {
     console.log('📄 Processing slide:', slide.id);
+    const sharedBackground = slide.backgroundImage ? backgroundSources.get(slide.backgroundImage) : undefined;
     const elements = slide.elements.map((element) => {
       console.log('🎯 Processing element:', element.type, element);
       
@@ -221,8 +437,9 @@ export function convertToEditorFormat(parsedPresentation: ParsedPresentation) {
       elements,
       backgroundColor: slide.background || slide.backgroundColor || '#ffffff',
       // Preserve slide-level properties
-      backgroundImage: slide.backgroundImage || null,
-      backgroundSize: slide.backgroundSize || 'cover',
+      backgroundImage: sharedBackground || slide.backgroundImage || null,
+      // Picture backgrounds stretch over the slide
+      backgroundSize: sharedBackground ? '100% 100%' : slide.backgroundSize || 'cover',
       backgroundPosition: slide.backgroundPosition || 'center',
       // Add slide-level animations if present
       slideAnimation: slide.slideAnimation || null,
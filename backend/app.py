@@ -1,26 +1,107 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Request, Response, redirect, request, jsonify, send_from_directory
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 from pptx import Presentation
 import base64
 import tempfile
 import os
 import zipfile
 import xml.etree.ElementTree as ET
-import json
+import functools
+import gc
+import logging
+import time
 from io import BytesIO
 from PIL import Image
 
-app = Flask(__name__)
-CORS(app)
+from parser_logging import configure_logging, get_logger
+from parser_stages import stage
+from memory_budget import MemoryBudget, MemoryBudgetExceeded
+from media_guard import MediaGuard, UnsafeDeckError, jpeg_draft_size
+from batch_import import collect_batch, stream_batch
+from element_ids import element_id, media_element_id, seal_ids
+from group_shapes import flatten, place
+from placeholders import PlaceholderResolver
+from rich_text import rich_text
+from tables import table_element, table_fields
+from charts import chart_fields
+from backgrounds import BackgroundResolver, background_media
+from pptx_export import PPTX_MIMETYPE, stream_pptx
+from thumbnails import (MAX_THUMBNAIL_HEIGHT, MAX_THUMBNAIL_WIDTH, THUMBNAIL_MIME, THUMBNAIL_WIDTH, ThumbnailRenderer,
+                        attach_thumbnails, thumbnail_height)
+from theme_colors import ThemeResolver, solid_fill
+import compact_schema
+import firestore_shards
+import parse_diff
+import serializer
+from http_caching import (MEDIA_MAX_AGE, compress_response, etag_matches, make_etag, precondition_failed,
+                          upload_digest)
+from media_storage import MEDIA_DIR, get_media_store, offload_media
+from media_similarity import default_index as near_duplicate_index
+from binary_transport import JSON_MIMETYPE, binary_media, binary_response, media_source, negotiate
 
-def compress_image(image_data, max_size_kb=100, quality=85):
+# Bump whenever the parser's output changes; part of every parse result ETag
+PARSER_VERSION = '14'
+
+# Uploads up to this size stay in memory; larger ones spill to an anonymous temp file
+UPLOAD_SPOOL_MB = float(os.environ.get('PPTX_UPLOAD_SPOOL_MB', '16'))
+# Hard cap on request size, enforced while the body is being read
+MAX_UPLOAD_MB = float(os.environ.get('PPTX_MAX_UPLOAD_MB', '200'))
+# Batch imports carry many decks per request and get their own cap
+MAX_BATCH_UPLOAD_MB = float(os.environ.get('PPTX_MAX_BATCH_UPLOAD_MB', '1024'))
+
+class SpooledUploadRequest(Request):
+    """Request that receives file uploads straight into a SpooledTemporaryFile"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=int(UPLOAD_SPOOL_MB * 1024 * 1024), mode='w+b')
+
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'api.parse_pptx_batch':
+            return int(MAX_BATCH_UPLOAD_MB * 1024 * 1024)
+        return super().max_content_length
+
+# Routes live on a blueprint so create_app() can build as many app instances as needed
+api = Blueprint('api', __name__)
+
+configure_logging()
+log = get_logger('parse')
+api_log = get_logger('api')
+extract_log = get_logger('extract')
+compress_log = get_logger('compress')
+map_log = get_logger('map')
+slides_log = get_logger('slides')
+optimize_log = get_logger('optimize')
+
+# Bounded-memory import mode: cap what a single parse may hold, in MB (0 = unbounded)
+MEMORY_CEILING_MB = float(os.environ.get('PPTX_MEMORY_CEILING_MB', '0'))
+
+# Grey "Image" box used where a picture shape's image couldn't be found
+PLACEHOLDER_IMAGE_SVG = (
+    b'<svg width="200" height="150" xmlns="http://www.w3.org/2000/svg">'
+    b'<rect width="100%" height="100%" fill="#ddd"/>'
+    b'<text x="50%" y="50%" font-family="Arial" font-size="14" fill="#999" text-anchor="middle" dy=".3em">Image</text>'
+    b'</svg>'
+)
+
+def compress_image(image_data, max_size_kb=100, quality=85, max_pixels=None):
     """
-    Compress image data to reduce size for Firebase storage
+    Compress image data to reduce size for Firebase storage.
+    With max_pixels set, JPEGs are decoded at a reduced scale (draft mode) so
+    the decoded frame stays under that many pixels.
     """
     try:
         # Open image from bytes
         image = Image.open(BytesIO(image_data))
         
+        downscaled = False
+        if max_pixels and image.width * image.height > max_pixels:
+            draft_size = jpeg_draft_size(image.width, image.height, max_pixels)
+            if draft_size and image.format == 'JPEG':
+                image.draft('RGB', draft_size)
+                downscaled = True
+        
         # Convert to RGB if necessary (for JPEG)
         if image.mode in ('RGBA', 'LA', 'P'):
             # Create white background for transparent images
@@ -34,7 +115,7 @@ def compress_image(image_data, max_size_kb=100, quality=85):
         
         # Calculate target size
         original_size_kb = len(image_data) / 1024
-        if original_size_kb <= max_size_kb:
+        if original_size_kb <= max_size_kb and not downscaled:
             return image_data, original_size_kb
         
         # Compress with quality adjustment
@@ -48,7 +129,7 @@ def compress_image(image_data, max_size_kb=100, quality=85):
             compressed_size_kb = len(output.getvalue()) / 1024
             
             if compressed_size_kb <= max_size_kb:
-                print(f"✅ Compressed image: {original_size_kb:.1f}KB → {compressed_size_kb:.1f}KB (quality: {current_quality})")
+                compress_log.debug("Compressed image: %.1fKB → %.1fKB (quality: %s)", original_size_kb, compressed_size_kb, current_quality)
                 return output.getvalue(), compressed_size_kb
             
             current_quality -= 10
@@ -64,30 +145,34 @@ def compress_image(image_data, max_size_kb=100, quality=85):
             output.truncate(0)
             image.save(output, format='JPEG', quality=70, optimize=True)
             final_size_kb = len(output.getvalue()) / 1024
-            print(f"✅ Resized and compressed image: {original_size_kb:.1f}KB → {final_size_kb:.1f}KB")
+            compress_log.debug("Resized and compressed image: %.1fKB → %.1fKB", original_size_kb, final_size_kb)
             return output.getvalue(), final_size_kb
         
         return output.getvalue(), compressed_size_kb
         
     except Exception as e:
-        print(f"❌ Error compressing image: {e}")
+        compress_log.warning("Error compressing image: %s", e)
         return image_data, len(image_data) / 1024
 
-def optimize_content_for_firebase(content, max_size_mb=1.5):
+def json_size(content, streaming=False):
+    """Encoded size of content in bytes (see serializer.size)"""
+    return serializer.size(content, streaming)
+
+def optimize_content_for_firebase(content, max_size_mb=1.5, streaming=False):
     """
     Optimize content size to fit within Firebase's 1MB limit
     """
     try:
         # Convert to JSON to get size
-        json_str = json.dumps(content)
-        current_size_mb = len(json_str) / (1024 * 1024)
+        current_size = json_size(content, streaming)
+        current_size_mb = current_size / (1024 * 1024)
         
-        print(f"📊 Content size: {current_size_mb:.2f} MB")
+        optimize_log.info("Content size: %.2f MB", current_size_mb)
         
         if current_size_mb <= max_size_mb:
             return content, current_size_mb
         
-        print(f"⚠️ Content too large ({current_size_mb:.2f} MB), optimizing...")
+        optimize_log.warning("Content too large (%.2f MB), optimizing...", current_size_mb)
         
         # If too large, try to reduce image quality more gradually
         if 'slides' in content:
@@ -97,7 +182,7 @@ def optimize_content_for_firebase(content, max_size_mb=1.5):
                         if element.get('type') == 'image' and 'src' in element:
                             # Extract base64 data
                             src = element['src']
-                            if src.startswith('data:image/jpeg;base64,'):
+                            if isinstance(src, str) and src.startswith('data:image/jpeg;base64,'):
                                 base64_data = src.split(',')[1]
                                 try:
                                     # Decode, compress more aggressively, re-encode
@@ -106,32 +191,33 @@ def optimize_content_for_firebase(content, max_size_mb=1.5):
                                     compressed_data, _ = compress_image(image_data, max_size_kb=100, quality=70)
                                     new_base64 = base64.b64encode(compressed_data).decode('utf-8')
                                     element['src'] = f"data:image/jpeg;base64,{new_base64}"
-                                    print(f"🔄 Further compressed image: {len(image_data)/1024:.1f}KB → {len(compressed_data)/1024:.1f}KB")
+                                    # Data URLs need no escaping, so the encoded size changes by exactly this much
+                                    current_size += len(element['src']) - len(src)
+                                    optimize_log.debug("Further compressed image: %.1fKB → %.1fKB", len(image_data)/1024, len(compressed_data)/1024)
                                 except Exception as e:
-                                    print(f"❌ Error re-compressing image: {e}")
+                                    optimize_log.warning("Error re-compressing image: %s", e)
         
         # Check final size
-        final_json = json.dumps(content)
-        final_size_mb = len(final_json) / (1024 * 1024)
-        print(f"✅ Optimized size: {final_size_mb:.2f} MB")
+        final_size_mb = current_size / (1024 * 1024)
+        optimize_log.info("Optimized size: %.2f MB", final_size_mb)
         
         return content, final_size_mb
         
     except Exception as e:
-        print(f"❌ Error optimizing content: {e}")
-        return content, len(json.dumps(content)) / (1024 * 1024)
+        optimize_log.error("Error optimizing content: %s", e)
+        return content, json_size(content, streaming) / (1024 * 1024)
 
 def map_zip_images_to_slides(pptx_path, images):
     """
     Map ZIP-extracted images to their correct slide positions by analyzing slide XML
     """
     try:
-        print(f"🔍 Mapping {len(images)} images to slide positions...")
+        map_log.info("Mapping %s images to slide positions...", len(images))
         
         with zipfile.ZipFile(pptx_path, 'r') as zip_file:
             # Get all slide files
             slide_files = [f for f in zip_file.namelist() if f.startswith('ppt/slides/slide') and f.endswith('.xml')]
-            print(f"📄 Found {len(slide_files)} slide XML files")
+            map_log.debug("Found %s slide XML files", len(slide_files))
             
             # Create a mapping of media files to their usage in slides
             media_to_slides = {}
@@ -159,7 +245,7 @@ def map_zip_images_to_slides(pptx_path, images):
                                     if media_ref not in media_to_slides:
                                         media_to_slides[media_ref] = []
                                     media_to_slides[media_ref].append(slide_num)
-                                    print(f"🔗 Found image reference in slide {slide_num}: {media_ref}")
+                                    map_log.debug("Found image reference in slide %s: %s", slide_num, media_ref)
                         
                         # Check for picture elements with position info
                         elif elem.tag.endswith('}pic'):
@@ -209,16 +295,16 @@ def map_zip_images_to_slides(pptx_path, images):
                                     img['y'] = max(y, 50) if y > 0 else 100
                                     img['width'] = max(width, 100) if width > 0 else 200  # Default size if not found
                                     img['height'] = max(height, 100) if height > 0 else 150
-                                    print(f"✅ Mapped image to slide {slide_num}: pos({img['x']},{img['y']}) size({img['width']}x{img['height']})")
+                                    map_log.debug("Mapped image to slide %s: pos(%s,%s) size(%sx%s)", slide_num, img['x'], img['y'], img['width'], img['height'])
                                     break
                                     
                 except Exception as e:
-                    print(f"❌ Error parsing slide XML {slide_file}: {e}")
+                    map_log.warning("Error parsing slide XML %s: %s", slide_file, e)
         
         # For any unmapped images, distribute them across slides
         unmapped_images = [img for img in images if img.get('slide_index') == -1]
         if unmapped_images:
-            print(f"⚠️ {len(unmapped_images)} images still unmapped, distributing across slides...")
+            map_log.info("%s images still unmapped, distributing across slides...", len(unmapped_images))
             slides_count = len([f for f in zipfile.ZipFile(pptx_path, 'r').namelist() if f.startswith('ppt/slides/slide') and f.endswith('.xml')])
             
             for i, img in enumerate(unmapped_images):
@@ -228,13 +314,13 @@ def map_zip_images_to_slides(pptx_path, images):
                 img['y'] = 100 + (i * 30) % 200  # Spread vertically
                 img['width'] = 200
                 img['height'] = 150
-                print(f"📍 Distributed unmapped image to slide {slide_num}: pos({img['x']},{img['y']})")
+                map_log.debug("Distributed unmapped image to slide %s: pos(%s,%s)", slide_num, img['x'], img['y'])
         
-        print(f"✅ Successfully mapped {len(images)} images to slide positions")
+        map_log.info("Successfully mapped %s images to slide positions", len(images))
         return images
         
     except Exception as e:
-        print(f"❌ Error mapping images to slides: {e}")
+        map_log.error("Error mapping images to slides: %s", e)
         return images
 
 def map_zip_images_to_slides_with_pptx(pptx_path, images, prs):
@@ -243,17 +329,17 @@ def map_zip_images_to_slides_with_pptx(pptx_path, images, prs):
     This gives us accurate dimensions and positions from the actual slide shapes
     """
     try:
-        print(f"🔍 Mapping {len(images)} images using python-pptx for accurate dimensions...")
+        map_log.info("Mapping %s images using python-pptx for accurate dimensions...", len(images))
         
         # Create a list to track which images have been mapped
         mapped_images = []
         image_counter = 0
         
         for slide_num, slide in enumerate(prs.slides):
-            print(f"📄 Processing slide {slide_num + 1} with {len(slide.shapes)} shapes...")
+            map_log.debug("Processing slide %s with %s shapes...", slide_num + 1, len(slide.shapes))
             
-            # Look for image shapes in this slide
-            for shape_idx, shape in enumerate(slide.shapes):
+            # Look for image shapes in this slide (group children included, see group_shapes.py)
+            for shape_idx, (shape, transform) in enumerate(flatten(slide.shapes)):
                 # Check if this shape is an image - be more comprehensive
                 is_image_shape = False
                 shape_info = f"Shape {shape_idx}: {type(shape).__name__}"
@@ -280,20 +366,6 @@ def map_zip_images_to_slides_with_pptx(pptx_path, images, prs):
                 elif hasattr(shape, 'fill') and hasattr(shape.fill, 'picture') and shape.fill.picture:
                     is_image_shape = True
                     shape_info += " (fill.picture)"
-                elif type(shape).__name__ == 'GroupShape':
-                    # Check if GroupShape contains image shapes
-                    try:
-                        if hasattr(shape, 'shapes'):
-                            for sub_shape in shape.shapes:
-                                if (hasattr(sub_shape, 'image') and sub_shape.image) or \
-                                   (hasattr(sub_shape, 'fill') and hasattr(sub_shape.fill, 'type') and sub_shape.fill.type in [1, 2, 3]) or \
-                                   (hasattr(sub_shape, 'image_part') and sub_shape.image_part) or \
-                                   type(sub_shape).__name__ == 'Picture':
-                                    is_image_shape = True
-                                    shape_info += " (GroupShape with image)"
-                                    break
-                    except:
-                        pass
                 
                 # Also check for any shape that might contain image data
                 if not is_image_shape:
@@ -311,12 +383,9 @@ def map_zip_images_to_slides_with_pptx(pptx_path, images, prs):
                 
                 if is_image_shape:
                     # Get the actual position and size from the shape
-                    x = int(shape.left.inches * 96) if hasattr(shape, 'left') and shape.left else 100
-                    y = int(shape.top.inches * 96) if hasattr(shape, 'top') and shape.top else 100
-                    width = int(shape.width.inches * 96) if hasattr(shape, 'width') and shape.width else 200
-                    height = int(shape.height.inches * 96) if hasattr(shape, 'height') and shape.height else 150
+                    x, y, width, height = place(shape, transform, default=(100, 100, 200, 150))
                     
-                    print(f"🔍 Found image shape: {shape_info} - pos({x},{y}) size({width}x{height})")
+                    map_log.debug("Found image shape: %s - pos(%s,%s) size(%sx%s)", shape_info, x, y, width, height)
                     
                     # Find an unmapped image to assign to this shape
                     for img in images:
@@ -329,17 +398,17 @@ def map_zip_images_to_slides_with_pptx(pptx_path, images, prs):
                             img['shape_index'] = shape_idx
                             
                             mapped_images.append(img)
-                            print(f"✅ Mapped image to slide {slide_num}, shape {shape_idx}: pos({img['x']},{img['y']}) size({img['width']}x{img['height']})")
+                            map_log.debug("Mapped image to slide %s, shape %s: pos(%s,%s) size(%sx%s)", slide_num, shape_idx, img['x'], img['y'], img['width'], img['height'])
                             break
                 else:
                     # Log non-image shapes for debugging
                     if shape_idx < 5:  # Only log first few to avoid spam
-                        print(f"📝 Non-image shape: {shape_info}")
+                        map_log.debug("Non-image shape: %s", shape_info)
         
         # For any remaining unmapped images, distribute them across slides with better positioning
         unmapped_images = [img for img in images if img.get('slide_index') == -1]
         if unmapped_images:
-            print(f"⚠️ {len(unmapped_images)} images still unmapped, distributing across slides...")
+            map_log.info("%s images still unmapped, distributing across slides...", len(unmapped_images))
             slides_count = len(prs.slides)
             
             for i, img in enumerate(unmapped_images):
@@ -351,15 +420,13 @@ def map_zip_images_to_slides_with_pptx(pptx_path, images, prs):
                 img['y'] = 100 + (i * 60) % 300  # Spread vertically with more space
                 img['width'] = 250  # Slightly larger default size
                 img['height'] = 200
-                print(f"📍 Distributed unmapped image to slide {slide_num}: pos({img['x']},{img['y']}) size({img['width']}x{img['height']})")
+                map_log.debug("Distributed unmapped image to slide %s: pos(%s,%s) size(%sx%s)", slide_num, img['x'], img['y'], img['width'], img['height'])
         
-        print(f"✅ Successfully mapped {len(images)} images to slide positions with accurate dimensions")
+        map_log.info("Successfully mapped %s images to slide positions with accurate dimensions", len(images))
         return images
         
     except Exception as e:
-        print(f"❌ Error mapping images with python-pptx: {e}")
-        import traceback
-        traceback.print_exc()
+        map_log.exception("Error mapping images with python-pptx: %s", e)
         return images
 
 def extract_all_images_from_pptx(pptx_path):
@@ -385,29 +452,30 @@ def extract_all_images_from_pptx(pptx_path):
                 if hasattr(slide, 'part') and hasattr(slide.part, 'rels'):
                     slide_relationships[slide_idx] = slide.part.rels
         except Exception as e:
-            print(f"⚠️ Could not extract slide relationships: {e}")
+            extract_log.warning("Could not extract slide relationships: %s", e)
         
         for slide_idx, slide in enumerate(prs.slides):
-            print(f"🔍 Processing slide {slide_idx + 1} with {len(slide.shapes)} shapes")
+            extract_log.debug("Processing slide %s with %s shapes", slide_idx + 1, len(slide.shapes))
             
             for shape_idx, shape in enumerate(slide.shapes):
-                print(f"  🔍 Checking shape {shape_idx}: {type(shape).__name__}")
+                extract_log.debug("Checking shape %s: %s", shape_idx, type(shape).__name__)
                 
-                # Debug: Print detailed shape information for Canva debugging
-                if hasattr(shape, 'fill'):
-                    print(f"    📋 Fill type: {getattr(shape.fill, 'type', 'unknown')}")
-                    if hasattr(shape.fill, 'image'):
-                        print(f"    🖼️ Has fill.image: {shape.fill.image is not None}")
-                    if hasattr(shape.fill, 'picture'):
-                        print(f"    🖼️ Has fill.picture: {shape.fill.picture is not None}")
-                    if hasattr(shape.fill, 'blipFill'):
-                        print(f"    🖼️ Has fill.blipFill: {shape.fill.blipFill is not None}")
-                if hasattr(shape, 'image'):
-                    print(f"    🖼️ Has direct image: {shape.image is not None}")
-                if hasattr(shape, 'image_part'):
-                    print(f"    🖼️ Has image_part: {shape.image_part is not None}")
-                if hasattr(shape, 'shape_type'):
-                    print(f"    📐 Shape type: {shape.shape_type}")
+                # Debug: Print detailed shape information for Canva debugging (probing these attributes is not free)
+                if extract_log.isEnabledFor(logging.DEBUG):
+                    if hasattr(shape, 'fill'):
+                        extract_log.debug("Fill type: %s", getattr(shape.fill, 'type', 'unknown'))
+                        if hasattr(shape.fill, 'image'):
+                            extract_log.debug("Has fill.image: %s", shape.fill.image is not None)
+                        if hasattr(shape.fill, 'picture'):
+                            extract_log.debug("Has fill.picture: %s", shape.fill.picture is not None)
+                        if hasattr(shape.fill, 'blipFill'):
+                            extract_log.debug("Has fill.blipFill: %s", shape.fill.blipFill is not None)
+                    if hasattr(shape, 'image'):
+                        extract_log.debug("Has direct image: %s", shape.image is not None)
+                    if hasattr(shape, 'image_part'):
+                        extract_log.debug("Has image_part: %s", shape.image_part is not None)
+                    if hasattr(shape, 'shape_type'):
+                        extract_log.debug("Shape type: %s", shape.shape_type)
                 
                 # Comprehensive image detection - try multiple methods
                 image_found = False
@@ -417,8 +485,6 @@ def extract_all_images_from_pptx(pptx_path):
                     try:
                         image_data = shape.image.blob
                         if image_data and len(image_data) > 0:
-                            image_base64 = base64.b64encode(image_data).decode('utf-8')
-                            
                             # Determine MIME type
                             mime_type = 'image/jpeg'
                             if image_data.startswith(b'\x89PNG'):
@@ -428,71 +494,67 @@ def extract_all_images_from_pptx(pptx_path):
                             elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:12]:
                                 mime_type = 'image/webp'
                             
-                            data_url = f"data:{mime_type};base64,{image_base64}"
+                            data_url = media_source(image_data, mime_type)
                             image_id = f"image_{slide_num}_{shape_idx}_{image_counter}"
                             images[image_id] = data_url
                             image_counter += 1
                             
-                            print(f"✅ Extracted image: {image_id} ({len(image_data)} bytes, {mime_type})")
+                            extract_log.debug("Extracted image: %s (%s bytes, %s)", image_id, len(image_data), mime_type)
                             image_found = True
                         else:
-                            print(f"⚠️ Image data is empty for shape {shape_idx}")
+                            extract_log.debug("Image data is empty for shape %s", shape_idx)
                     except Exception as e:
-                        print(f"❌ Failed to extract image from shape {shape_idx}: {e}")
+                        extract_log.warning("Failed to extract image from shape %s: %s", shape_idx, e)
                 
                 # Method 2: Try all possible fill types and attributes
                 if not image_found:
-                    print(f"🔍 Trying alternative image detection methods for shape {shape_idx}")
+                    extract_log.debug("Trying alternative image detection methods for shape %s", shape_idx)
                     
                     # Try different fill types
                     if hasattr(shape, 'fill'):
-                        print(f"    📋 Fill type: {getattr(shape.fill, 'type', 'unknown')}")
+                        extract_log.debug("Fill type: %s", getattr(shape.fill, 'type', 'unknown'))
                         
                         # Try fill.image
                         if hasattr(shape.fill, 'image') and shape.fill.image:
                             try:
                                 image_data = shape.fill.image.blob
                                 if image_data and len(image_data) > 0:
-                                    image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                    
                                     mime_type = 'image/jpeg'
                                     if image_data.startswith(b'\x89PNG'):
                                         mime_type = 'image/png'
                                     elif image_data.startswith(b'GIF'):
                                         mime_type = 'image/gif'
                                     
-                                    data_url = f"data:{mime_type};base64,{image_base64}"
+                                    data_url = media_source(image_data, mime_type)
                                     image_id = f"image_{slide_num}_{shape_idx}_{image_counter}"
                                     images[image_id] = data_url
                                     image_counter += 1
                                     
-                                    print(f"✅ Extracted image from fill.image: {image_id} ({len(image_data)} bytes, {mime_type})")
+                                    extract_log.debug("Extracted image from fill.image: %s (%s bytes, %s)", image_id, len(image_data), mime_type)
                                     image_found = True
                             except Exception as e:
-                                print(f"❌ Failed to extract from fill.image: {e}")
+                                extract_log.warning("Failed to extract from fill.image: %s", e)
                         
                         # Try fill.picture
                         if not image_found and hasattr(shape.fill, 'picture') and shape.fill.picture:
                             try:
                                 image_data = shape.fill.picture.blob
                                 if image_data and len(image_data) > 0:
-                                    image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                    
                                     mime_type = 'image/jpeg'
                                     if image_data.startswith(b'\x89PNG'):
                                         mime_type = 'image/png'
                                     elif image_data.startswith(b'GIF'):
                                         mime_type = 'image/gif'
                                     
-                                    data_url = f"data:{mime_type};base64,{image_base64}"
+                                    data_url = media_source(image_data, mime_type)
                                     image_id = f"image_{slide_num}_{shape_idx}_{image_counter}"
                                     images[image_id] = data_url
                                     image_counter += 1
                                     
-                                    print(f"✅ Extracted image from fill.picture: {image_id} ({len(image_data)} bytes, {mime_type})")
+                                    extract_log.debug("Extracted image from fill.picture: %s (%s bytes, %s)", image_id, len(image_data), mime_type)
                                     image_found = True
                             except Exception as e:
-                                print(f"❌ Failed to extract from fill.picture: {e}")
+                                extract_log.warning("Failed to extract from fill.picture: %s", e)
                         
                         # Try fill.blipFill (PowerPoint format)
                         if not image_found and hasattr(shape.fill, 'blipFill') and shape.fill.blipFill:
@@ -501,81 +563,75 @@ def extract_all_images_from_pptx(pptx_path):
                                     if hasattr(shape.fill.blipFill.blip, 'blob'):
                                         image_data = shape.fill.blipFill.blip.blob
                                         if image_data and len(image_data) > 0:
-                                            image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                            
                                             mime_type = 'image/jpeg'
                                             if image_data.startswith(b'\x89PNG'):
                                                 mime_type = 'image/png'
                                             elif image_data.startswith(b'GIF'):
                                                 mime_type = 'image/gif'
                                             
-                                            data_url = f"data:{mime_type};base64,{image_base64}"
+                                            data_url = media_source(image_data, mime_type)
                                             image_id = f"image_{slide_num}_{shape_idx}_{image_counter}"
                                             images[image_id] = data_url
                                             image_counter += 1
                                             
-                                            print(f"✅ Extracted image from fill.blipFill: {image_id} ({len(image_data)} bytes, {mime_type})")
+                                            extract_log.debug("Extracted image from fill.blipFill: %s (%s bytes, %s)", image_id, len(image_data), mime_type)
                                             image_found = True
                             except Exception as e:
-                                print(f"❌ Failed to extract from fill.blipFill: {e}")
+                                extract_log.warning("Failed to extract from fill.blipFill: %s", e)
                     
                     # Method 3: Try image_part
                     if not image_found and hasattr(shape, 'image_part') and shape.image_part:
                         try:
                             image_data = shape.image_part.blob
                             if image_data and len(image_data) > 0:
-                                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                
                                 mime_type = 'image/jpeg'
                                 if image_data.startswith(b'\x89PNG'):
                                     mime_type = 'image/png'
                                 elif image_data.startswith(b'GIF'):
                                     mime_type = 'image/gif'
                                 
-                                data_url = f"data:{mime_type};base64,{image_base64}"
+                                data_url = media_source(image_data, mime_type)
                                 image_id = f"image_{slide_num}_{shape_idx}_{image_counter}"
                                 images[image_id] = data_url
                                 image_counter += 1
                                 
-                                print(f"✅ Extracted image from image_part: {image_id} ({len(image_data)} bytes, {mime_type})")
+                                extract_log.debug("Extracted image from image_part: %s (%s bytes, %s)", image_id, len(image_data), mime_type)
                                 image_found = True
                         except Exception as e:
-                            print(f"❌ Failed to extract from image_part: {e}")
+                            extract_log.warning("Failed to extract from image_part: %s", e)
                     
                     if not image_found:
-                        print(f"❌ No image found in shape {shape_idx} using any method")
+                        extract_log.debug("No image found in shape %s using any method", shape_idx)
                         
                         # Method 4: Deep inspection of shape attributes
-                        print(f"🔍 Deep inspection of shape {shape_idx} attributes:")
+                        extract_log.debug("Deep inspection of shape %s attributes:", shape_idx)
                         for attr_name in dir(shape):
                             if not attr_name.startswith('_'):
                                 try:
                                     attr_value = getattr(shape, attr_name)
                                     if hasattr(attr_value, 'blob') or 'image' in attr_name.lower():
-                                        print(f"    🔍 Found potential image attribute: {attr_name} = {type(attr_value)}")
+                                        extract_log.debug("Found potential image attribute: %s = %s", attr_name, type(attr_value))
                                         if hasattr(attr_value, 'blob'):
                                             try:
                                                 blob_data = attr_value.blob
                                                 if blob_data and len(blob_data) > 0:
-                                                    print(f"    ✅ Found blob data in {attr_name}: {len(blob_data)} bytes")
-                                                    image_base64 = base64.b64encode(blob_data).decode('utf-8')
-                                                    
+                                                    extract_log.debug("Found blob data in %s: %s bytes", attr_name, len(blob_data))
                                                     mime_type = 'image/jpeg'
                                                     if blob_data.startswith(b'\x89PNG'):
                                                         mime_type = 'image/png'
                                                     elif blob_data.startswith(b'GIF'):
                                                         mime_type = 'image/gif'
                                                     
-                                                    data_url = f"data:{mime_type};base64,{image_base64}"
+                                                    data_url = media_source(blob_data, mime_type)
                                                     image_id = f"image_{slide_num}_{shape_idx}_{image_counter}"
                                                     images[image_id] = data_url
                                                     image_counter += 1
                                                     
-                                                    print(f"✅ Extracted image from {attr_name}: {image_id} ({len(blob_data)} bytes, {mime_type})")
+                                                    extract_log.debug("Extracted image from %s: %s (%s bytes, %s)", attr_name, image_id, len(blob_data), mime_type)
                                                     image_found = True
                                                     break
                                             except Exception as e:
-                                                print(f"    ❌ Error accessing blob in {attr_name}: {e}")
+                                                extract_log.debug("Error accessing blob in %s: %s", attr_name, e)
                                 except Exception as e:
                                     pass  # Skip attributes that can't be accessed
                 
@@ -585,8 +641,6 @@ def extract_all_images_from_pptx(pptx_path):
                         if hasattr(shape.fill, 'image') and shape.fill.image:
                             image_data = shape.fill.image.blob
                             if image_data and len(image_data) > 0:
-                                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                
                                 # Determine MIME type
                                 mime_type = 'image/jpeg'
                                 if image_data.startswith(b'\x89PNG'):
@@ -596,24 +650,22 @@ def extract_all_images_from_pptx(pptx_path):
                                 elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:12]:
                                     mime_type = 'image/webp'
                                 
-                                data_url = f"data:{mime_type};base64,{image_base64}"
+                                data_url = media_source(image_data, mime_type)
                                 image_id = f"image_{slide_num}_{shape_idx}_{image_counter}"
                                 images[image_id] = data_url
                                 image_counter += 1
                                 
-                                print(f"✅ Extracted fill image: {image_id} ({len(image_data)} bytes, {mime_type})")
+                                extract_log.debug("Extracted fill image: %s (%s bytes, %s)", image_id, len(image_data), mime_type)
                             else:
-                                print(f"⚠️ Fill image data is empty for shape {shape_idx}")
+                                extract_log.debug("Fill image data is empty for shape %s", shape_idx)
                     except Exception as e:
-                        print(f"❌ Failed to extract fill image from shape {shape_idx}: {e}")
+                        extract_log.warning("Failed to extract fill image from shape %s: %s", shape_idx, e)
                 
                 # Check for other image types
                 elif hasattr(shape, 'image_part') and shape.image_part:
                     try:
                         image_data = shape.image_part.blob
                         if image_data and len(image_data) > 0:
-                            image_base64 = base64.b64encode(image_data).decode('utf-8')
-                            
                             # Determine MIME type
                             mime_type = 'image/jpeg'
                             if image_data.startswith(b'\x89PNG'):
@@ -621,48 +673,71 @@ def extract_all_images_from_pptx(pptx_path):
                             elif image_data.startswith(b'GIF'):
                                 mime_type = 'image/gif'
                             
-                            data_url = f"data:{mime_type};base64,{image_base64}"
+                            data_url = media_source(image_data, mime_type)
                             image_id = f"image_{slide_num}_{shape_idx}_{image_counter}"
                             images[image_id] = data_url
                             image_counter += 1
                             
-                            print(f"✅ Extracted image_part: {image_id} ({len(image_data)} bytes)")
+                            extract_log.debug("Extracted image_part: %s (%s bytes)", image_id, len(image_data))
                     except Exception as e:
-                        print(f"❌ Failed to extract image_part from shape {shape_idx}: {e}")
+                        extract_log.warning("Failed to extract image_part from shape %s: %s", shape_idx, e)
     
     except Exception as e:
-        print(f"❌ Error processing PPTX: {e}")
+        extract_log.error("Error processing PPTX: %s", e)
     
-    print(f"📁 Total images extracted: {len(images)}")
+    extract_log.info("Total images extracted: %s", len(images))
     return images
 
-def extract_images_from_zip_structure(pptx_path):
+def extract_images_from_zip_structure(pptx_path, budget=None, guard=None, exclude=()):
     """
     Extract images directly from PPTX ZIP structure (like Pages does)
     This method reads the raw ZIP file and extracts images from ppt/media/
+    
+    With a MemoryBudget, media are read one at a time, compressed to a target
+    derived from the remaining budget and the raw bytes are dropped before the
+    next file is read.
+    
+    Every image is run past the MediaGuard (header-only probe) before it is
+    decoded; rejected images are skipped, as are the members named in exclude.
     """
     images = []
     image_counter = 0
+    if guard is None:
+        guard = MediaGuard()
     
     try:
-        print(f"🔍 Extracting images from ZIP structure of {pptx_path}")
+        extract_log.info("Extracting images from ZIP structure of %s", pptx_path)
         
         with zipfile.ZipFile(pptx_path, 'r') as zip_file:
             # List all files in the ZIP
             file_list = zip_file.namelist()
-            print(f"📁 Found {len(file_list)} files in ZIP structure")
+            extract_log.debug("Found %s files in ZIP structure", len(file_list))
             
             # Find all media files
-            media_files = [f for f in file_list if f.startswith('ppt/media/')]
-            print(f"🖼️ Found {len(media_files)} media files: {media_files}")
+            media_files = [f for f in file_list if f.startswith('ppt/media/') and f not in exclude]
+            extract_log.info("Found %s media files", len(media_files))
+            extract_log.debug("Media files: %s", media_files)
             
             # Extract each media file
-            for media_file in media_files:
+            for media_index, media_file in enumerate(media_files):
                 try:
+                    max_size_kb = 80
+                    max_pixels = None
+                    if budget:
+                        max_size_kb = budget.media_target_kb(max_size_kb, len(media_files) - media_index)
+                        max_pixels = budget.max_decode_pixels()
+                        # The compressed member is held alongside its decoded pixels while we work on it
+                        if zip_file.getinfo(media_file).file_size > budget.remaining:
+                            raise MemoryBudgetExceeded(f"{media_file} is larger than the remaining memory budget")
+                    
                     # Read the image data
                     image_data = zip_file.read(media_file)
                     
-                    if image_data and len(image_data) > 0:
+                    verdict = guard.admit(media_file, image_data, max_pixels=max_pixels)
+                    if verdict.accepted and verdict.max_pixels:
+                        max_pixels = verdict.max_pixels
+                    
+                    if image_data and verdict.accepted:
                         # Determine file extension and MIME type
                         file_ext = media_file.split('.')[-1].lower()
                         mime_type = 'image/jpeg'
@@ -679,11 +754,16 @@ def extract_images_from_zip_structure(pptx_path):
                             mime_type = 'image/tiff'
                         
                         # Compress image to reduce size for Firebase
-                        compressed_data, size_kb = compress_image(image_data, max_size_kb=80, quality=75)
+                        compressed_data, size_kb = compress_image(image_data, max_size_kb=max_size_kb, quality=75,
+                                                                  max_pixels=max_pixels)
+                        original_size_kb = len(image_data) / 1024
+                        if budget:
+                            del image_data
                         
-                        # Convert to base64 (always use JPEG after compression)
-                        image_base64 = base64.b64encode(compressed_data).decode('utf-8')
-                        image_src = f"data:image/jpeg;base64,{image_base64}"
+                        # Data URL, or raw bytes for binary responses (always JPEG after compression)
+                        image_src = media_source(compressed_data, 'image/jpeg')
+                        if budget:
+                            budget.charge(len(image_src), media_file)
                         
                         # Create image object with placeholder position (will be updated later)
                         image_obj = {
@@ -696,7 +776,7 @@ def extract_images_from_zip_structure(pptx_path):
                             "height": 200,
                             "filename": media_file,
                             "size_bytes": len(compressed_data),
-                            "original_size_kb": len(image_data) / 1024,
+                            "original_size_kb": original_size_kb,
                             "compressed_size_kb": size_kb,
                             "media_file": media_file  # Store original filename for mapping
                         }
@@ -704,14 +784,16 @@ def extract_images_from_zip_structure(pptx_path):
                         images.append(image_obj)
                         image_counter += 1
                         
-                        print(f"✅ Extracted image from ZIP: {media_file} ({len(image_data)} bytes, {mime_type})")
+                        extract_log.debug("Extracted image from ZIP: %s (%.1f KB, %s)", media_file, original_size_kb, mime_type)
                         
+                except MemoryBudgetExceeded:
+                    raise
                 except Exception as e:
-                    print(f"❌ Error extracting {media_file}: {e}")
+                    extract_log.warning("Error extracting %s: %s", media_file, e)
             
             # Now try to map images to slides by reading slide XML files
             slide_files = [f for f in file_list if f.startswith('ppt/slides/slide') and f.endswith('.xml')]
-            print(f"📄 Found {len(slide_files)} slide XML files")
+            extract_log.debug("Found %s slide XML files", len(slide_files))
             
             # Parse slide relationships to map images to slides
             for slide_file in slide_files:
@@ -731,28 +813,33 @@ def extract_images_from_zip_structure(pptx_path):
                             # This might reference an image
                             for attr_name, attr_value in elem.attrib.items():
                                 if 'embed' in attr_name.lower() or 'link' in attr_name.lower():
-                                    print(f"🔗 Found image reference in slide {slide_num}: {attr_name}={attr_value}")
+                                    extract_log.debug("Found image reference in slide %s: %s=%s", slide_num, attr_name, attr_value)
                                     
                 except Exception as e:
-                    print(f"❌ Error parsing slide XML {slide_file}: {e}")
+                    extract_log.warning("Error parsing slide XML %s: %s", slide_file, e)
         
-        print(f"📊 Total images extracted from ZIP: {len(images)}")
+        extract_log.info("Total images extracted from ZIP: %s", len(images))
         return images
         
+    except MemoryBudgetExceeded:
+        raise
     except Exception as e:
-        print(f"❌ Error extracting images from ZIP structure: {e}")
+        extract_log.error("Error extracting images from ZIP structure: %s", e)
         return []
 
-def extract_all_images_comprehensive(pptx_path):
+def extract_all_images_comprehensive(pptx_path, prs=None, guard=None):
     """
     Comprehensive image extraction function that works with Canva and all PPTX formats.
     Returns JSON objects with slide_index, shape_index, src, x, y, width, height
     """
     images = []
     image_counter = 0
+    if guard is None:
+        guard = MediaGuard()
     
     try:
-        prs = Presentation(pptx_path)
+        if prs is None:
+            prs = Presentation(pptx_path)
         
         # Check slide relationships for linked images
         slide_relationships = {}
@@ -761,13 +848,13 @@ def extract_all_images_comprehensive(pptx_path):
                 if hasattr(slide, 'part') and hasattr(slide.part, 'rels'):
                     slide_relationships[slide_idx] = slide.part.rels
         except Exception as e:
-            print(f"⚠️ Could not extract slide relationships: {e}")
+            extract_log.warning("Could not extract slide relationships: %s", e)
         
         for slide_idx, slide in enumerate(prs.slides):
-            print(f"🔍 Processing slide {slide_idx + 1} with {len(slide.shapes)} shapes")
+            extract_log.debug("Processing slide %s with %s shapes", slide_idx + 1, len(slide.shapes))
             
-            for shape_idx, shape in enumerate(slide.shapes):
-                print(f"  🔍 Checking shape {shape_idx}: {type(shape).__name__}")
+            for shape_idx, (shape, transform) in enumerate(flatten(slide.shapes)):
+                extract_log.debug("Checking shape %s: %s", shape_idx, type(shape).__name__)
                 
                 image_found = False
                 image_src = ""
@@ -776,9 +863,7 @@ def extract_all_images_comprehensive(pptx_path):
                 if hasattr(shape, 'image') and shape.image:
                     try:
                         image_data = shape.image.blob
-                        if image_data and len(image_data) > 0:
-                            image_base64 = base64.b64encode(image_data).decode('utf-8')
-                            
+                        if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
                             mime_type = 'image/jpeg'
                             if image_data.startswith(b'\x89PNG'):
                                 mime_type = 'image/png'
@@ -787,11 +872,11 @@ def extract_all_images_comprehensive(pptx_path):
                             elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:12]:
                                 mime_type = 'image/webp'
                             
-                            image_src = f"data:{mime_type};base64,{image_base64}"
-                            print(f"✅ Extracted direct image from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
+                            image_src = media_source(image_data, mime_type)
+                            extract_log.debug("Extracted direct image from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
                             image_found = True
                     except Exception as e:
-                        print(f"❌ Failed to extract direct image: {e}")
+                        extract_log.warning("Failed to extract direct image: %s", e)
                 
                 # Method 2: Fill-based images (Canva often uses these)
                 if not image_found and hasattr(shape, 'fill'):
@@ -799,39 +884,35 @@ def extract_all_images_comprehensive(pptx_path):
                     if hasattr(shape.fill, 'image') and shape.fill.image:
                         try:
                             image_data = shape.fill.image.blob
-                            if image_data and len(image_data) > 0:
-                                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                
+                            if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
                                 mime_type = 'image/jpeg'
                                 if image_data.startswith(b'\x89PNG'):
                                     mime_type = 'image/png'
                                 elif image_data.startswith(b'GIF'):
                                     mime_type = 'image/gif'
                                 
-                                image_src = f"data:{mime_type};base64,{image_base64}"
-                                print(f"✅ Extracted fill.image from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
+                                image_src = media_source(image_data, mime_type)
+                                extract_log.debug("Extracted fill.image from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
                                 image_found = True
                         except Exception as e:
-                            print(f"❌ Failed to extract from fill.image: {e}")
+                            extract_log.warning("Failed to extract from fill.image: %s", e)
                     
                     # Try fill.picture
                     if not image_found and hasattr(shape.fill, 'picture') and shape.fill.picture:
                         try:
                             image_data = shape.fill.picture.blob
-                            if image_data and len(image_data) > 0:
-                                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                
+                            if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
                                 mime_type = 'image/jpeg'
                                 if image_data.startswith(b'\x89PNG'):
                                     mime_type = 'image/png'
                                 elif image_data.startswith(b'GIF'):
                                     mime_type = 'image/gif'
                                 
-                                image_src = f"data:{mime_type};base64,{image_base64}"
-                                print(f"✅ Extracted fill.picture from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
+                                image_src = media_source(image_data, mime_type)
+                                extract_log.debug("Extracted fill.picture from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
                                 image_found = True
                         except Exception as e:
-                            print(f"❌ Failed to extract from fill.picture: {e}")
+                            extract_log.warning("Failed to extract from fill.picture: %s", e)
                     
                     # Try fill.blipFill (PowerPoint and Canva format)
                     if not image_found and hasattr(shape.fill, 'blipFill') and shape.fill.blipFill:
@@ -839,61 +920,56 @@ def extract_all_images_comprehensive(pptx_path):
                             if hasattr(shape.fill.blipFill, 'blip') and shape.fill.blipFill.blip:
                                 if hasattr(shape.fill.blipFill.blip, 'blob'):
                                     image_data = shape.fill.blipFill.blip.blob
-                                    if image_data and len(image_data) > 0:
-                                        image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                        
+                                    if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
                                         mime_type = 'image/jpeg'
                                         if image_data.startswith(b'\x89PNG'):
                                             mime_type = 'image/png'
                                         elif image_data.startswith(b'GIF'):
                                             mime_type = 'image/gif'
                                         
-                                        image_src = f"data:{mime_type};base64,{image_base64}"
-                                        print(f"✅ Extracted fill.blipFill from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
+                                        image_src = media_source(image_data, mime_type)
+                                        extract_log.debug("Extracted fill.blipFill from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
                                         image_found = True
                         except Exception as e:
-                            print(f"❌ Failed to extract from fill.blipFill: {e}")
+                            extract_log.warning("Failed to extract from fill.blipFill: %s", e)
                 
                 # Method 3: image_part
                 if not image_found and hasattr(shape, 'image_part') and shape.image_part:
                     try:
                         image_data = shape.image_part.blob
-                        if image_data and len(image_data) > 0:
-                            image_base64 = base64.b64encode(image_data).decode('utf-8')
-                            
+                        if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
                             mime_type = 'image/jpeg'
                             if image_data.startswith(b'\x89PNG'):
                                 mime_type = 'image/png'
                             elif image_data.startswith(b'GIF'):
                                 mime_type = 'image/gif'
                             
-                            image_src = f"data:{mime_type};base64,{image_base64}"
-                            print(f"✅ Extracted image_part from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
+                            image_src = media_source(image_data, mime_type)
+                            extract_log.debug("Extracted image_part from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
                             image_found = True
                     except Exception as e:
-                        print(f"❌ Failed to extract from image_part: {e}")
+                        extract_log.warning("Failed to extract from image_part: %s", e)
                 
                 # Method 4: Deep attribute inspection
                 if not image_found:
                     for attr_name in dir(shape):
-                        if not attr_name.startswith('_'):
+                        # shape.part is the slide itself; its blob re-serialises the whole slide XML
+                        if not attr_name.startswith('_') and attr_name != 'part':
                             try:
                                 attr_value = getattr(shape, attr_name)
                                 if hasattr(attr_value, 'blob') or 'image' in attr_name.lower():
                                     if hasattr(attr_value, 'blob'):
                                         try:
                                             blob_data = attr_value.blob
-                                            if blob_data and len(blob_data) > 0:
-                                                image_base64 = base64.b64encode(blob_data).decode('utf-8')
-                                                
+                                            if blob_data and guard.admit_inline(blob_data, f"shape {shape_idx} {attr_name}"):
                                                 mime_type = 'image/jpeg'
                                                 if blob_data.startswith(b'\x89PNG'):
                                                     mime_type = 'image/png'
                                                 elif blob_data.startswith(b'GIF'):
                                                     mime_type = 'image/gif'
                                                 
-                                                image_src = f"data:{mime_type};base64,{image_base64}"
-                                                print(f"✅ Extracted image from {attr_name}: shape {shape_idx} ({len(blob_data)} bytes, {mime_type})")
+                                                image_src = media_source(blob_data, mime_type)
+                                                extract_log.debug("Extracted image from %s: shape %s (%s bytes, %s)", attr_name, shape_idx, len(blob_data), mime_type)
                                                 image_found = True
                                                 break
                                         except Exception as e:
@@ -908,549 +984,552 @@ def extract_all_images_comprehensive(pptx_path):
                             if hasattr(rel, 'target_ref') and rel.target_ref:
                                 if any(img_ext in rel.target_ref.lower() for img_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']):
                                     image_src = rel.target_ref
-                                    print(f"✅ Found linked image: {image_src}")
+                                    extract_log.debug("Found linked image: %s", image_src)
                                     image_found = True
                                     break
                     except Exception as e:
-                        print(f"❌ Error checking linked images: {e}")
+                        extract_log.warning("Error checking linked images: %s", e)
                 
                 # Create JSON object if image found
                 if image_found and image_src:
+                    x, y, width, height = place(shape, transform, default=(0, 0, 200, 200))
                     image_obj = {
                         "slide_index": slide_idx,
                         "shape_index": shape_idx,
                         "src": image_src,
-                        "x": int(shape.left.inches * 96) if hasattr(shape, 'left') else 0,
-                        "y": int(shape.top.inches * 96) if hasattr(shape, 'top') else 0,
-                        "width": int(shape.width.inches * 96) if hasattr(shape, 'width') else 200,
-                        "height": int(shape.height.inches * 96) if hasattr(shape, 'height') else 200
+                        "x": x,
+                        "y": y,
+                        "width": width,
+                        "height": height
                     }
                     images.append(image_obj)
                     image_counter += 1
-                    print(f"📸 Added image {image_counter}: slide {slide_idx}, shape {shape_idx}, size {image_obj['width']}x{image_obj['height']}")
+                    extract_log.debug("Added image %s: slide %s, shape %s, size %sx%s", image_counter, slide_idx, shape_idx, image_obj['width'], image_obj['height'])
                 else:
-                    print(f"❌ No image found in shape {shape_idx}")
+                    extract_log.debug("No image found in shape %s", shape_idx)
         
-        print(f"📊 Total images extracted: {len(images)}")
+        extract_log.info("Total images extracted: %s", len(images))
         return images
         
     except Exception as e:
-        print(f"❌ Error extracting images from PPTX: {e}")
+        extract_log.error("Error extracting images from PPTX: %s", e)
         return []
 
-def parse_pptx_to_json(pptx_path):
-    """Parse PPTX file and return structured JSON"""
+def source_size(pptx_source):
+    """Size in bytes of a PPTX given as a path or a seekable file object"""
+    if isinstance(pptx_source, (str, os.PathLike)):
+        return os.path.getsize(pptx_source)
+    position = pptx_source.tell()
+    size = pptx_source.seek(0, os.SEEK_END)
+    pptx_source.seek(position)
+    return size
+
+def parse_pptx_to_json(pptx_path, memory_ceiling_mb=None, title=None, compact=False, optimize=True):
+    """
+    Parse PPTX file and return structured JSON.
+    pptx_path may be a path or a seekable binary file object (e.g. an upload
+    stream); title defaults to the file name.
+    memory_ceiling_mb (default PPTX_MEMORY_CEILING_MB) enables the bounded-memory
+    import mode; MemoryBudgetExceeded is raised if the deck can't fit.
+    compact returns the compact schema (shared style table, defaults omitted;
+    see compact_schema.py).
+    optimize=False skips squeezing the result into a single Firebase document,
+    for callers that store it sharded (see firestore_shards.py).
+    """
+    started = time.perf_counter()
+    if memory_ceiling_mb is None:
+        memory_ceiling_mb = MEMORY_CEILING_MB
+    budget = MemoryBudget(memory_ceiling_mb) if memory_ceiling_mb else None
+    guard = MediaGuard()
     try:
-        prs = Presentation(pptx_path)
-        # Try ZIP extraction first (like Pages does)
-        images = extract_images_from_zip_structure(pptx_path)
+        with stage('guard'):
+            # Reject zip bombs from the central directory before python-pptx inflates anything
+            guard.check_archive(pptx_path)
+        
+        if budget:
+            # python-pptx keeps every part of the package in memory
+            budget.charge(source_size(pptx_path), "source deck")
         
-        # If no images found via ZIP, try comprehensive extraction
-        if not images:
-            print("🔄 No images found via ZIP extraction, trying comprehensive method...")
-            images = extract_all_images_comprehensive(pptx_path)
+        with stage('open'):
+            prs = Presentation(pptx_path)
+        
+        with stage('extract'):
+            # Try ZIP extraction first (like Pages does)
+            # Picture backgrounds are rendered once by BackgroundResolver instead
+            images = extract_images_from_zip_structure(pptx_path, budget=budget, guard=guard,
+                                                       exclude=background_media(prs))
+            
+            # If no images found via ZIP, try comprehensive extraction
+            if not images:
+                log.info("No images found via ZIP extraction, trying comprehensive method...")
+                images = extract_all_images_comprehensive(pptx_path, prs=prs, guard=guard)
+                if budget:
+                    budget.charge(sum(len(img['src']) for img in images), "inline images")
         
         # Map ZIP images to their correct slide positions using python-pptx
         if images:
-            print(f"🗺️ Mapping {len(images)} ZIP images to slide positions...")
-            images = map_zip_images_to_slides_with_pptx(pptx_path, images, prs)
+            log.info("Mapping %s ZIP images to slide positions...", len(images))
+            with stage('map'):
+                images = map_zip_images_to_slides_with_pptx(pptx_path, images, prs)
+        
+        # Get presentation dimensions
+        slide_width = int(prs.slide_width.inches * 96) if hasattr(prs, 'slide_width') and prs.slide_width else 960
+        slide_height = int(prs.slide_height.inches * 96) if hasattr(prs, 'slide_height') and prs.slide_height else 540
         
         slides = []
         image_index = 0
+        theme = ThemeResolver()
+        placeholders = PlaceholderResolver(theme)
+        backgrounds = BackgroundResolver(theme, (slide_width, slide_height), guard=guard, budget=budget)
         
-        for slide_num, slide in enumerate(prs.slides):
-            # Extract background color from slide
-            background_color = "#ffffff"  # Default white
-            try:
-                if hasattr(slide, 'background') and slide.background:
-                    if hasattr(slide.background, 'fill') and slide.background.fill:
-                        if hasattr(slide.background.fill, 'solid_color') and slide.background.fill.solid_color:
-                            color = slide.background.fill.solid_color
-                            if hasattr(color, 'rgb') and color.rgb:
-                                rgb = color.rgb
-                                if hasattr(rgb, 'red') and hasattr(rgb, 'green') and hasattr(rgb, 'blue'):
-                                    background_color = f"#{rgb.red:02x}{rgb.green:02x}{rgb.blue:02x}"
-                                    print(f"🎨 Extracted slide background color: {background_color}")
-                        elif hasattr(slide.background.fill, 'fore_color') and slide.background.fill.fore_color:
-                            color = slide.background.fill.fore_color
-                            if hasattr(color, 'rgb') and color.rgb:
-                                rgb = color.rgb
-                                if hasattr(rgb, 'red') and hasattr(rgb, 'green') and hasattr(rgb, 'blue'):
-                                    background_color = f"#{rgb.red:02x}{rgb.green:02x}{rgb.blue:02x}"
-                                    print(f"🎨 Extracted slide background color (fore): {background_color}")
-            except Exception as e:
-                print(f"⚠️ Could not extract background color: {e}")
+        with stage('slides'):
+            for slide_num, slide in enumerate(prs.slides):
+                # Background from the slide, else its layout or master; pictures go in a shared table
+                try:
+                    background_color, background_image = backgrounds.resolve(slide)
+                except Exception as e:
+                    slides_log.debug("Could not extract background: %s", e)
+                    background_color, background_image = "#ffffff", None  # Default white
             
-            slide_data = {
-                "id": f"slide-{slide_num + 1}",
-                "title": f"Slide {slide_num + 1}",
-                "content": "",
-                "elements": [],
-                "background": background_color
-            }
+                slide_data = {
+                    "id": f"slide-{slide_num + 1}",
+                    "title": f"Slide {slide_num + 1}",
+                    "content": "",
+                    "elements": [],
+                    "background": background_color
+                }
+                if background_image:
+                    slide_data["backgroundImage"] = background_image
             
-            # Process all shapes in the slide
-            for shape_idx, shape in enumerate(slide.shapes):
-                # Handle text shapes
-                if hasattr(shape, 'text_frame') and shape.text_frame and shape.text_frame.text.strip():
-                    text_content = shape.text_frame.text.strip()
+                # Process all shapes in the slide, with group children flattened onto the slide
+                flat_shapes = flatten(slide.shapes)
+                layout = slide.slide_layout
+                master = layout.slide_master
+                for shape_idx, (shape, transform) in enumerate(flat_shapes):
+                    # Placeholders inherit position and text style from the layout and master
+                    geometry, inherited = placeholders.resolve(layout, shape)
+                    x, y, width, height = place(shape, transform, geometry=geometry)
+                    table = table_element(shape) if getattr(shape, 'has_table', False) else None
+                    # Handle text shapes
+                    if hasattr(shape, 'text_frame') and shape.text_frame and shape.text_frame.text.strip():
+                        text_content = shape.text_frame.text.strip()
                     
-                    # Extract font information from the first paragraph
-                    font_size = 24
-                    font_family = "Inter"
-                    font_weight = "600"
-                    text_color = "#000000"
-                    text_align = "left"
+                        # Extract font information from the first paragraph, on top of
+                        # the defaults or what a placeholder inherits
+                        font_size = int(inherited.get('size', 24))
+                        font_family = inherited.get('typeface', "Inter")
+                        bold = inherited.get('bold')
+                        italic = inherited.get('italic')
+                        text_color = inherited.get('color', "#000000")
+                        text_align = inherited.get('align', "left")
                     
-                    try:
-                        if shape.text_frame.paragraphs:
-                            first_para = shape.text_frame.paragraphs[0]
-                            if first_para.runs:
-                                first_run = first_para.runs[0]
-                                
-                                # Extract font size
-                                if hasattr(first_run.font, 'size') and first_run.font.size:
-                                    font_size = int(first_run.font.size.pt)
+                        try:
+                            if shape.text_frame.paragraphs:
+                                first_para = shape.text_frame.paragraphs[0]
+                                if first_para.runs:
+                                    first_run = first_para.runs[0]
                                 
-                                # Extract font family
-                                if hasattr(first_run.font, 'name') and first_run.font.name:
-                                    font_family = first_run.font.name
+                                    # Extract font size
+                                    if hasattr(first_run.font, 'size') and first_run.font.size:
+                                        font_size = int(first_run.font.size.pt)
                                 
-                                # Extract font weight (bold)
-                                if hasattr(first_run.font, 'bold') and first_run.font.bold:
-                                    font_weight = "bold"
+                                    # Extract font family
+                                    if hasattr(first_run.font, 'name') and first_run.font.name:
+                                        font_family = theme.font(first_run.font.name, master) or font_family
                                 
-                                # Extract italic style
-                                if hasattr(first_run.font, 'italic') and first_run.font.italic:
-                                    if font_family and 'italic' not in font_family.lower():
-                                        font_family = f"{font_family} Italic"
+                                    # Extract bold and italic; an explicit b="0"/i="0" overrides the inherited style
+                                    if first_run.font.bold is not None:
+                                        bold = first_run.font.bold
+                                    if first_run.font.italic is not None:
+                                        italic = first_run.font.italic
                                 
-                                # Extract text color
-                                if hasattr(first_run.font, 'color') and first_run.font.color:
-                                    try:
-                                        print(f"🎨 Extracting color from shape {shape_idx}")
-                                        print(f"🎨 Color object: {first_run.font.color}")
-                                        print(f"🎨 Has rgb: {hasattr(first_run.font.color, 'rgb')}")
-                                        
-                                        if hasattr(first_run.font.color, 'rgb'):
-                                            rgb = first_run.font.color.rgb
-                                            print(f"🎨 RGB object: {rgb}")
-                                            if rgb:
-                                                # Handle different RGB color formats
-                                                if hasattr(rgb, 'red') and hasattr(rgb, 'green') and hasattr(rgb, 'blue'):
-                                                    # Standard RGB format
-                                                    text_color = f"#{rgb.red:02x}{rgb.green:02x}{rgb.blue:02x}"
-                                                    print(f"🎨 Extracted color (standard): {text_color}")
-                                                elif hasattr(rgb, 'r') and hasattr(rgb, 'g') and hasattr(rgb, 'b'):
-                                                    # Alternative RGB format
-                                                    text_color = f"#{rgb.r:02x}{rgb.g:02x}{rgb.b:02x}"
-                                                    print(f"🎨 Extracted color (alt): {text_color}")
-                                                else:
-                                                    # Try to get RGB values directly from the string representation
-                                                    rgb_values = str(rgb)
-                                                    print(f"🎨 RGB string: {rgb_values}")
-                                                    
-                                                    # Handle direct hex values like "422717"
-                                                    if len(rgb_values) == 6 and all(c in '0123456789abcdefABCDEF' for c in rgb_values):
-                                                        text_color = f"#{rgb_values}"
-                                                        print(f"🎨 Extracted color (direct hex): {text_color}")
-                                                    elif 'RGB' in rgb_values:
-                                                        # Extract RGB values from string representation
-                                                        import re
-                                                        match = re.search(r'RGB\((\d+),\s*(\d+),\s*(\d+)\)', rgb_values)
-                                                        if match:
-                                                            r, g, b = map(int, match.groups())
-                                                            text_color = f"#{r:02x}{g:02x}{b:02x}"
-                                                            print(f"🎨 Extracted color (regex): {text_color}")
-                                        elif hasattr(first_run.font.color, 'theme_color'):
-                                            # Handle theme colors - use a default color for now
-                                            text_color = "#000000"
-                                            print(f"🎨 Using default color for theme: {text_color}")
-                                    except Exception as color_error:
-                                        print(f"⚠️ Color extraction error: {color_error}")
-                                        text_color = "#000000"
-                                else:
-                                    print(f"🎨 No color found for shape {shape_idx}")
+                                    # Extract text color: RGB or theme colour (a run without one keeps the inherited colour)
+                                    run_color = theme.resolve(solid_fill(first_run._r.rPr), master)
+                                    if run_color:
+                                        text_color = run_color
                                 
-                                # Extract text alignment
-                                if hasattr(first_para, 'alignment'):
-                                    alignment_map = {
-                                        1: "left",    # PP_ALIGN_LEFT
-                                        2: "center",  # PP_ALIGN_CENTER
-                                        3: "right",   # PP_ALIGN_RIGHT
-                                        4: "justify"  # PP_ALIGN_JUSTIFY
-                                    }
-                                    text_align = alignment_map.get(first_para.alignment, "left")
+                                    # Extract text alignment
+                                    if hasattr(first_para, 'alignment'):
+                                        alignment_map = {
+                                            1: "left",    # PP_ALIGN_LEFT
+                                            2: "center",  # PP_ALIGN_CENTER
+                                            3: "right",   # PP_ALIGN_RIGHT
+                                            4: "justify"  # PP_ALIGN_JUSTIFY
+                                        }
+                                        text_align = alignment_map.get(first_para.alignment, text_align)
                                     
-                    except Exception as e:
-                        print(f"⚠️ Could not extract font info: {e}")
-                    
-                    element = {
-                        "id": f"text-{slide_num}-{shape_idx}",
-                        "type": "text",
-                        "x": int(shape.left.inches * 96),
-                        "y": int(shape.top.inches * 96),
-                        "width": max(int(shape.width.inches * 96), 200),
-                        "height": max(int(shape.height.inches * 96), 60),
-                        "content": text_content,
-                        "fontSize": font_size,
-                        "fontFamily": font_family,
-                        "fontWeight": font_weight,
-                        "color": text_color,
-                        "textAlign": text_align,
-                        "rotation": 0,
-                        "zIndex": 1,
-                        "selected": False
-                    }
-                    slide_data["elements"].append(element)
-                    print(f"✅ Created text element: {text_content[:50]}... (font: {font_family}, size: {font_size}, color: {text_color})")
-                
-                # Handle image shapes - use ZIP extraction results first
-                elif (hasattr(shape, 'image') and shape.image) or \
-                     (hasattr(shape, 'fill') and hasattr(shape.fill, 'type') and shape.fill.type in [1, 2, 3]) or \
-                     (hasattr(shape, 'image_part') and shape.image_part) or \
-                     type(shape).__name__ == 'Picture' or \
-                     (type(shape).__name__ == 'GroupShape' and hasattr(shape, 'shapes') and any(
-                         (hasattr(sub_shape, 'image') and sub_shape.image) or 
-                         (hasattr(sub_shape, 'fill') and hasattr(sub_shape.fill, 'type') and sub_shape.fill.type in [1, 2, 3]) or
-                         (hasattr(sub_shape, 'image_part') and sub_shape.image_part) or
-                         type(sub_shape).__name__ == 'Picture'
-                         for sub_shape in shape.shapes
-                     )):
-                    # Initialize image_src variable
-                    image_src = ""
+                        except Exception as e:
+                            slides_log.warning("Could not extract font info: %s", e)
                     
-                    # Check if this shape corresponds to an image from our ZIP extraction
-                    matching_image = None
-                    for img in images:
-                        if img['slide_index'] == slide_num and img['shape_index'] == shape_idx:
-                            matching_image = img
-                            break
+                        font_weight = "bold" if bold else "600"
+                        # Italic is applied once the family is known, so a run's own typeface keeps it
+                        if italic and 'italic' not in font_family.lower():
+                            font_family = f"{font_family} Italic"
                     
-                    if matching_image:
-                        print(f"🖼️ Found matching ZIP image for shape {shape_idx}: {type(shape).__name__}")
-                        
                         element = {
-                            "id": f"image-{slide_num}-{shape_idx}",
-                            "type": "image",
-                            "x": matching_image['x'],
-                            "y": matching_image['y'],
-                            "width": matching_image['width'],
-                            "height": matching_image['height'],
-                            "src": matching_image['src'],
-                            "alt": f"Image from slide {slide_num + 1}",
+                            "id": element_id("text", slide, shape),
+                            "type": "text",
+                            "x": x,
+                            "y": y,
+                            "width": max(width, 200),
+                            "height": max(height, 60),
+                            "content": text_content,
+                            "fontSize": font_size,
+                            "fontFamily": font_family,
+                            "fontWeight": font_weight,
+                            "color": text_color,
+                            "textAlign": text_align,
+                            "rotation": 0,
+                            "zIndex": 1,
+                            "selected": False
+                        }
+                        # Runs and paragraphs formatted unlike the first run, as style spans
+                        try:
+                            element.update(rich_text(
+                                shape.text_frame._txBody, text_content, element,
+                                lambda level, shape=shape: placeholders.resolve(layout, shape, level)[1],
+                                theme, master))
+                        except Exception as e:
+                            slides_log.warning("Could not extract rich text: %s", e)
+                        slide_data["elements"].append(element)
+                        slides_log.debug("Created text element: %.50s... (font: %s, size: %s, color: %s)", text_content, font_family, font_size, text_color)
+                
+                    # Handle charts from the values cached in the chart part (the workbook isn't opened)
+                    elif getattr(shape, 'has_chart', False):
+                        fields = chart_fields(shape.chart_part._element, theme, master)
+                        if fields is None:
+                            slides_log.debug("Skipped chart %s - no supported plot", shape_idx)
+                            continue
+                        element = {
+                            "id": element_id("chart", slide, shape),
+                            "type": "chart",
+                            "x": x,
+                            "y": y,
+                            "width": width,
+                            "height": height,
+                            **fields,
                             "rotation": 0,
                             "zIndex": 1,
                             "selected": False
                         }
                         slide_data["elements"].append(element)
-                        print(f"✅ Created ZIP image element: {element['id']} (size: {element['width']}x{element['height']})")
+                        slides_log.debug("Created %s chart element with %d series", element["chartType"], len(element["series"]))
+                
+                    # Handle tables as one element holding the cell matrix
+                    elif table is not None:
+                        element = {
+                            "id": element_id("table", slide, shape),
+                            "type": "table",
+                            "x": x,
+                            "y": y,
+                            "width": width,
+                            "height": height,
+                            **table_fields(table, transform, theme, master),
+                            "rotation": 0,
+                            "zIndex": 1,
+                            "selected": False
+                        }
+                        slide_data["elements"].append(element)
+                        slides_log.debug("Created table element: %dx%d cells", len(element["rows"]), len(element["columns"]))
+                
+                    # Handle image shapes - use ZIP extraction results first
+                    elif (hasattr(shape, 'image') and shape.image) or \
+                         (hasattr(shape, 'fill') and hasattr(shape.fill, 'type') and shape.fill.type in [1, 2, 3]) or \
+                         (hasattr(shape, 'image_part') and shape.image_part) or \
+                         type(shape).__name__ == 'Picture':
+                        # Initialize image_src variable
+                        image_src = ""
+                    
+                        # Check if this shape corresponds to an image from our ZIP extraction
+                        matching_image = None
+                        for img in images:
+                            if img['slide_index'] == slide_num and img['shape_index'] == shape_idx:
+                                matching_image = img
+                                break
+                    
+                        if matching_image:
+                            slides_log.debug("Found matching ZIP image for shape %s: %s", shape_idx, type(shape).__name__)
                         
-                        # Debug: Print image src preview
-                        print(f"🔍 ZIP Image src preview: {matching_image['src'][:100]}...")
-                        print(f"🔍 Full ZIP image element: {element}")
-                    else:
-                        # Check if this might be an image shape that wasn't caught by ZIP extraction
-                        is_potential_image = False
-                        if (hasattr(shape, 'image') and shape.image) or \
-                           (hasattr(shape, 'fill') and hasattr(shape.fill, 'type') and shape.fill.type in [1, 2, 3]) or \
-                           (hasattr(shape, 'image_part') and shape.image_part) or \
-                           (type(shape).__name__ == 'Picture') or \
-                           (hasattr(shape, 'shape_type') and shape.shape_type == 13):
-                            is_potential_image = True
+                            element = {
+                                "id": element_id("image", slide, shape),
+                                "type": "image",
+                                "x": matching_image['x'],
+                                "y": matching_image['y'],
+                                "width": matching_image['width'],
+                                "height": matching_image['height'],
+                                "src": matching_image['src'],
+                                "alt": f"Image from slide {slide_num + 1}",
+                                "rotation": 0,
+                                "zIndex": 1,
+                                "selected": False
+                            }
+                            slide_data["elements"].append(element)
+                            slides_log.debug("Created ZIP image element: %s (size: %sx%s)", element['id'], element['width'], element['height'])
                         
-                        if is_potential_image:
-                            print(f"⚠️ Potential image shape {shape_idx} not found in ZIP extraction: {type(shape).__name__}")
-                            
-                            # Try to create a placeholder image element with the shape's dimensions
-                            try:
-                                x = int(shape.left.inches * 96) if hasattr(shape, 'left') and shape.left else 100
-                                y = int(shape.top.inches * 96) if hasattr(shape, 'top') and shape.top else 100
-                                width = int(shape.width.inches * 96) if hasattr(shape, 'width') and shape.width else 200
-                                height = int(shape.height.inches * 96) if hasattr(shape, 'height') and shape.height else 150
-                                
-                                # Create a placeholder image element
-                                element = {
-                                    "id": f"image-{slide_num}-{shape_idx}",
-                                    "type": "image",
-                                    "x": x,
-                                    "y": y,
-                                    "width": width,
-                                    "height": height,
-                                    "src": "data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMjAwIiBoZWlnaHQ9IjE1MCIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj48cmVjdCB3aWR0aD0iMTAwJSIgaGVpZ2h0PSIxMDAlIiBmaWxsPSIjZGRkIi8+PHRleHQgeD0iNTAlIiB5PSI1MCUiIGZvbnQtZmFtaWx5PSJBcmlhbCIgZm9udC1zaXplPSIxNCIgZmlsbD0iIzk5OSIgdGV4dC1hbmNob3I9Im1pZGRsZSIgZHk9Ii4zZW0iPkltYWdlPC90ZXh0Pjwvc3ZnPg==",
-                                    "alt": f"Placeholder image from slide {slide_num + 1}",
-                                    "rotation": 0,
-                                    "zIndex": 1,
-                                    "selected": False
-                                }
-                                slide_data["elements"].append(element)
-                                print(f"✅ Created placeholder image element: {element['id']} (size: {element['width']}x{element['height']})")
-                            except Exception as e:
-                                print(f"❌ Error creating placeholder image: {e}")
-                    try:
-                        # Method 1: Direct image attribute
-                        if hasattr(shape, 'image') and shape.image:
-                            image_data = shape.image.blob
-                            if image_data and len(image_data) > 0:
-                                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                
-                                # Determine MIME type
-                                mime_type = 'image/jpeg'
-                                if image_data.startswith(b'\x89PNG'):
-                                    mime_type = 'image/png'
-                                elif image_data.startswith(b'GIF'):
-                                    mime_type = 'image/gif'
-                                elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:12]:
-                                    mime_type = 'image/webp'
-                                
-                                image_src = f"data:{mime_type};base64,{image_base64}"
-                                print(f"✅ Extracted image directly from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
-                            else:
-                                print(f"⚠️ Image data is empty for shape {shape_idx}")
+                            # Debug: Print image src preview
+                            slides_log.debug("ZIP Image src preview: %.100s...", matching_image['src'])
+                            slides_log.debug("Full ZIP image element: %s", element)
+                        else:
+                            # Check if this might be an image shape that wasn't caught by ZIP extraction
+                            is_potential_image = False
+                            if (hasattr(shape, 'image') and shape.image) or \
+                               (hasattr(shape, 'fill') and hasattr(shape.fill, 'type') and shape.fill.type in [1, 2, 3]) or \
+                               (hasattr(shape, 'image_part') and shape.image_part) or \
+                               (type(shape).__name__ == 'Picture') or \
+                               (hasattr(shape, 'shape_type') and shape.shape_type == 13):
+                                is_potential_image = True
                         
-                        # Method 2: Try different fill types (Canva often uses these)
-                        elif hasattr(shape, 'fill') and hasattr(shape.fill, 'type'):
-                            print(f"🔍 Checking fill type {shape.fill.type} for shape {shape_idx}")
+                            if is_potential_image:
+                                slides_log.debug("Potential image shape %s not found in ZIP extraction: %s", shape_idx, type(shape).__name__)
                             
-                            # Try fill.image
-                            if hasattr(shape.fill, 'image') and shape.fill.image:
-                                image_data = shape.fill.image.blob
-                                if image_data and len(image_data) > 0:
-                                    image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                    
+                                # Try to create a placeholder image element with the shape's dimensions
+                                try:
+                                    x, y, width, height = place(shape, transform, default=(100, 100, 200, 150), geometry=geometry)
+                                
+                                    # Create a placeholder image element
+                                    element = {
+                                        "id": element_id("image", slide, shape),
+                                        "type": "image",
+                                        "x": x,
+                                        "y": y,
+                                        "width": width,
+                                        "height": height,
+                                        "src": media_source(PLACEHOLDER_IMAGE_SVG, 'image/svg+xml'),
+                                        "alt": f"Placeholder image from slide {slide_num + 1}",
+                                        "rotation": 0,
+                                        "zIndex": 1,
+                                        "selected": False
+                                    }
+                                    slide_data["elements"].append(element)
+                                    slides_log.debug("Created placeholder image element: %s (size: %sx%s)", element['id'], element['width'], element['height'])
+                                except Exception as e:
+                                    slides_log.warning("Error creating placeholder image: %s", e)
+                        try:
+                            # Bounded mode: the compressed ZIP rendition is already on the slide,
+                            # don't inline the raw blob a second time
+                            if budget and matching_image:
+                                pass
+                            # Method 1: Direct image attribute
+                            elif hasattr(shape, 'image') and shape.image:
+                                image_data = shape.image.blob
+                                if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
                                     # Determine MIME type
                                     mime_type = 'image/jpeg'
                                     if image_data.startswith(b'\x89PNG'):
                                         mime_type = 'image/png'
                                     elif image_data.startswith(b'GIF'):
                                         mime_type = 'image/gif'
-                                    
-                                    image_src = f"data:{mime_type};base64,{image_base64}"
-                                    print(f"✅ Extracted fill.image from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
+                                    elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:12]:
+                                        mime_type = 'image/webp'
+                                
+                                    image_src = media_source(image_data, mime_type)
+                                    slides_log.debug("Extracted image directly from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
+                                else:
+                                    slides_log.debug("Image data is empty for shape %s", shape_idx)
+                        
+                            # Method 2: Try different fill types (Canva often uses these)
+                            elif hasattr(shape, 'fill') and hasattr(shape.fill, 'type'):
+                                slides_log.debug("Checking fill type %s for shape %s", shape.fill.type, shape_idx)
                             
-                            # Try fill.picture
-                            elif hasattr(shape.fill, 'picture') and shape.fill.picture:
-                                image_data = shape.fill.picture.blob
-                                if image_data and len(image_data) > 0:
-                                    image_base64 = base64.b64encode(image_data).decode('utf-8')
+                                # Try fill.image
+                                if hasattr(shape.fill, 'image') and shape.fill.image:
+                                    image_data = shape.fill.image.blob
+                                    if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
+                                        # Determine MIME type
+                                        mime_type = 'image/jpeg'
+                                        if image_data.startswith(b'\x89PNG'):
+                                            mime_type = 'image/png'
+                                        elif image_data.startswith(b'GIF'):
+                                            mime_type = 'image/gif'
                                     
-                                    # Determine MIME type
-                                    mime_type = 'image/jpeg'
-                                    if image_data.startswith(b'\x89PNG'):
-                                        mime_type = 'image/png'
-                                    elif image_data.startswith(b'GIF'):
-                                        mime_type = 'image/gif'
+                                        image_src = media_source(image_data, mime_type)
+                                        slides_log.debug("Extracted fill.image from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
+                            
+                                # Try fill.picture
+                                elif hasattr(shape.fill, 'picture') and shape.fill.picture:
+                                    image_data = shape.fill.picture.blob
+                                    if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
+                                        # Determine MIME type
+                                        mime_type = 'image/jpeg'
+                                        if image_data.startswith(b'\x89PNG'):
+                                            mime_type = 'image/png'
+                                        elif image_data.startswith(b'GIF'):
+                                            mime_type = 'image/gif'
                                     
-                                    image_src = f"data:{mime_type};base64,{image_base64}"
-                                    print(f"✅ Extracted fill.picture from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
+                                        image_src = media_source(image_data, mime_type)
+                                        slides_log.debug("Extracted fill.picture from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
                             
-                            # Try fill.blipFill (common in PowerPoint)
-                            elif hasattr(shape.fill, 'blipFill') and shape.fill.blipFill:
-                                if hasattr(shape.fill.blipFill, 'blip') and shape.fill.blipFill.blip:
-                                    if hasattr(shape.fill.blipFill.blip, 'blob'):
-                                        image_data = shape.fill.blipFill.blip.blob
-                                        if image_data and len(image_data) > 0:
-                                            image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                            
-                                            # Determine MIME type
-                                            mime_type = 'image/jpeg'
-                                            if image_data.startswith(b'\x89PNG'):
-                                                mime_type = 'image/png'
-                                            elif image_data.startswith(b'GIF'):
-                                                mime_type = 'image/gif'
+                                # Try fill.blipFill (common in PowerPoint)
+                                elif hasattr(shape.fill, 'blipFill') and shape.fill.blipFill:
+                                    if hasattr(shape.fill.blipFill, 'blip') and shape.fill.blipFill.blip:
+                                        if hasattr(shape.fill.blipFill.blip, 'blob'):
+                                            image_data = shape.fill.blipFill.blip.blob
+                                            if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
+                                                # Determine MIME type
+                                                mime_type = 'image/jpeg'
+                                                if image_data.startswith(b'\x89PNG'):
+                                                    mime_type = 'image/png'
+                                                elif image_data.startswith(b'GIF'):
+                                                    mime_type = 'image/gif'
                                             
-                                            image_src = f"data:{mime_type};base64,{image_base64}"
-                                            print(f"✅ Extracted fill.blipFill from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
+                                                image_src = media_source(image_data, mime_type)
+                                                slides_log.debug("Extracted fill.blipFill from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
                         
-                        elif hasattr(shape, 'fill') and hasattr(shape.fill, 'type') and shape.fill.type == 3:
-                            if hasattr(shape.fill, 'image') and shape.fill.image:
-                                image_data = shape.fill.image.blob
-                                if image_data and len(image_data) > 0:
-                                    image_base64 = base64.b64encode(image_data).decode('utf-8')
+                            elif hasattr(shape, 'fill') and hasattr(shape.fill, 'type') and shape.fill.type == 3:
+                                if hasattr(shape.fill, 'image') and shape.fill.image:
+                                    image_data = shape.fill.image.blob
+                                    if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
+                                        # Determine MIME type
+                                        mime_type = 'image/jpeg'
+                                        if image_data.startswith(b'\x89PNG'):
+                                            mime_type = 'image/png'
+                                        elif image_data.startswith(b'GIF'):
+                                            mime_type = 'image/gif'
                                     
+                                        image_src = media_source(image_data, mime_type)
+                                        slides_log.debug("Extracted fill image from shape %s (%s bytes, %s)", shape_idx, len(image_data), mime_type)
+                        
+                            elif hasattr(shape, 'image_part') and shape.image_part:
+                                image_data = shape.image_part.blob
+                                if image_data and guard.admit_inline(image_data, f"shape {shape_idx}"):
                                     # Determine MIME type
                                     mime_type = 'image/jpeg'
                                     if image_data.startswith(b'\x89PNG'):
                                         mime_type = 'image/png'
                                     elif image_data.startswith(b'GIF'):
                                         mime_type = 'image/gif'
-                                    
-                                    image_src = f"data:{mime_type};base64,{image_base64}"
-                                    print(f"✅ Extracted fill image from shape {shape_idx} ({len(image_data)} bytes, {mime_type})")
-                        
-                        elif hasattr(shape, 'image_part') and shape.image_part:
-                            image_data = shape.image_part.blob
-                            if image_data and len(image_data) > 0:
-                                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                                
-                                # Determine MIME type
-                                mime_type = 'image/jpeg'
-                                if image_data.startswith(b'\x89PNG'):
-                                    mime_type = 'image/png'
-                                elif image_data.startswith(b'GIF'):
-                                    mime_type = 'image/gif'
                                 
-                                image_src = f"data:{mime_type};base64,{image_base64}"
-                                print(f"✅ Extracted image_part from shape {shape_idx} ({len(image_data)} bytes)")
+                                    image_src = media_source(image_data, mime_type)
+                                    slides_log.debug("Extracted image_part from shape %s (%s bytes)", shape_idx, len(image_data))
                             
-                    except Exception as e:
-                        print(f"⚠️ Could not extract image directly: {e}")
+                        except Exception as e:
+                            slides_log.warning("Could not extract image directly: %s", e)
                         
-                        # Fallback: try to find image from our extracted images
-                        slide_images = [img_id for img_id in images.keys() if f"image_{slide_num}_" in img_id]
+                            # Fallback: try to find image from our extracted images
+                            slide_images = [img_id for img_id in images.keys() if f"image_{slide_num}_" in img_id]
                         
-                        if slide_images and image_index < len(slide_images):
-                            actual_image_id = slide_images[image_index]
-                            image_src = images[actual_image_id]
-                            image_index += 1
-                            print(f"✅ Assigned image {actual_image_id} to element")
-                        else:
-                            # Try any available image
-                            if images:
-                                image_src = list(images.values())[0]
-                                print(f"✅ Using fallback image")
+                            if slide_images and image_index < len(slide_images):
+                                actual_image_id = slide_images[image_index]
+                                image_src = images[actual_image_id]
+                                image_index += 1
+                                slides_log.debug("Assigned image %s to element", actual_image_id)
                             else:
-                                image_src = ""
-                                print(f"⚠️ No images available")
+                                # Try any available image
+                                if images:
+                                    image_src = list(images.values())[0]
+                                    slides_log.debug("Using fallback image")
+                                else:
+                                    image_src = ""
+                                    slides_log.debug("No images available")
                     
-                    # Only create image element if we have a valid src
-                    if image_src and len(image_src) > 100:  # Ensure it's a valid data URL
-                        element = {
-                            "id": f"image-{slide_num}-{shape_idx}",
-                            "type": "image",
-                            "x": int(shape.left.inches * 96),
-                            "y": int(shape.top.inches * 96),
-                            "width": max(int(shape.width.inches * 96), 300),
-                            "height": max(int(shape.height.inches * 96), 200),
-                            "src": image_src,
-                            "alt": f"Image from slide {slide_num + 1}",
-                            "rotation": 0,
-                            "zIndex": 1,
-                            "selected": False
-                        }
-                        slide_data["elements"].append(element)
-                        print(f"✅ Created image element with src length: {len(image_src)}")
-                        print(f"🔍 Image src preview: {image_src[:100]}...")
-                        print(f"🔍 Full image element: {element}")
-                    else:
-                        print(f"⚠️ Skipped image element - no valid src found")
+                        # Only create image element if we have a valid src
+                        if image_src and len(image_src) > 100:  # Ensure it's a valid data URL
+                            if budget:
+                                budget.charge(len(image_src), f"image on slide {slide_num + 1}")
+                            element = {
+                                "id": element_id("image", slide, shape),
+                                "type": "image",
+                                "x": x,
+                                "y": y,
+                                "width": max(width, 300),
+                                "height": max(height, 200),
+                                "src": image_src,
+                                "alt": f"Image from slide {slide_num + 1}",
+                                "rotation": 0,
+                                "zIndex": 1,
+                                "selected": False
+                            }
+                            slide_data["elements"].append(element)
+                            slides_log.debug("Created image element with src length: %s", len(image_src))
+                            slides_log.debug("Image src preview: %.100s...", image_src)
+                            slides_log.debug("Full image element: %s", element)
+                        else:
+                            slides_log.debug("Skipped image element - no valid src found")
                 
-                # Handle other shape types (lines, rectangles, etc.)
-                else:
-                    # This is a non-text, non-image shape
-                    shape_type = type(shape).__name__
-                    print(f"🔍 Processing {shape_type} shape {shape_idx}")
-                    
-                    # Extract position and size
-                    x = int(shape.left.inches * 96) if hasattr(shape, 'left') and shape.left else 0
-                    y = int(shape.top.inches * 96) if hasattr(shape, 'top') and shape.top else 0
-                    width = int(shape.width.inches * 96) if hasattr(shape, 'width') and shape.width else 100
-                    height = int(shape.height.inches * 96) if hasattr(shape, 'height') and shape.height else 50
-                    
-                    # Extract fill color
-                    fill_color = "transparent"  # Default transparent for shapes without fill
-                    try:
-                        if hasattr(shape, 'fill') and shape.fill:
-                            # Check if it's a solid fill
-                            if hasattr(shape.fill, 'type') and shape.fill.type == 1:  # Solid fill
-                                if hasattr(shape.fill, 'solid_color') and shape.fill.solid_color:
-                                    color = shape.fill.solid_color
-                                    if hasattr(color, 'rgb') and color.rgb:
-                                        rgb = color.rgb
-                                        if hasattr(rgb, 'red') and hasattr(rgb, 'green') and hasattr(rgb, 'blue'):
-                                            fill_color = f"#{rgb.red:02x}{rgb.green:02x}{rgb.blue:02x}"
-                                elif hasattr(shape.fill, 'fore_color') and shape.fill.fore_color:
-                                    color = shape.fill.fore_color
-                                    if hasattr(color, 'rgb') and color.rgb:
-                                        rgb = color.rgb
-                                        if hasattr(rgb, 'red') and hasattr(rgb, 'green') and hasattr(rgb, 'blue'):
-                                            fill_color = f"#{rgb.red:02x}{rgb.green:02x}{rgb.blue:02x}"
-                            else:
-                                # For non-solid fills, use transparent
-                                fill_color = "transparent"
-                    except Exception as e:
-                        print(f"⚠️ Could not extract fill color: {e}")
-                        fill_color = "transparent"
-                    
-                    # Extract stroke color and width
-                    stroke_color = "#000000"  # Default black
-                    stroke_width = 1
-                    try:
-                        if hasattr(shape, 'line') and shape.line:
-                            if hasattr(shape.line, 'color') and shape.line.color:
-                                if hasattr(shape.line.color, 'rgb') and shape.line.color.rgb:
-                                    rgb = shape.line.color.rgb
-                                    if hasattr(rgb, 'red') and hasattr(rgb, 'green') and hasattr(rgb, 'blue'):
-                                        stroke_color = f"#{rgb.red:02x}{rgb.green:02x}{rgb.blue:02x}"
-                            if hasattr(shape.line, 'width') and shape.line.width:
-                                stroke_width = int(shape.line.width.pt) if hasattr(shape.line.width, 'pt') else 1
-                    except Exception as e:
-                        print(f"⚠️ Could not extract stroke properties: {e}")
+                    # Handle other shape types (lines, rectangles, etc.)
+                    else:
+                        # This is a non-text, non-image shape
+                        shape_type = type(shape).__name__
+                        slides_log.debug("Processing %s shape %s", shape_type, shape_idx)
                     
-                    # Determine element type based on shape
-                    element_type = "rectangle"  # Default
-                    if shape_type == "Line" or (hasattr(shape, 'shape_type') and shape.shape_type == 1):
-                        element_type = "line"
-                    elif shape_type == "Rectangle" or (hasattr(shape, 'shape_type') and shape.shape_type == 1):
-                        element_type = "rectangle"
-                    elif shape_type == "Oval" or (hasattr(shape, 'shape_type') and shape.shape_type == 9):
-                        element_type = "circle"
+                        # Extract position and size
+                        x, y, width, height = place(shape, transform, default=(0, 0, 100, 50), geometry=geometry)
                     
-                    # Create the element
-                    element = {
-                        "id": f"{element_type}-{slide_num}-{shape_idx}",
-                        "type": element_type,
-                        "x": x,
-                        "y": y,
-                        "width": width,
-                        "height": height,
-                        "fill": fill_color,
-                        "stroke": stroke_color,
-                        "strokeWidth": stroke_width,
-                        "rotation": 0,
-                        "zIndex": 1,
-                        "selected": False
-                    }
+                        # Extract fill and stroke colours: RGB, theme colours or the shape style's
+                        fill_color = theme.fill(shape._element, master) or "transparent"
+                        stroke_color = theme.line(shape._element, master) or "#000000"
+                        stroke_width = 1
+                        try:
+                            if hasattr(shape, 'line') and shape.line:
+                                if hasattr(shape.line, 'width') and shape.line.width:
+                                    stroke_width = int(shape.line.width.pt) if hasattr(shape.line.width, 'pt') else 1
+                        except Exception as e:
+                            slides_log.warning("Could not extract stroke properties: %s", e)
                     
-                    slide_data["elements"].append(element)
-                    print(f"✅ Created {element_type} element: pos({x},{y}) size({width}x{height}) fill({fill_color}) stroke({stroke_color})")
-            
-            # Add any unmapped images to this slide
-            for img in images:
-                if img.get('slide_index') == slide_num:
-                    # Check if this image is already added as an element
-                    image_already_added = any(
-                        element.get('type') == 'image' and 
-                        element.get('x') == img['x'] and 
-                        element.get('y') == img['y']
-                        for element in slide_data['elements']
-                    )
+                        # Determine element type based on shape
+                        element_type = "rectangle"  # Default
+                        if shape_type == "Line" or (hasattr(shape, 'shape_type') and shape.shape_type == 1):
+                            element_type = "line"
+                        elif shape_type == "Rectangle" or (hasattr(shape, 'shape_type') and shape.shape_type == 1):
+                            element_type = "rectangle"
+                        elif shape_type == "Oval" or (hasattr(shape, 'shape_type') and shape.shape_type == 9):
+                            element_type = "circle"
                     
-                    if not image_already_added:
+                        # Create the element
                         element = {
-                            "id": f"image-{slide_num}-{img.get('shape_index', 'unmapped')}",
-                            "type": "image",
-                            "x": img['x'],
-                            "y": img['y'],
-                            "width": img['width'],
-                            "height": img['height'],
-                            "src": img['src'],
-                            "alt": f"Image from slide {slide_num + 1}",
+                            "id": element_id(element_type, slide, shape),
+                            "type": element_type,
+                            "x": x,
+                            "y": y,
+                            "width": width,
+                            "height": height,
+                            "fill": fill_color,
+                            "stroke": stroke_color,
+                            "strokeWidth": stroke_width,
                             "rotation": 0,
                             "zIndex": 1,
                             "selected": False
                         }
+                    
                         slide_data["elements"].append(element)
-                        print(f"✅ Added unmapped image to slide {slide_num}: pos({img['x']},{img['y']}) size({img['width']}x{img['height']})")
+                        slides_log.debug("Created %s element: pos(%s,%s) size(%sx%s) fill(%s) stroke(%s)", element_type, x, y, width, height, fill_color, stroke_color)
             
-            slides.append(slide_data)
-        
-        # Get presentation dimensions
-        slide_width = int(prs.slide_width.inches * 96) if hasattr(prs, 'slide_width') and prs.slide_width else 960
-        slide_height = int(prs.slide_height.inches * 96) if hasattr(prs, 'slide_height') and prs.slide_height else 540
+                # Add any unmapped images to this slide
+                for img in images:
+                    if img.get('slide_index') == slide_num:
+                        # Check if this image is already added as an element
+                        image_already_added = any(
+                            element.get('type') == 'image' and 
+                            element.get('x') == img['x'] and 
+                            element.get('y') == img['y']
+                            for element in slide_data['elements']
+                        )
+                    
+                        if not image_already_added:
+                            shape_index = img.get('shape_index')
+                            element = {
+                                "id": (element_id("image", slide, flat_shapes[shape_index][0])
+                                       if isinstance(shape_index, int) and shape_index < len(flat_shapes)
+                                       else media_element_id(slide, img['src'])),
+                                "type": "image",
+                                "x": img['x'],
+                                "y": img['y'],
+                                "width": img['width'],
+                                "height": img['height'],
+                                "src": img['src'],
+                                "alt": f"Image from slide {slide_num + 1}",
+                                "rotation": 0,
+                                "zIndex": 1,
+                                "selected": False
+                            }
+                            slide_data["elements"].append(element)
+                            slides_log.debug("Added unmapped image to slide %s: pos(%s,%s) size(%sx%s)", slide_num, img['x'], img['y'], img['width'], img['height'])
+            
+                seal_ids(slide_data["elements"])
+                slides.append(slide_data)
         
         result = {
-            "title": os.path.basename(pptx_path).replace('.pptx', ''),
+            "title": (title or os.path.basename(getattr(pptx_path, 'name', None) or str(pptx_path))).replace('.pptx', ''),
             "slides": slides,
             "metadata": {
                 "total_slides": len(slides),
@@ -1461,77 +1540,313 @@ def parse_pptx_to_json(pptx_path):
                 "presentation_height": slide_height
             }
         }
+        if backgrounds.table:
+            result["backgrounds"] = backgrounds.table
+        if guard.rejected:
+            result["metadata"]["rejected_media"] = guard.rejected
+        if compact:
+            result = compact_schema.compact(result)
         
         # Optimize content for Firebase size limits
-        optimized_result, final_size_mb = optimize_content_for_firebase(result, max_size_mb=0.9)
+        if optimize:
+            with stage('optimize'):
+                optimized_result, final_size_mb = optimize_content_for_firebase(result, max_size_mb=0.9,
+                                                                                streaming=budget is not None)
+        else:
+            optimized_result, final_size_mb = result, json_size(result, budget is not None) / (1024 * 1024)
         
+        total_elements = sum(len(slide['elements']) for slide in slides)
+        log.info(
+            "Parsed %s: %d slides, %d elements, %d images, %.2f MB in %.2fs",
+            result['title'], len(slides), total_elements, len(images), final_size_mb,
+            time.perf_counter() - started,
+            extra={'slides': len(slides), 'elements': total_elements, 'images': len(images),
+                   'size_mb': round(final_size_mb, 3), 'duration_s': round(time.perf_counter() - started, 3)},
+        )
         return optimized_result
         
+    except (MemoryBudgetExceeded, UnsafeDeckError):
+        raise
     except Exception as e:
-        print(f"❌ Error parsing PPTX: {e}")
+        log.exception("Error parsing PPTX: %s", e)
         return {
             "title": "Error",
             "slides": [],
             "metadata": {"error": str(e)}
         }
 
-@app.route('/api/parse-pptx', methods=['POST'])
+def get_uploaded_pptx():
+    """
+    Validate the 'file' upload of the current request.
+    Returns (file, None) or (None, error response).
+    """
+    if 'file' not in request.files:
+        return None, (jsonify({'error': 'No file uploaded'}), 400)
+    
+    file = request.files['file']
+    if file.filename == '':
+        return None, (jsonify({'error': 'No file selected'}), 400)
+    
+    if not file.filename.lower().endswith('.pptx'):
+        return None, (jsonify({'error': 'File must be a PPTX file'}), 400)
+    
+    # The upload was received into a spooled buffer; hand that handle to the parser as is
+    file.stream.seek(0)
+    return file, None
+
+def wants_compact():
+    """True when the client asked for the compact schema (?schema=compact)"""
+    return request.args.get('schema') == 'compact'
+
+def wants_sharded():
+    """True when the client asked for Firestore shards (?layout=sharded)"""
+    return request.args.get('layout') == 'sharded'
+
+def wants_thumbnails():
+    """True when the client asked for slide thumbnails (?thumbnails=1)"""
+    return request.args.get('thumbnails') in ('1', 'true')
+
+def upload_too_large(limit_mb=MAX_UPLOAD_MB):
+    return jsonify({'error': f'File too large (maximum {limit_mb:.0f} MB)'}), 413
+
+@api.route('/api/parse-pptx', methods=['POST'])
 def parse_pptx():
     """Parse uploaded PPTX file"""
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
+        file, error = get_uploaded_pptx()
+        if error:
+            return error
         
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        try:
+            external_media = request.args.get('media') == 'external'
+            sharded = wants_sharded()
+            # JSON, or MessagePack / multipart with raw image bytes (see binary_transport.py);
+            # shards are Firestore documents and always JSON
+            response_format = JSON_MIMETYPE if sharded else negotiate()
+            etag = make_etag(upload_digest(file.stream), PARSER_VERSION, file.filename,
+                             wants_compact(), external_media and near_duplicate_index() is not None,
+                             external_media, sharded, response_format, wants_thumbnails())
+            if etag_matches(etag):
+                response = precondition_failed(etag)
+                response.vary.add('Accept')
+                return response
+            
+            # Parse the PPTX file
+            if response_format == JSON_MIMETYPE:
+                result = parse_pptx_to_json(file.stream, title=file.filename, compact=wants_compact(),
+                                            optimize=not sharded)
+            else:
+                with binary_media():
+                    result = parse_pptx_to_json(file.stream, title=file.filename, compact=wants_compact())
+            if wants_thumbnails() and not result.get('metadata', {}).get('error'):
+                # Rendered while images are still inline
+                attach_thumbnails(result, get_media_store())
+            if external_media:
+                offload_media(result, get_media_store(), similar=near_duplicate_index())
+            if sharded and not result.get('metadata', {}).get('error'):
+                result = firestore_shards.shard(result)
+            
+            if response_format == JSON_MIMETYPE:
+                response = jsonify(result)
+            else:
+                response = binary_response(result, response_format)
+            response.vary.add('Accept')
+            if not result.get('metadata', {}).get('error'):
+                response.set_etag(etag)
+            return response
+        except MemoryBudgetExceeded as e:
+            api_log.warning("Rejected %s: %s", file.filename, e)
+            return jsonify({'error': str(e)}), 413
+        except UnsafeDeckError as e:
+            api_log.warning("Rejected %s: %s", file.filename, e)
+            return jsonify({'error': f'Unsafe PPTX: {e}'}), 422
+        except firestore_shards.ShardTooLarge as e:
+            api_log.warning("Cannot shard %s: %s", file.filename, e)
+            return jsonify({'error': str(e)}), 422
+        finally:
+            file.close()
+            
+    except RequestEntityTooLarge:
+        return upload_too_large()
+    except Exception as e:
+        api_log.exception("Error handling parse request: %s", e)
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@api.route('/api/parse-pptx-diff', methods=['POST'])
+def parse_pptx_diff():
+    """
+    Parse an updated PPTX ('file') and return only what changed relative to a
+    previous parse or sharded manifest ('previous', a JSON file or form field);
+    see parse_diff.py
+    """
+    try:
+        file, error = get_uploaded_pptx()
+        if error:
+            return error
+        
+        try:
+            previous_upload = request.files.get('previous')
+            previous = previous_upload.read() if previous_upload else request.form.get('previous')
+            if not previous:
+                return jsonify({'error': 'No previous parse provided'}), 400
+            try:
+                previous = serializer.loads(previous)
+            except ValueError:
+                return jsonify({'error': 'Previous parse is not valid JSON'}), 400
+            
+            result = parse_pptx_to_json(file.stream, title=file.filename, optimize=False)
+            if result.get('metadata', {}).get('error'):
+                return jsonify({'error': result['metadata']['error']}), 500
+            if request.args.get('media') == 'external':
+                offload_media(result, get_media_store(), similar=near_duplicate_index())
+            
+            changes = parse_diff.diff(previous, result)
+            api_log.info("Diffed %s: %d added, %d removed, %d changed, %d unchanged", file.filename,
+                         len(changes['added']), len(changes['removed']), len(changes['changed']),
+                         changes['unchanged'])
+            return jsonify(changes)
+        except MemoryBudgetExceeded as e:
+            api_log.warning("Rejected %s: %s", file.filename, e)
+            return jsonify({'error': str(e)}), 413
+        except UnsafeDeckError as e:
+            api_log.warning("Rejected %s: %s", file.filename, e)
+            return jsonify({'error': f'Unsafe PPTX: {e}'}), 422
+        finally:
+            file.close()
+            
+    except RequestEntityTooLarge:
+        return upload_too_large()
+    except Exception as e:
+        api_log.exception("Error handling diff request: %s", e)
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@api.route('/api/slide-thumbnail', methods=['POST'])
+def slide_thumbnail():
+    """
+    WebP thumbnail of one parsed slide, rendered on first request. The JSON body
+    is {"slide": {...}, "backgrounds": [...], "slide_width": 960, "slide_height": 540,
+    "width": 320}, all but slide optional; see thumbnails.py
+    """
+    try:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('slide'), dict):
+            return jsonify({'error': 'No slide provided'}), 400
+        try:
+            sizes = {name: int(body.get(name) or default) for name, default in
+                     (('slide_width', 960), ('slide_height', 540), ('width', THUMBNAIL_WIDTH))}
+        except (TypeError, ValueError):
+            sizes = None
+        if sizes is None or min(sizes.values()) <= 0:
+            return jsonify({'error': 'slide_width, slide_height and width must be positive integers'}), 400
+        slide_size = (sizes['slide_width'], sizes['slide_height'])
+        width = min(sizes['width'], MAX_THUMBNAIL_WIDTH)
+        if thumbnail_height(slide_size, width) > MAX_THUMBNAIL_HEIGHT:
+            return jsonify({'error': f'Thumbnail would be more than {MAX_THUMBNAIL_HEIGHT} px high'}), 400
         
-        if not file.filename.lower().endswith('.pptx'):
-            return jsonify({'error': 'File must be a PPTX file'}), 400
+        store = get_media_store()
+        renderer = ThumbnailRenderer(slide_size, body.get('backgrounds'), store, width)
+        key = renderer.key(body['slide'])
+        etag = os.path.splitext(key)[0]
+        if etag_matches(etag):
+            return precondition_failed(etag)
+        if store.exists(key):
+            return redirect(store.url(key), code=303)
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pptx') as tmp_file:
-            file.save(tmp_file.name)
-            tmp_path = tmp_file.name
+        data = renderer.render(body['slide'])
+        store.put(key, data, THUMBNAIL_MIME)
+        response = Response(data, mimetype=THUMBNAIL_MIME)
+        response.set_etag(etag)
+        response.headers['Location'] = store.url(key)
+        response.cache_control.max_age = MEDIA_MAX_AGE
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    except RequestEntityTooLarge:
+        return upload_too_large()
+    except Exception as e:
+        api_log.exception("Error rendering thumbnail: %s", e)
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@api.route('/api/export-pptx', methods=['POST'])
+def export_pptx():
+    """
+    PPTX for a parse result (full, compact or sharded JSON body), streamed as
+    each slide is written; images at media store URLs are read from the store.
+    The body is loaded whole, inline images included. See pptx_export.py
+    """
+    try:
+        result = request.get_json(silent=True)
+        if not isinstance(result, dict) or not (result.get('slides') or result.get('manifest')):
+            return jsonify({'error': 'No presentation provided'}), 400
         
+        title = (result.get('manifest') or result).get('title') or 'presentation'
+        filename = ''.join(char for char in title if char.isascii() and (char.isalnum() or char in ' -_')).strip() or 'presentation'
+        api_log.info("Exporting %s", title)
+        return Response(stream_pptx(result, get_media_store()), mimetype=PPTX_MIMETYPE,
+                        headers={'Content-Disposition': f'attachment; filename="{filename}.pptx"'})
+    except RequestEntityTooLarge:
+        return upload_too_large()
+    except Exception as e:
+        api_log.exception("Error exporting PPTX: %s", e)
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@api.route('/api/parse-pptx-batch', methods=['POST'])
+def parse_pptx_batch():
+    """
+    Parse several PPTX files ('files' parts or a ZIP 'archive') in the worker
+    pool; streams NDJSON results as each deck finishes (see batch_import.py)
+    """
+    try:
+        workdir = tempfile.TemporaryDirectory(prefix='pptx-batch-')
         try:
-            # Parse the PPTX file
-            result = parse_pptx_to_json(tmp_path)
-            return jsonify(result)
-        finally:
-            # Clean up temporary file
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+            items = collect_batch(request.files.getlist('files'), request.files.get('archive'), workdir.name)
+        except ValueError as e:
+            workdir.cleanup()
+            return jsonify({'error': str(e)}), 400
+        except UnsafeDeckError as e:
+            workdir.cleanup()
+            return jsonify({'error': f'Unsafe archive: {e}'}), 422
+        except BaseException:
+            workdir.cleanup()
+            raise
+        
+        api_log.info("Batch import of %d files", len(items))
+        parse = functools.partial(parse_pptx_to_json, compact=wants_compact())
+        return Response(stream_batch(items, parse, workdir), mimetype='application/x-ndjson')
             
+    except RequestEntityTooLarge:
+        return upload_too_large(MAX_BATCH_UPLOAD_MB)
     except Exception as e:
+        api_log.exception("Error handling batch request: %s", e)
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/media/<path:filename>', methods=['GET'])
+def media(filename):
+    """Serve content-addressed media written by ?media=external parses (filesystem store)"""
+    if os.path.basename(filename).startswith('.'):
+        # e.g. the perceptual index (media_similarity.py)
+        return jsonify({'error': 'Not found'}), 404
+    response = send_from_directory(os.path.abspath(MEDIA_DIR), filename, max_age=MEDIA_MAX_AGE,
+                                   etag=os.path.splitext(filename)[0])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy', 'message': 'PPTX Parser API is running'})
 
-@app.route('/api/debug-shapes', methods=['POST'])
+@api.route('/api/debug-shapes', methods=['POST'])
 def debug_shapes():
     """Debug endpoint to show what shapes are in a PPTX file"""
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if not file.filename.lower().endswith('.pptx'):
-            return jsonify({'error': 'File must be a PPTX file'}), 400
-        
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pptx') as tmp_file:
-            file.save(tmp_file.name)
-            tmp_path = tmp_file.name
+        file, error = get_uploaded_pptx()
+        if error:
+            return error
         
         try:
-            prs = Presentation(tmp_path)
+            prs = Presentation(file.stream)
             debug_info = {
                 'total_slides': len(prs.slides),
                 'slides': []
@@ -1562,12 +1877,63 @@ def debug_shapes():
             return jsonify(debug_info)
             
         finally:
-            # Clean up temporary file
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+            file.close()
             
+    except RequestEntityTooLarge:
+        return upload_too_large()
     except Exception as e:
+        api_log.exception("Error handling debug-shapes request: %s", e)
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+def warm_up():
+    """
+    Parse a tiny generated deck once so python-pptx, lxml and the PIL codecs are
+    imported and initialised. The production launcher runs this in the master
+    before forking workers, so every worker starts warm and shares those pages.
+    """
+    from pptx.util import Inches
+    
+    deck = Presentation()
+    slide = deck.slides.add_slide(deck.slide_layouts[6])
+    slide.shapes.add_textbox(Inches(1), Inches(1), Inches(4), Inches(1)).text_frame.text = "Warm-up"
+    for image_format in ('PNG', 'JPEG'):
+        image_bytes = BytesIO()
+        Image.new('RGB', (64, 64), (200, 80, 40)).save(image_bytes, format=image_format)
+        image_bytes.seek(0)
+        slide.shapes.add_picture(image_bytes, Inches(1), Inches(2))
+    
+    deck_bytes = BytesIO()
+    deck.save(deck_bytes)
+    deck_bytes.seek(0)
+    started = time.perf_counter()
+    parse_pptx_to_json(deck_bytes, title='warm-up')
+    log.info("Warm-up parse finished in %.2fs", time.perf_counter() - started)
+
+def create_app(config=None, warm=False):
+    """
+    Application factory. gunicorn loads it as "app:create_app()" (see
+    gunicorn.conf.py); config overrides Flask settings, warm runs warm_up().
+    """
+    flask_app = Flask(__name__)
+    flask_app.request_class = SpooledUploadRequest
+    flask_app.json = serializer.JSONProvider(flask_app)
+    flask_app.after_request(compress_response)
+    flask_app.config['MAX_CONTENT_LENGTH'] = int(MAX_UPLOAD_MB * 1024 * 1024)
+    if config:
+        flask_app.config.update(config)
+    # Let the frontend read validators for If-None-Match revalidation
+    CORS(flask_app, expose_headers=['ETag'])
+    flask_app.register_blueprint(api)
+    
+    if warm:
+        warm_up()
+        # Everything allocated so far is long-lived; keep the collector from touching
+        # (and so un-sharing) those pages in forked workers
+        gc.freeze()
+    return flask_app
+
+# Development server and existing imports (python3 app.py, "from app import app")
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Slide backgrounds (slide -> layout -> master)
+
+A slide without a ``p:bg`` of its own shows its layout's, and a layout
+without one shows its master's. BackgroundResolver follows that chain; each
+layout's and master's background is resolved once per presentation, so a
+slide costs one lookup of its own ``p:bg`` plus a dict hit:
+
+    backgrounds = BackgroundResolver(theme, (960, 540))
+    color, image = backgrounds.resolve(slide)    # '#1f3864', None  or  '#ffffff', '3f2a...9c.jpg'
+    result['backgrounds'] = backgrounds.table    # [{"id", "src", "width", "height"}, ...]
+
+A solid fill gives its colour, a gradient the colour of its first stop (the
+editor only has solid backgrounds) and a theme background style (``p:bgRef``)
+the colour it is given. A picture background is decoded and rendered at slide
+resolution once, however many slides use it, and stored once in the result's
+``backgrounds`` table; slides refer to it by ID as ``"backgroundImage"``. The
+ID is the rendition's content hash (media_storage.media_filename), so an
+identical image behind several masters is stored once too.
+"""
+
+from io import BytesIO
+
+from PIL import Image
+from pptx.oxml.ns import qn
+
+from binary_transport import media_source
+from media_storage import media_filename
+from parser_logging import get_logger
+
+log = get_logger('slides')
+
+DEFAULT_COLOR = '#ffffff'
+BACKGROUND_QUALITY = 80
+
+_C_SLD, _BG, _BG_PR, _BG_REF = (qn(tag) for tag in ('p:cSld', 'p:bg', 'p:bgPr', 'p:bgRef'))
+_SOLID_FILL, _GRAD_FILL, _BLIP_FILL, _BLIP, _GS_LST = (qn(tag) for tag in ('a:solidFill', 'a:gradFill', 'a:blipFill', 'a:blip', 'a:gsLst'))
+_EMBED = qn('r:embed')
+_BLIPS = f"{qn('p:cSld')}//{qn('a:blip')}"
+
+
+def _bg(owner):
+    c_sld = owner._element.find(_C_SLD)
+    return c_sld.find(_BG) if c_sld is not None else None
+
+
+def _background_part(owner, bg):
+    """Image part of a picture background, or None"""
+    blip_fill = bg.find(_BG_PR).find(_BLIP_FILL) if bg.find(_BG_PR) is not None else None
+    blip = blip_fill.find(_BLIP) if blip_fill is not None else None
+    if blip is None or blip.get(_EMBED) is None:
+        return None
+    try:
+        return owner.part.related_part(blip.get(_EMBED))
+    except KeyError:
+        return None
+
+
+def background_media(prs):
+    """
+    ZIP member names of images used only as slide, layout or master
+    backgrounds, which the media extraction can leave to BackgroundResolver
+    """
+    background, elsewhere = set(), set()
+    for master in prs.slide_masters:
+        for owner in [master, *master.slide_layouts]:
+            bg = _bg(owner)
+            part = _background_part(owner, bg) if bg is not None else None
+            if part is not None:
+                background.add(str(part.partname).lstrip('/'))
+    for slide in prs.slides:
+        bg = _bg(slide)
+        part = _background_part(slide, bg) if bg is not None else None
+        if part is not None:
+            background.add(str(part.partname).lstrip('/'))
+        own_blips = set(bg.iter(_BLIP)) if bg is not None else set()
+        for blip in slide._element.iterfind(_BLIPS):
+            if blip.get(_EMBED) is not None and blip not in own_blips:
+                try:
+                    elsewhere.add(str(slide.part.related_part(blip.get(_EMBED)).partname).lstrip('/'))
+                except KeyError:
+                    pass
+    return background - elsewhere
+
+
+class BackgroundResolver:
+    """
+    Effective slide backgrounds of one presentation; size is the slide size in
+    px, guard a MediaGuard and budget a MemoryBudget for picture backgrounds
+    """
+
+    def __init__(self, theme, size, guard=None, budget=None):
+        self.theme = theme
+        self.size = size
+        self.guard = guard
+        self.budget = budget
+        self.table = []
+        self._inherited = {}    # layout or master partname -> (color, image ID)
+        self._images = {}       # image partname -> image ID, None if it couldn't be used
+
+    def _own(self, owner, master):
+        """(color, image ID) set by owner's own p:bg, or None if it has none"""
+        bg = _bg(owner)
+        if bg is None:
+            return None
+        bg_pr = bg.find(_BG_PR)
+        if bg_pr is None:
+            bg_ref = bg.find(_BG_REF)
+            color = bg_ref[0] if bg_ref is not None and len(bg_ref) else None
+            return self.theme.resolve(color, master) or DEFAULT_COLOR, None
+        for fill in bg_pr:
+            if fill.tag == _SOLID_FILL:
+                return self.theme.resolve(fill[0] if len(fill) else None, master) or DEFAULT_COLOR, None
+            if fill.tag == _GRAD_FILL:
+                stops = fill.find(_GS_LST)
+                stop = stops[0] if stops is not None and len(stops) else None
+                color = stop[0] if stop is not None and len(stop) else None
+                return self.theme.resolve(color, master) or DEFAULT_COLOR, None
+            if fill.tag == _BLIP_FILL:
+                part = _background_part(owner, bg)
+                return DEFAULT_COLOR, self._image(part) if part is not None else None
+        return DEFAULT_COLOR, None
+
+    def _layout(self, layout):
+        key = layout.part.partname
+        if key not in self._inherited:
+            master = layout.slide_master
+            inherited = self._own(layout, master)
+            if inherited is None:
+                master_key = master.part.partname
+                if master_key not in self._inherited:
+                    self._inherited[master_key] = self._own(master, master) or (DEFAULT_COLOR, None)
+                inherited = self._inherited[master_key]
+            self._inherited[key] = inherited
+        return self._inherited[key]
+
+    def resolve(self, slide):
+        """(CSS colour, background image ID or None) of slide"""
+        layout = slide.slide_layout
+        return self._own(slide, layout.slide_master) or self._layout(layout)
+
+    def _image(self, part):
+        """ID of the slide-sized rendition of an image part, rendered the first time it's seen"""
+        key = part.partname
+        if key in self._images:
+            return self._images[key]
+        self._images[key] = None
+        blob = part.blob
+        if self.guard is not None:
+            max_pixels = self.budget.max_decode_pixels() if self.budget else None
+            if not self.guard.admit(str(key), blob, max_pixels=max_pixels).accepted:
+                return None
+        try:
+            data, width, height = self._render(blob)
+        except Exception as e:
+            log.warning("Could not render background %s: %s", key, e)
+            return None
+
+        image_id = media_filename(data, 'image/jpeg')
+        if not any(entry['id'] == image_id for entry in self.table):
+            src = media_source(data, 'image/jpeg')
+            if self.budget:
+                self.budget.charge(len(src), str(key))
+            self.table.append({'id': image_id, 'src': src, 'width': width, 'height': height})
+            log.debug("Rendered background %s at %dx%d (%.1f KB)", key, width, height, len(data) / 1024)
+        self._images[key] = image_id
+        return image_id
+
+    def _render(self, blob):
+        """JPEG of the image scaled down to the slide size (it is stretched over the slide)"""
+        image = Image.open(BytesIO(blob))
+        width, height = self.size
+        if image.format == 'JPEG':
+            # Decode at the smallest scale that still covers the slide
+            image.draft('RGB', (width, height))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            flattened = Image.new('RGB', image.size, (255, 255, 255))
+            flattened.paste(image, mask=image.split()[-1])
+            image = flattened
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.width > width or image.height > height:
+            image = image.resize((min(image.width, width), min(image.height, height)), Image.Resampling.LANCZOS)
+        output = BytesIO()
+        image.save(output, format='JPEG', quality=BACKGROUND_QUALITY, optimize=True)
+        return output.getvalue(), image.width, image.height
@@ -0,0 +1,230 @@
+"""
+Batch import: parse many decks in one request
+
+Decks arrive either as several ``files`` parts of a multipart upload or as one
+ZIP of .pptx files (``archive``). Each deck is written to a batch temp
+directory and parsed in a process pool. Media shared between decks (the same
+logo or background on every template) is sent once per batch. Results stream
+back as NDJSON lines in completion order:
+
+    {"type": "media", "id": "<hash>", "src": "data:image/png;base64,..."}
+    {"type": "file", "index": 0, "name": "a.pptx", "status": "ok", "result": {...}}
+    {"type": "file", "index": 1, "name": "b.pptx", "status": "error", "code": 422, "error": "..."}
+    {"type": "summary", "files": 2, "succeeded": 1, "failed": 1, ...}
+
+Image elements in file results reference batch media as ``"src": "media:<hash>"``;
+the media line always comes before the first file line that uses it.
+
+    PPTX_BATCH_WORKERS        parser processes (default: one per core)
+    PPTX_BATCH_MAX_FILES      decks per batch (default 100)
+"""
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Optional
+
+from binary_transport import media_elements
+from media_guard import MediaGuard, UnsafeDeckError
+from memory_budget import MemoryBudgetExceeded
+from parser_logging import get_logger
+import serializer
+
+log = get_logger('api')
+
+BATCH_WORKERS = int(os.environ.get('PPTX_BATCH_WORKERS', 0)) or multiprocessing.cpu_count()
+BATCH_MAX_FILES = int(os.environ.get('PPTX_BATCH_MAX_FILES', 100))
+
+MEDIA_PREFIX = 'media:'
+
+_pool = None
+_pool_pid = None
+
+
+@dataclass
+class BatchItem:
+    index: int
+    name: str
+    path: Optional[str] = None
+    error: Optional[str] = None  # set for inputs rejected before parsing
+
+
+def get_pool():
+    """
+    Per-process parser pool, created on first use. Forked children inherit the
+    already-imported (and, under gunicorn, warmed-up) parser modules.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=context)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def _discard_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def collect_batch(files, archive, directory):
+    """
+    Write the uploaded decks into ``directory`` and return them as BatchItems.
+    Raises ValueError for an empty or oversized batch and UnsafeDeckError for an
+    archive that fails the ZIP guard.
+    """
+    items = []
+
+    def add(name, source):
+        index = len(items)
+        if len(items) >= BATCH_MAX_FILES:
+            raise ValueError(f'Too many files in batch (maximum {BATCH_MAX_FILES})')
+        if not name.lower().endswith('.pptx'):
+            items.append(BatchItem(index, name, error='File must be a PPTX file'))
+            return
+        # Index-prefixed base name: archive paths can't escape the directory or collide
+        path = os.path.join(directory, f'{index:04d}-{os.path.basename(name)}')
+        with open(path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        items.append(BatchItem(index, name, path))
+
+    for file in files:
+        if file.filename:
+            add(file.filename, file.stream)
+
+    if archive is not None and archive.filename:
+        archive.stream.seek(0)
+        MediaGuard().check_archive(archive.stream)
+        with zipfile.ZipFile(archive.stream) as zip_file:
+            for info in zip_file.infolist():
+                name = info.filename
+                if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith('.'):
+                    continue
+                with zip_file.open(info) as source:
+                    add(name, source)
+
+    if not items:
+        raise ValueError('No files uploaded')
+    return items
+
+
+def parse_batch_file(parse, path, title):
+    """Pool task: parse one deck and return (status code, result or error message)"""
+    try:
+        result = parse(path, title=title)
+    except MemoryBudgetExceeded as e:
+        return 413, str(e)
+    except UnsafeDeckError as e:
+        return 422, f'Unsafe PPTX: {e}'
+    except Exception as e:
+        return 500, str(e)
+    if result.get('metadata', {}).get('error'):
+        return 500, result['metadata']['error']
+    return 200, result
+
+
+def media_id(src):
+    return hashlib.blake2b(src.encode('ascii', 'ignore'), digest_size=16).hexdigest()
+
+
+class MediaIndex:
+    """Media seen so far in a batch, keyed by content hash"""
+
+    def __init__(self):
+        self.seen = set()
+        self.references = 0
+        self.bytes_saved = 0
+
+    def externalize(self, result):
+        """
+        Replace inline image data in ``result`` with media references and return
+        the media entries not sent earlier in this batch.
+        """
+        new_media = []
+        for element in media_elements(result):
+            src = element.get('src')
+            if not (isinstance(src, str) and src.startswith('data:')):
+                continue
+            key = media_id(src)
+            self.references += 1
+            if key in self.seen:
+                self.bytes_saved += len(src)
+            else:
+                self.seen.add(key)
+                new_media.append({'type': 'media', 'id': key, 'src': src})
+            element['src'] = MEDIA_PREFIX + key
+        return new_media
+
+
+def ndjson(record):
+    return serializer.dumps(record) + b'\n'
+
+
+def stream_batch(items, parse, workdir):
+    """
+    Generator of NDJSON lines for a collected batch. Owns ``workdir`` (a
+    TemporaryDirectory) and cleans it up when the stream ends or is closed.
+    """
+    started = time.perf_counter()
+    media = MediaIndex()
+    succeeded = failed = 0
+    pending = {}
+    try:
+        for item in items:
+            if item.error:
+                failed += 1
+                yield ndjson({'type': 'file', 'index': item.index, 'name': item.name,
+                              'status': 'error', 'code': 400, 'error': item.error})
+                continue
+            future = get_pool().submit(parse_batch_file, parse, item.path, item.name)
+            pending[future] = item
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    code, payload = future.result()
+                except BrokenProcessPool:
+                    # A parser process died (e.g. OOM-killed); the rest of this pool is unusable
+                    _discard_pool()
+                    code, payload = 500, 'Parser process terminated unexpectedly'
+                record = {'type': 'file', 'index': item.index, 'name': item.name}
+                if code == 200:
+                    succeeded += 1
+                    for entry in media.externalize(payload):
+                        yield ndjson(entry)
+                    record.update(status='ok', result=payload)
+                else:
+                    failed += 1
+                    log.warning("Batch file %s failed: %s", item.name, payload)
+                    record.update(status='error', code=code, error=payload)
+                yield ndjson(record)
+
+        duration = time.perf_counter() - started
+        summary = {
+            'files': len(items),
+            'succeeded': succeeded,
+            'failed': failed,
+            'media': len(media.seen),
+            'media_references': media.references,
+            'media_bytes_saved': media.bytes_saved,
+            'duration_s': round(duration, 3),
+            'files_per_s': round(len(items) / duration, 2) if duration else None,
+        }
+        log.info("Batch of %d decks: %d ok, %d failed, %d/%d media unique in %.2fs",
+                 len(items), succeeded, failed, len(media.seen), media.references, duration,
+                 extra=summary)
+        yield ndjson(dict(type='summary', **summary))
+    finally:
+        for future in pending:
+            future.cancel()
+        workdir.cleanup()
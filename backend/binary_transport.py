@@ -0,0 +1,138 @@
+"""
+Binary transports for parse results
+
+By default the parser inlines every image as a base64 ``data:`` URL. When a
+client asks /api/parse-pptx for a binary format via ``Accept``, the parse runs
+inside ``binary_media()``. In that mode media_source() hands back RawMedia
+(bytes plus MIME type) instead, so nothing is base64-encoded. The result is
+then sent as one of:
+
+- ``application/msgpack`` (or ``application/x-msgpack``): one MessagePack map,
+  the parse result plus ``media: [{"id", "type", "data": <bin>}, ...]``
+- ``multipart/mixed``: an ``application/json`` part with the parse result,
+  then one part per media item with ``Content-ID: <id>`` and the raw bytes
+
+In both, image elements reference their media as ``"src": "cid:<id>"``;
+identical images within a deck are sent once. MessagePack needs the optional
+``msgpack`` package and is only offered when it is installed.
+"""
+
+import base64
+import hashlib
+import threading
+import uuid
+from contextlib import contextmanager
+
+from flask import Response, request
+
+import serializer
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+MULTIPART_MIMETYPE = 'multipart/mixed'
+
+CID_PREFIX = 'cid:'
+
+_local = threading.local()
+
+
+class RawMedia:
+    """Image bytes standing in for a data URL while a binary response is built"""
+
+    __slots__ = ('data', 'mime')
+
+    def __init__(self, data, mime):
+        self.data = data
+        self.mime = mime
+
+    def __len__(self):
+        return len(self.data)
+
+    def __str__(self):
+        return f'<{self.mime}, {len(self.data)} bytes>'
+
+
+def media_source(data, mime):
+    """Source for an image element: a data URL, or RawMedia inside binary_media()"""
+    if getattr(_local, 'binary', False):
+        return RawMedia(data, mime)
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+@contextmanager
+def binary_media():
+    """Keep media as raw bytes for parses run on this thread until the block exits"""
+    previous = getattr(_local, 'binary', False)
+    _local.binary = True
+    try:
+        yield
+    finally:
+        _local.binary = previous
+
+
+def negotiate():
+    """Response format the client prefers: JSON_MIMETYPE or one of the binary types"""
+    offered = [JSON_MIMETYPE, MULTIPART_MIMETYPE]
+    if msgpack is not None:
+        offered[1:1] = MSGPACK_MIMETYPES
+    return request.accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+
+
+def media_elements(result):
+    """Every dict in a parse result that can carry an image src: slide elements, then shared backgrounds"""
+    for slide in result.get('slides', []):
+        yield from slide.get('elements', [])
+    yield from result.get('backgrounds', [])
+
+
+def collect_media(result):
+    """Replace RawMedia sources in result with cid: references; returns the media list"""
+    media = []
+    seen = set()
+    for element in media_elements(result):
+        src = element.get('src')
+        if not isinstance(src, RawMedia):
+            continue
+        key = hashlib.blake2b(src.data, digest_size=16).hexdigest()
+        if key not in seen:
+            seen.add(key)
+            media.append({'id': key, 'type': src.mime, 'data': src.data})
+        element['src'] = CID_PREFIX + key
+    return media
+
+
+def msgpack_response(result, mimetype):
+    media = collect_media(result)
+    body = msgpack.packb(dict(result, media=media), use_bin_type=True)
+    return Response(body, mimetype=mimetype)
+
+
+def _multipart_parts(manifest, media, boundary):
+    delimiter = f'--{boundary}\r\n'.encode('ascii')
+    yield delimiter + f'Content-Type: {JSON_MIMETYPE}\r\n\r\n'.encode('ascii') + manifest + b'\r\n'
+    for item in media:
+        yield (delimiter + f"Content-Type: {item['type']}\r\nContent-ID: <{item['id']}>\r\n"
+               f"Content-Length: {len(item['data'])}\r\n\r\n".encode('ascii'))
+        yield item['data']
+        yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode('ascii')
+
+
+def multipart_response(result):
+    media = collect_media(result)
+    boundary = uuid.uuid4().hex
+    response = Response(_multipart_parts(serializer.dumps(result), media, boundary),
+                        mimetype=MULTIPART_MIMETYPE)
+    response.mimetype_params['boundary'] = boundary
+    return response
+
+
+def binary_response(result, mimetype):
+    if mimetype == MULTIPART_MIMETYPE:
+        return multipart_response(result)
+    return msgpack_response(result, mimetype)
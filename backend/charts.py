@@ -0,0 +1,141 @@
+"""
+Chart extraction from the chart part's cached values
+
+A chart's data lives in an embedded workbook, but ``ppt/charts/chartN.xml``
+also caches every series' values (``c:numCache``) and labels (``c:strCache``)
+as they were last drawn. Those caches are all the editor needs, so the
+workbook is never opened. Each chart becomes one element:
+
+    "chartType":  "column"                  # bar, column, line, area, pie, doughnut, scatter, ...
+    "title":      "Revenue"                 # or None
+    "categories": ["Q1", "Q2", "Q3"]
+    "series":     [{"name": "2024", "values": [1.5, 2.0, None], "color": "#4472c4"}, ...]
+    "grouping":   "stacked"                 # when not clustered/standard
+    "legend":     True
+
+Scatter and bubble series carry their own ``x`` values. A series in a combo
+chart whose plot differs from the first one has its own ``chartType``. Gaps in
+a cache come out as None. Each cache is read with two XPath queries (indexes
+and values) and converted in bulk rather than point by point, and series are
+cut to PPTX_CHART_MAX_POINTS points, so a chart costs about as much as its
+cached values however large its workbook is.
+
+    PPTX_CHART_MAX_POINTS   points kept per series (default 10000)
+"""
+
+import os
+
+from lxml import etree
+
+from parser_logging import get_logger
+from theme_colors import solid_fill
+
+log = get_logger('slides')
+
+CHART_MAX_POINTS = int(os.environ.get('PPTX_CHART_MAX_POINTS', 10000))
+
+NAMESPACES = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart',
+              'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'}
+
+# Plot element -> chart type (bar charts are 'bar' or 'column' by c:barDir)
+CHART_TYPES = {
+    'barChart': 'bar', 'bar3DChart': 'bar', 'lineChart': 'line', 'line3DChart': 'line',
+    'areaChart': 'area', 'area3DChart': 'area', 'pieChart': 'pie', 'pie3DChart': 'pie',
+    'ofPieChart': 'pie', 'doughnutChart': 'doughnut', 'scatterChart': 'scatter',
+    'bubbleChart': 'bubble', 'radarChart': 'radar', 'stockChart': 'stock', 'surfaceChart': 'surface',
+}
+
+_CHART, _PLOT_AREA, _TITLE, _LEGEND, _SER, _SP_PR, _TX, _V, _BAR_DIR, _GROUPING, _CAT, _VAL, _X_VAL, _Y_VAL = (
+    f"{{{NAMESPACES['c']}}}{tag}" for tag in ('chart', 'plotArea', 'title', 'legend', 'ser', 'spPr', 'tx', 'v',
+                                              'barDir', 'grouping', 'cat', 'val', 'xVal', 'yVal'))
+
+_point_indexes = etree.XPath('c:pt/@idx', namespaces=NAMESPACES)
+_point_values = etree.XPath('c:pt/c:v/text()', namespaces=NAMESPACES)
+_point_count = etree.XPath('c:ptCount/@val', namespaces=NAMESPACES)
+_cache = etree.XPath('(.//c:numCache | .//c:strCache | .//c:lvl)[1]', namespaces=NAMESPACES)
+_text = etree.XPath('.//a:t/text()', namespaces=NAMESPACES)
+
+
+def cached_values(parent, numeric=True):
+    """Values cached under parent (c:val, c:cat, ...) as a list, None for gaps"""
+    caches = _cache(parent) if parent is not None else []
+    if not caches:
+        return []
+    cache = caches[0]
+    # Multi-level category levels share their parent's point count
+    count = _point_count(cache) or _point_count(cache.getparent())
+    count = int(count[0]) if count else 0
+    if count > CHART_MAX_POINTS:
+        log.warning("Chart series of %d points cut to %d", count, CHART_MAX_POINTS)
+        count = CHART_MAX_POINTS
+    values = [None] * count
+    convert = float if numeric and cache.tag.endswith('numCache') else str
+    for index, value in zip(map(int, _point_indexes(cache)), _point_values(cache)):
+        if index < count:
+            try:
+                values[index] = convert(value)
+            except ValueError:
+                pass
+    return values
+
+
+def _series_name(ser):
+    tx = ser.find(_TX)
+    if tx is None:
+        return None
+    names = cached_values(tx, numeric=False)
+    return names[0] if names and names[0] else tx.findtext(_V)
+
+
+def _plot_type(plot):
+    name = etree.QName(plot).localname
+    chart_type = CHART_TYPES.get(name)
+    if chart_type == 'bar':
+        bar_dir = plot.find(_BAR_DIR)
+        chart_type = 'column' if bar_dir is None or bar_dir.get('val') == 'col' else 'bar'
+    return chart_type
+
+
+def chart_fields(chart_space, theme, master):
+    """Element fields for a chart part's c:chartSpace, or None if it has no plots"""
+    chart = chart_space.find(_CHART)
+    plot_area = chart.find(_PLOT_AREA) if chart is not None else None
+    plots = [child for child in (plot_area if plot_area is not None else ()) if etree.QName(child).localname in CHART_TYPES]
+    if not plots:
+        return None
+
+    chart_type = _plot_type(plots[0])
+    grouping = plots[0].find(_GROUPING)
+    title = chart.find(_TITLE)
+    categories = []
+    series = []
+    for plot in plots:
+        plot_type = _plot_type(plot)
+        for ser in plot.iterchildren(_SER):
+            entry = {'name': _series_name(ser)}
+            if plot_type in ('scatter', 'bubble'):
+                entry['x'] = cached_values(ser.find(_X_VAL))
+                values = cached_values(ser.find(_Y_VAL))
+            else:
+                if not categories:
+                    categories = cached_values(ser.find(_CAT), numeric=False)
+                values = cached_values(ser.find(_VAL))
+            entry['values'] = values
+            color = theme.resolve(solid_fill(ser.find(_SP_PR)), master)
+            if color:
+                entry['color'] = color
+            if plot_type != chart_type:
+                entry['chartType'] = plot_type
+            series.append(entry)
+
+    title_text = ''.join(_text(title)).strip() if title is not None else ''
+    fields = {
+        "chartType": chart_type,
+        "title": title_text or None,
+        "categories": categories,
+        "series": series,
+        "legend": chart.find(_LEGEND) is not None,
+    }
+    if grouping is not None and grouping.get('val') not in (None, 'clustered', 'standard'):
+        fields["grouping"] = grouping.get('val')
+    return fields
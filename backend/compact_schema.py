@@ -0,0 +1,119 @@
+"""
+Compact variant of the parser's JSON output
+
+The full schema repeats every style property and every default on every
+element. compact() rewrites a parse result so that:
+
+- each distinct style tuple (font, size, weight, colour, alignment for text;
+  fill, stroke, stroke width for shapes) is stored once in a per-presentation
+  ``styles`` table and elements reference it by index as ``"style": n``
+  (no reference at all when every style property has its default);
+- values equal to the parser defaults are omitted, on elements, on style
+  entries and on slides (``id``/``title`` are dropped when they are the
+  generated "slide-N" / "Slide N").
+
+expand() is the exact inverse, so consumers that only understand the full
+schema can expand on receipt:
+
+    compact_result = compact(result)      # {"schema": "compact/1", "styles": [...], ...}
+    assert expand(compact_result) == result
+"""
+
+SCHEMA = 'compact/1'
+
+# Properties that make up an element's style, per element type
+STYLE_KEYS = {
+    'text': ('fontSize', 'fontFamily', 'fontWeight', 'color', 'textAlign'),
+    'rectangle': ('fill', 'stroke', 'strokeWidth'),
+    'circle': ('fill', 'stroke', 'strokeWidth'),
+    'line': ('fill', 'stroke', 'strokeWidth'),
+}
+
+# Parser defaults (see parse_pptx_to_json); omitted from compact output
+STYLE_DEFAULTS = {
+    'fontSize': 24,
+    'fontFamily': 'Inter',
+    'fontWeight': '600',
+    'color': '#000000',
+    'textAlign': 'left',
+    'fill': 'transparent',
+    'stroke': '#000000',
+    'strokeWidth': 1,
+}
+ELEMENT_DEFAULTS = {'rotation': 0, 'zIndex': 1, 'selected': False}
+SLIDE_DEFAULTS = {'content': '', 'background': '#ffffff'}
+
+
+def is_compact(result):
+    return result.get('schema') == SCHEMA
+
+
+def _without_defaults(values, defaults):
+    return {key: value for key, value in values.items() if key not in defaults or defaults[key] != value}
+
+
+def _slide_names(index):
+    return {'id': f'slide-{index + 1}', 'title': f'Slide {index + 1}'}
+
+
+def compact(result):
+    """Return the compact form of a parse result (the input is not modified)"""
+    if is_compact(result) or 'slides' not in result:
+        return result
+
+    styles = []
+    style_index = {}
+    slides = []
+    for slide_num, slide in enumerate(result['slides']):
+        elements = []
+        for element in slide.get('elements', []):
+            keys = STYLE_KEYS.get(element.get('type'), ())
+            style = {key: element[key] for key in keys if key in element}
+            compacted = _without_defaults(
+                {key: value for key, value in element.items() if key not in style}, ELEMENT_DEFAULTS)
+            if style and any(STYLE_DEFAULTS[key] != value for key, value in style.items()):
+                signature = tuple(sorted(style.items()))
+                if signature not in style_index:
+                    style_index[signature] = len(styles)
+                    styles.append(_without_defaults(style, STYLE_DEFAULTS))
+                compacted['style'] = style_index[signature]
+            elements.append(compacted)
+
+        compact_slide = _without_defaults({key: value for key, value in slide.items() if key != 'elements'},
+                                          dict(SLIDE_DEFAULTS, **_slide_names(slide_num)))
+        compact_slide['elements'] = elements
+        slides.append(compact_slide)
+
+    compacted = {key: value for key, value in result.items() if key != 'slides'}
+    compacted.update(schema=SCHEMA, styles=styles, slides=slides)
+    return compacted
+
+
+def expand_slide(slide, slide_num, styles):
+    """Full-schema form of one slide of a compact result, styles being its styles table"""
+    elements = []
+    for element in slide.get('elements', []):
+        expanded = {key: value for key, value in element.items() if key != 'style'}
+        # No style reference means every style property has its default value
+        style = styles[element['style']] if 'style' in element else {}
+        for key in STYLE_KEYS.get(element.get('type'), ()):
+            expanded[key] = style.get(key, STYLE_DEFAULTS[key])
+        for key, value in ELEMENT_DEFAULTS.items():
+            expanded.setdefault(key, value)
+        elements.append(expanded)
+
+    expanded_slide = {**_slide_names(slide_num), **SLIDE_DEFAULTS}
+    expanded_slide.update({key: value for key, value in slide.items() if key != 'elements'})
+    expanded_slide['elements'] = elements
+    return expanded_slide
+
+
+def expand(result):
+    """Return the full-schema form of a compact result (full results pass through)"""
+    if not is_compact(result):
+        return result
+
+    expanded = {key: value for key, value in result.items() if key not in ('schema', 'styles', 'slides')}
+    expanded['slides'] = [expand_slide(slide, slide_num, result['styles'])
+                          for slide_num, slide in enumerate(result['slides'])]
+    return expanded
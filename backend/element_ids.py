@@ -0,0 +1,93 @@
+"""
+Deterministic element IDs
+
+Element IDs are built from things that survive re-saving and reordering a deck
+rather than from positions in the shape list:
+
+    <type>-<slide id>-<shape id>-<content hash>     e.g. text-256-4-9f2c1a0b
+
+- slide id: the slide's ``p:sldId/@id`` in presentation.xml, which PowerPoint
+  keeps when slides are moved
+- shape id: the shape's ``p:cNvPr/@id``, unique within its slide
+- content hash: a short hash of the emitted element (image bytes included), so
+  the ID changes exactly when what the editor shows does, including changes
+  inherited from a group, layout, master or theme. Images are hashed by their
+  decoded bytes, so JSON (data URL) and binary (RawMedia) parses agree, and
+  the generated ``alt`` text is left out
+
+The parser gives each element ``element_id()`` while building a slide and
+calls ``seal_ids()`` on the finished slide to append the content hashes. When
+one shape yields more than one element (e.g. an image found both in the ZIP and
+on the shape), the later ones get ``<shape id>.2``, ``.3``, ... so IDs stay
+unique.
+
+The part without the type and the hash, ``<slide id>-<shape id>``, identifies
+the shape across edits; parse_diff matches elements on it. Images the parser
+couldn't tie to a shape use ``m<hash of the image>`` as their shape id.
+"""
+
+import hashlib
+import json
+
+from media_storage import inline_media
+
+HASH_BYTES = 4
+
+# Not part of the content hash: the ID itself, the image (hashed as bytes) and
+# the alt text, which the parser derives from the slide's position
+UNHASHED_FIELDS = ('id', 'src', 'alt')
+
+
+def _digest(*parts):
+    digest = hashlib.blake2b(digest_size=HASH_BYTES)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _default(value):
+    """JSON fallback for element values: image bytes (RawMedia) by digest"""
+    data = getattr(value, 'data', None)
+    if isinstance(data, bytes):
+        return _digest(data)
+    raise TypeError(f'Cannot hash {type(value).__name__}')
+
+
+def _media_bytes(src):
+    """Image bytes behind src whatever the transport, else src itself"""
+    inline = inline_media(src)
+    return inline[0] if inline else src or b''
+
+
+def content_hash(element):
+    """Short hash of an element's content, everything but its id and alt"""
+    content = {key: value for key, value in element.items() if key not in UNHASHED_FIELDS}
+    return _digest(json.dumps(content, sort_keys=True, separators=(',', ':'), default=_default),
+                   _media_bytes(element.get('src')))
+
+
+def element_id(kind, slide, shape):
+    """ID, without the content hash, for the element parsed from shape on slide"""
+    return f'{kind}-{slide.slide_id}-{shape.shape_id}'
+
+
+def media_element_id(slide, src):
+    """ID, without the content hash, for an image that isn't tied to a shape"""
+    return f'image-{slide.slide_id}-m{_digest(_media_bytes(src))}'
+
+
+def seal_ids(elements):
+    """Complete the IDs of one slide's elements with their content hashes"""
+    seen = {}
+    for element in elements:
+        kind, key = element['id'].split('-', 1)
+        count = seen[key] = seen.get(key, 0) + 1
+        if count > 1:
+            key = f'{key}.{count}'
+        element['id'] = f'{kind}-{key}-{content_hash(element)}'
+
+
+def element_key(element_id):
+    """'<slide id>-<shape id>' part of an element ID, or the ID itself for other formats"""
+    parts = element_id.split('-')
+    return '-'.join(parts[-3:-1]) if len(parts) >= 4 else element_id
@@ -0,0 +1,187 @@
+"""
+Sharded, Firestore-ready layout for parse results
+
+A whole presentation rarely fits in one Firestore document (about 1 MB), which
+is why the single-document path re-compresses images until it does. shard()
+splits a result into documents that are each under the limit instead, with no
+loss of image quality:
+
+- ``manifest``: everything except the slides, plus one entry per slide
+  (``{"doc", "parts", "ids"}``, ids being its element IDs) and per media item
+  (``{"id", "type", "bytes", "parts"}``)
+- ``slides``: one document per slide, ``{"doc": "slide-0001", "index": 0,
+  "part": 0, "slide": {...}}``. A slide too large for one document continues
+  in ``slide-0001-p1``, ... whose ``slide`` holds only further ``elements``.
+- ``media``: inline images, base64 in ``data``, split into ``<id>-0``,
+  ``<id>-1``, ... chunks. Image elements and the manifest's ``backgrounds``
+  reference them as ``"src": "media:<id>"`` and each image is stored once per deck.
+
+A client writes the manifest to ``templates/{id}``, the other documents to the
+``slides`` and ``media`` subcollections under it, and can then load or update
+slides one at a time. unshard() rebuilds the single-document form.
+
+    PPTX_SHARD_MAX_KB   size budget per document (default 900, below Firestore's 1 MiB)
+"""
+
+import base64
+import os
+
+from batch_import import MEDIA_PREFIX
+from media_storage import inline_media, media_filename
+from parser_logging import get_logger
+import serializer
+
+log = get_logger('optimize')
+
+LAYOUT = 'sharded/1'
+
+SHARD_MAX_BYTES = int(os.environ.get('PPTX_SHARD_MAX_KB', 900)) * 1024
+# Room for the chunk document's other fields and Firestore's per-document overhead
+MEDIA_CHUNK_OVERHEAD = 1024
+
+
+class ShardTooLarge(ValueError):
+    """A single element, or the manifest, doesn't fit in a document of its own"""
+
+
+def is_sharded(result):
+    return result.get('layout') == LAYOUT
+
+
+def slide_doc_id(index, part=0):
+    doc = f'slide-{index + 1:04d}'
+    return f'{doc}-p{part}' if part else doc
+
+
+def _chunk(payload, size):
+    return [payload[start:start + size] for start in range(0, len(payload), size)] or ['']
+
+
+def _split_elements(elements, budget):
+    """Greedily pack elements into groups whose encoded size stays under budget"""
+    groups = [[]]
+    used = 0
+    for element in elements:
+        element_size = serializer.size(element) + 1
+        if element_size > budget:
+            raise ShardTooLarge(f"Element {element.get('id')} is {element_size} bytes "
+                                f"(document budget {budget})")
+        if used + element_size > budget and groups[-1]:
+            groups.append([])
+            used = 0
+        groups[-1].append(element)
+        used += element_size
+    return groups
+
+
+def shard(result, max_bytes=SHARD_MAX_BYTES):
+    """
+    Return the sharded form of a parse result. Raises ShardTooLarge if some
+    element can't be stored in any document (e.g. megabytes of text in one box)
+    or the manifest is over the budget (tens of thousands of elements or images).
+    """
+    if is_sharded(result) or 'slides' not in result:
+        return result
+
+    chunk_size = (max_bytes - MEDIA_CHUNK_OVERHEAD) // 4 * 4  # whole base64 quanta
+    media_index = {}
+    media_docs = []
+    slide_docs = []
+    slide_entries = []
+
+    def externalize(element):
+        """element with inline image data moved into media documents"""
+        inline = inline_media(element.get('src'))
+        if inline is None:
+            return element
+        data, mime = inline
+        key = media_filename(data, mime)
+        if key not in media_index:
+            chunks = _chunk(base64.b64encode(data).decode('ascii'), chunk_size)
+            media_index[key] = {'id': key, 'type': mime, 'bytes': len(data), 'parts': len(chunks)}
+            media_docs.extend({'doc': f'{key}-{part}', 'media': key, 'part': part, 'data': chunk}
+                              for part, chunk in enumerate(chunks))
+        return dict(element, src=MEDIA_PREFIX + key)
+
+    for slide_num, slide in enumerate(result['slides']):
+        elements = [externalize(element) for element in slide.get('elements', [])]
+
+        first = {'doc': slide_doc_id(slide_num), 'index': slide_num, 'part': 0,
+                 'slide': {key: value for key, value in slide.items() if key != 'elements'}}
+        groups = _split_elements(elements, max_bytes - serializer.size(first))
+        first['slide']['elements'] = groups[0]
+        slide_docs.append(first)
+        for part, group in enumerate(groups[1:], 1):
+            slide_docs.append({'doc': slide_doc_id(slide_num, part), 'index': slide_num, 'part': part,
+                               'slide': {'elements': group}})
+        slide_entries.append({'doc': first['doc'], 'parts': len(groups),
+                              'ids': [element.get('id') for element in elements]})
+
+    manifest = {key: value for key, value in result.items() if key != 'slides'}
+    if 'backgrounds' in manifest:
+        manifest['backgrounds'] = [externalize(background) for background in manifest['backgrounds']]
+    manifest.update(layout=LAYOUT, slides=slide_entries, media=list(media_index.values()))
+    manifest_size = serializer.size(manifest)
+    if manifest_size > max_bytes:
+        raise ShardTooLarge(f"Manifest is {manifest_size} bytes (document budget {max_bytes})")
+
+    log.info("Sharded %s into %d slide and %d media documents (%d media)",
+             result.get('title'), len(slide_docs), len(media_docs), len(media_index),
+             extra={'slide_docs': len(slide_docs), 'media_docs': len(media_docs), 'media': len(media_index)})
+    return {'layout': LAYOUT, 'manifest': manifest, 'slides': slide_docs, 'media': media_docs}
+
+
+def iter_slides(sharded):
+    """Slides of a sharded result one at a time, their parts joined; srcs stay media:<id> references"""
+    parts = {}
+    for doc in sharded['slides']:
+        parts.setdefault(doc['index'], {})[doc['part']] = doc['slide']
+    for index, entry in enumerate(sharded['manifest']['slides']):
+        slide = {key: value for key, value in parts[index][0].items() if key != 'elements'}
+        slide['elements'] = [element for part in range(entry['parts']) for element in parts[index][part]['elements']]
+        yield slide
+
+
+def media_reader(sharded):
+    """Function from a media:<id> src to its (bytes, mime type), None for other srcs; chunks are joined on demand"""
+    chunks = {}
+    for doc in sharded['media']:
+        chunks.setdefault(doc['media'], {})[doc['part']] = doc['data']
+    items = {MEDIA_PREFIX + item['id']: item for item in sharded['manifest']['media']}
+
+    def read(src):
+        item = items.get(src) if isinstance(src, str) else None
+        if item is None:
+            return None
+        payload = ''.join(chunks[item['id']][part] for part in range(item['parts']))
+        return base64.b64decode(payload), item['type']
+    return read
+
+
+def unshard(sharded):
+    """Return the single-document form of a sharded result, images inlined again"""
+    if not is_sharded(sharded):
+        return sharded
+
+    chunks = {}
+    for doc in sharded['media']:
+        chunks.setdefault(doc['media'], {})[doc['part']] = doc['data']
+    sources = {}
+    for item in sharded['manifest']['media']:
+        payload = ''.join(chunks[item['id']][part] for part in range(item['parts']))
+        sources[MEDIA_PREFIX + item['id']] = f"data:{item['type']};base64,{payload}"
+
+    slides = []
+    for slide in iter_slides(sharded):
+        slide['elements'] = [dict(element, src=sources[element['src']])
+                             if element.get('src') in sources else element
+                             for element in slide['elements']]
+        slides.append(slide)
+
+    result = {key: value for key, value in sharded['manifest'].items() if key not in ('layout', 'slides', 'media')}
+    if 'backgrounds' in result:
+        result['backgrounds'] = [dict(background, src=sources[background['src']])
+                                 if background.get('src') in sources else background
+                                 for background in result['backgrounds']]
+    result['slides'] = slides
+    return result
@@ -0,0 +1,91 @@
+"""
+Group shape flattening
+
+Children of a group (``p:grpSp``) are positioned in the group's own child
+coordinate space: the group's ``a:xfrm`` maps the rectangle ``chOff``/``chExt``
+onto ``off``/``ext`` in its parent's space. flatten() walks a slide's shape
+tree and returns every leaf shape in z-order with the transform that maps its
+coordinates onto the slide, so groups nested at any depth come out with
+absolute positions.
+
+A transform is ``(scale_x, scale_y, offset_x, offset_y)`` in EMU; each group's
+is computed once and composed into its children's. The walk uses an explicit
+stack of child iterators rather than recursion, so deeply nested exports
+(Canva nests groups dozens of levels deep) cost one tuple per group.
+Group rotation and flips aren't applied; the editor has no rotated groups.
+"""
+
+from pptx.oxml.ns import qn
+from pptx.shapes.group import GroupShape
+
+IDENTITY = (1.0, 1.0, 0, 0)
+
+EMU_PER_PX = 9525  # 914400 EMU per inch / 96 px per inch
+
+_XFRM, _OFF, _EXT, _CH_OFF, _CH_EXT = (qn(tag) for tag in ('a:xfrm', 'a:off', 'a:ext', 'a:chOff', 'a:chExt'))
+
+
+def _group_transform(group, parent):
+    """parent composed with group's child-space -> parent-space mapping"""
+    xfrm = group._element.grpSpPr.find(_XFRM)
+    if xfrm is None:
+        return parent
+    off, ext, ch_off, ch_ext = (xfrm.find(tag) for tag in (_OFF, _EXT, _CH_OFF, _CH_EXT))
+    if off is None or ext is None or ch_off is None or ch_ext is None:
+        return parent
+
+    ch_cx, ch_cy = int(ch_ext.get('cx')), int(ch_ext.get('cy'))
+    scale_x = int(ext.get('cx')) / ch_cx if ch_cx else 1.0
+    scale_y = int(ext.get('cy')) / ch_cy if ch_cy else 1.0
+    # child x -> off.x + (x - chOff.x) * scale_x, then through the parent transform
+    parent_scale_x, parent_scale_y, parent_x, parent_y = parent
+    return (
+        parent_scale_x * scale_x,
+        parent_scale_y * scale_y,
+        parent_x + parent_scale_x * (int(off.get('x')) - scale_x * int(ch_off.get('x'))),
+        parent_y + parent_scale_y * (int(off.get('y')) - scale_y * int(ch_off.get('y'))),
+    )
+
+
+def flatten(shapes):
+    """[(shape, transform), ...] for every non-group shape under shapes, in z-order"""
+    flat = []
+    stack = [(iter(shapes), IDENTITY)]
+    while stack:
+        children, transform = stack[-1]
+        shape = next(children, None)
+        if shape is None:
+            stack.pop()
+        elif isinstance(shape, GroupShape):
+            stack.append((iter(shape.shapes), _group_transform(shape, transform)))
+        else:
+            flat.append((shape, transform))
+    return flat
+
+
+def _geometry(shape):
+    """(left, top, width, height) in EMU, read straight from a:xfrm when the shape has one"""
+    xfrm = getattr(shape._element, 'xfrm', None)
+    if xfrm is not None:
+        off, ext = xfrm.find(_OFF), xfrm.find(_EXT)
+        if off is not None and ext is not None:
+            return int(off.get('x')), int(off.get('y')), int(ext.get('cx')), int(ext.get('cy'))
+    # No transform of its own: python-pptx resolves placeholder inheritance
+    return shape.left, shape.top, shape.width, shape.height
+
+
+def place(shape, transform, default=(0, 0, 0, 0), geometry=None):
+    """
+    Slide position and size of shape in pixels as (x, y, width, height).
+    geometry overrides the shape's own (left, top, width, height) in EMU, e.g.
+    with a resolved placeholder position; a component that is still undefined
+    comes from default.
+    """
+    scale_x, scale_y, offset_x, offset_y = transform
+    left, top, width, height = geometry or _geometry(shape)
+    return (
+        int((left * scale_x + offset_x) / EMU_PER_PX) if left is not None else default[0],
+        int((top * scale_y + offset_y) / EMU_PER_PX) if top is not None else default[1],
+        int(width * scale_x / EMU_PER_PX) if width is not None else default[2],
+        int(height * scale_y / EMU_PER_PX) if height is not None else default[3],
+    )
@@ -0,0 +1,44 @@
+"""
+gunicorn configuration for the PPTX parser (see start_production.sh)
+
+The app is loaded once in the master (preload_app) and create_app(warm=True)
+runs a warm-up parse and gc.freeze() there, so python-pptx, lxml and PIL are
+imported and initialised before the workers fork and share those pages
+copy-on-write. Workers are recycled after PPTX_WORKER_MAX_REQUESTS requests or
+once their RSS passes PPTX_WORKER_MAX_RSS_MB, which bounds the heap
+fragmentation PIL decodes leave behind.
+
+    PPTX_BIND                  address to listen on (default 0.0.0.0:5001)
+    WEB_CONCURRENCY            worker processes (default: one per core)
+    PPTX_WORKER_TIMEOUT        seconds before a stuck worker is killed (default 120)
+    PPTX_WORKER_MAX_REQUESTS   requests before a worker is recycled (default 200, 0 disables)
+    PPTX_WORKER_MAX_RSS_MB     RSS before a worker is recycled (default 1024, 0 disables)
+"""
+
+import multiprocessing
+import os
+
+from memory_budget import current_rss
+
+wsgi_app = 'app:create_app(warm=True)'
+preload_app = True
+
+bind = os.environ.get('PPTX_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'sync'  # parsing is CPU-bound; concurrency comes from processes
+timeout = int(os.environ.get('PPTX_WORKER_TIMEOUT', 120))
+
+max_requests = int(os.environ.get('PPTX_WORKER_MAX_REQUESTS', 200))
+# Spread recycling out so workers don't all restart at once
+max_requests_jitter = max_requests // 10
+
+MAX_WORKER_RSS = int(float(os.environ.get('PPTX_WORKER_MAX_RSS_MB', 1024)) * 1024 * 1024)
+
+
+def post_request(worker, req, environ, resp):
+    rss = current_rss()
+    if MAX_WORKER_RSS and rss > MAX_WORKER_RSS:
+        worker.log.info("Recycling worker %s: RSS %.0f MB over the %.0f MB limit",
+                        worker.pid, rss / (1024 * 1024), MAX_WORKER_RSS / (1024 * 1024))
+        # Finishes this request, then exits; the master forks a fresh worker
+        worker.alive = False
@@ -0,0 +1,127 @@
+"""
+Response compression and cache validators
+
+- compress_response() (an after_request hook installed by create_app())
+  negotiates brotli or gzip for JSON and NDJSON responses. Streamed NDJSON is
+  compressed line by line and flushed, so batch results still arrive as each
+  deck finishes.
+- Parse results get a strong ETag built from the upload digest, the parser
+  version and the requested variant (schema, media mode). A client that
+  re-sends a deck with that ETag in If-None-Match gets 412 Precondition Failed
+  after the upload has been hashed, without parsing it again: its copy is
+  current. 304 is only defined for GET and HEAD, and the upload has to be POSTed.
+
+    PPTX_GZIP_LEVEL       zlib level for gzip responses (default 6)
+    PPTX_BROTLI_QUALITY   brotli quality (default 5)
+"""
+
+import hashlib
+import os
+import zlib
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+GZIP_LEVEL = int(os.environ.get('PPTX_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('PPTX_BROTLI_QUALITY', 5))
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson')
+# Below this the encoding overhead isn't worth it
+MIN_COMPRESS_BYTES = 1024
+
+# Content-addressed media never changes
+MEDIA_MAX_AGE = 365 * 24 * 3600
+
+
+def upload_digest(stream):
+    """SHA-256 of an upload stream; the stream position is restored"""
+    position = stream.tell()
+    stream.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+        digest.update(chunk)
+    stream.seek(position)
+    return digest.hexdigest()
+
+
+def make_etag(digest, version, *variant):
+    """
+    Strong ETag for a parse result: upload digest, parser version and a short
+    hash of whatever else shapes the output (file name, schema, media mode)
+    """
+    variant_hash = hashlib.blake2b('|'.join(map(str, variant)).encode('utf-8'), digest_size=4).hexdigest()
+    return f'{digest[:40]}-{version}-{variant_hash}'
+
+
+def etag_matches(etag):
+    """True if the current request's If-None-Match covers any encoding of etag"""
+    if_none_match = request.if_none_match
+    return any(if_none_match.contains(candidate) for candidate in (etag, f'{etag}-br', f'{etag}-gzip'))
+
+
+def precondition_failed(etag):
+    """Response to a POST whose If-None-Match covers etag: 412, the client's copy is current"""
+    response = Response(status=412)
+    response.set_etag(etag)
+    return response
+
+
+def choose_encoding():
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _compress_stream(chunks, encoding):
+    process, flush, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            yield process(chunk) + flush()
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response):
+    """after_request hook: compress JSON/NDJSON bodies for clients that accept it"""
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or not 200 <= response.status_code < 300):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_BYTES:
+            return response
+        process, _, finish = _compressor(encoding)
+        response.set_data(process(data) + finish())
+
+    response.headers['Content-Encoding'] = encoding
+    # Strong validators are per representation
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
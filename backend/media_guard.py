@@ -0,0 +1,328 @@
+"""
+Decompression-bomb and pixel-budget guard for deck media
+
+Runs before anything is decoded:
+
+- check_archive() looks only at the ZIP central directory and rejects decks
+  whose members inflate past a size or compression-ratio limit, before
+  python-pptx reads them.
+- admit() reads just the image header (dimensions and frame count) and
+  accepts, downscales (JPEG reduced decode) or rejects each image against a
+  per-image and a per-deck pixel budget. Each distinct image (by SHA-1) is
+  judged and charged once per deck; later placements reuse that verdict.
+
+Limits come from the environment:
+
+    PPTX_MAX_IMAGE_PIXELS     pixels per image, frames included (default 50M)
+    PPTX_MAX_DECK_PIXELS      pixels across all images of a deck (default 500M)
+    PPTX_MAX_ZIP_RATIO        uncompressed/compressed ratio per member (default 100)
+    PPTX_MAX_MEMBER_MB        uncompressed size per member (default 256)
+    PPTX_MAX_UNCOMPRESSED_MB  uncompressed size of the whole deck (default 1024)
+"""
+
+import hashlib
+import os
+import struct
+import zipfile
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image
+
+from parser_logging import get_logger
+
+log = get_logger('guard')
+
+MAX_IMAGE_PIXELS = int(float(os.environ.get('PPTX_MAX_IMAGE_PIXELS', 50_000_000)))
+MAX_DECK_PIXELS = int(float(os.environ.get('PPTX_MAX_DECK_PIXELS', 500_000_000)))
+MAX_ZIP_RATIO = float(os.environ.get('PPTX_MAX_ZIP_RATIO', 100))
+MAX_MEMBER_BYTES = int(float(os.environ.get('PPTX_MAX_MEMBER_MB', 256)) * 1024 * 1024)
+MAX_UNCOMPRESSED_BYTES = int(float(os.environ.get('PPTX_MAX_UNCOMPRESSED_MB', 1024)) * 1024 * 1024)
+
+# XML compresses very well; only apply the ratio check to members bigger than this
+RATIO_CHECK_MIN_BYTES = 1024 * 1024
+
+# Vector media are passed through untouched; there is no raster to budget
+VECTOR_EXTENSIONS = ('.svg', '.emf', '.wmf')
+
+# libjpeg can decode at 1/1, 1/2, 1/4 and 1/8 scale
+JPEG_DRAFT_FACTORS = (1, 2, 4, 8)
+
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class UnsafeDeckError(Exception):
+    """Raised when a deck's archive structure exceeds the guard limits"""
+
+
+@dataclass
+class ImageHeader:
+    format: str
+    width: int
+    height: int
+    frames: int = 1
+
+    @property
+    def pixels(self):
+        return self.width * self.height * self.frames
+
+
+@dataclass
+class Verdict:
+    accepted: bool
+    header: Optional[ImageHeader] = None
+    max_pixels: Optional[int] = None  # set when the image must be decoded at reduced scale
+    reason: str = ''
+
+
+def _png_header(data):
+    width, height = struct.unpack('>II', data[16:24])
+    frames = 1
+    offset = 8
+    # acTL (animation control) must come before the first IDAT
+    while offset + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[offset:offset + 8])
+        if chunk_type == b'acTL':
+            frames = max(1, struct.unpack('>I', data[offset + 8:offset + 12])[0])
+            break
+        if chunk_type == b'IDAT':
+            break
+        offset += 12 + length
+    return ImageHeader('PNG', width, height, frames)
+
+
+def _skip_sub_blocks(data, offset):
+    while offset < len(data):
+        size = data[offset]
+        offset += 1
+        if size == 0:
+            break
+        offset += size
+    return offset
+
+
+def _gif_header(data):
+    width, height, flags = struct.unpack('<HHB', data[6:11])
+    offset = 13
+    if flags & 0x80:
+        offset += 3 << ((flags & 0x07) + 1)
+    frames = 0
+    # Walk the block structure without decompressing any image data
+    while offset < len(data):
+        block = data[offset]
+        if block == 0x2C:  # image descriptor
+            frames += 1
+            local_flags = data[offset + 9] if offset + 9 < len(data) else 0
+            offset += 10
+            if local_flags & 0x80:
+                offset += 3 << ((local_flags & 0x07) + 1)
+            offset = _skip_sub_blocks(data, offset + 1)  # +1 skips the LZW minimum code size
+        elif block == 0x21:  # extension
+            offset = _skip_sub_blocks(data, offset + 2)
+        else:  # 0x3B trailer, or garbage
+            break
+    return ImageHeader('GIF', width, height, max(1, frames))
+
+
+def _jpeg_header(data):
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return ImageHeader('JPEG', width, height)
+        if 0xD0 <= marker <= 0xD9 or marker == 0x01:  # markers without a length
+            offset += 2
+            continue
+        offset += 2 + struct.unpack('>H', data[offset + 2:offset + 4])[0]
+    return None
+
+
+def _bmp_header(data):
+    width, height = struct.unpack('<ii', data[18:26])
+    return ImageHeader('BMP', abs(width), abs(height))
+
+
+def _webp_header(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        width, height = struct.unpack('<HH', data[26:30])
+        return ImageHeader('WEBP', width & 0x3FFF, height & 0x3FFF)
+    if chunk == b'VP8L':
+        b0, b1, b2, b3 = data[21:25]
+        width = 1 + (((b1 & 0x3F) << 8) | b0)
+        height = 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+        return ImageHeader('WEBP', width, height)
+    if chunk == b'VP8X':
+        width = 1 + int.from_bytes(data[24:27], 'little')
+        height = 1 + int.from_bytes(data[27:30], 'little')
+        frames = 0
+        offset = 12
+        while offset + 8 <= len(data):
+            chunk_type, length = struct.unpack('<4sI', data[offset:offset + 8])
+            if chunk_type == b'ANMF':
+                frames += 1
+            offset += 8 + length + (length & 1)
+        return ImageHeader('WEBP', width, height, max(1, frames))
+    return None
+
+
+def probe_image_header(data):
+    """
+    Read dimensions and frame count from the image header without decoding
+    pixels. Returns None for data that isn't a recognised raster image.
+    """
+    try:
+        if data.startswith(b'\x89PNG\r\n\x1a\n'):
+            return _png_header(data)
+        if data.startswith(b'\xff\xd8'):
+            return _jpeg_header(data)
+        if data[:6] in (b'GIF87a', b'GIF89a'):
+            return _gif_header(data)
+        if data.startswith(b'BM'):
+            return _bmp_header(data)
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            return _webp_header(data)
+    except (struct.error, IndexError, ValueError):
+        return None
+
+    # Anything else (TIFF, ...): Image.open only parses the header until load()
+    try:
+        with Image.open(BytesIO(data)) as image:
+            return ImageHeader(image.format or 'UNKNOWN', image.width, image.height,
+                               getattr(image, 'n_frames', 1))
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+def jpeg_draft_size(width, height, max_pixels):
+    """Size to request from Image.draft so the decoded JPEG fits in max_pixels, or None"""
+    for factor in JPEG_DRAFT_FACTORS:
+        if (width // factor) * (height // factor) <= max_pixels:
+            return max(1, width // factor), max(1, height // factor)
+    return None
+
+
+class MediaGuard:
+    """Guard state for one deck: limits plus the pixels admitted so far"""
+
+    def __init__(self, max_image_pixels=MAX_IMAGE_PIXELS, max_deck_pixels=MAX_DECK_PIXELS,
+                 max_zip_ratio=MAX_ZIP_RATIO, max_member_bytes=MAX_MEMBER_BYTES,
+                 max_uncompressed_bytes=MAX_UNCOMPRESSED_BYTES):
+        self.max_image_pixels = max_image_pixels
+        self.max_deck_pixels = max_deck_pixels
+        self.max_zip_ratio = max_zip_ratio
+        self.max_member_bytes = max_member_bytes
+        self.max_uncompressed_bytes = max_uncompressed_bytes
+        self.deck_pixels = 0
+        self.rejected = []
+        self._verdicts = {}     # SHA-1 of image bytes -> Verdict
+
+    def check_archive(self, pptx_source):
+        """Validate ZIP member sizes from the central directory; raises UnsafeDeckError"""
+        position = None if isinstance(pptx_source, (str, os.PathLike)) else pptx_source.tell()
+        try:
+            with zipfile.ZipFile(pptx_source) as zip_file:
+                total = 0
+                for info in zip_file.infolist():
+                    total += info.file_size
+                    if info.file_size > self.max_member_bytes:
+                        raise UnsafeDeckError(
+                            f"{info.filename} inflates to {info.file_size / (1024 * 1024):.0f} MB "
+                            f"(limit {self.max_member_bytes / (1024 * 1024):.0f} MB)")
+                    ratio = info.file_size / max(1, info.compress_size)
+                    if info.file_size > RATIO_CHECK_MIN_BYTES and ratio > self.max_zip_ratio:
+                        raise UnsafeDeckError(
+                            f"{info.filename} has a compression ratio of {ratio:.0f}:1 "
+                            f"(limit {self.max_zip_ratio:.0f}:1)")
+                if total > self.max_uncompressed_bytes:
+                    raise UnsafeDeckError(
+                        f"Deck inflates to {total / (1024 * 1024):.0f} MB "
+                        f"(limit {self.max_uncompressed_bytes / (1024 * 1024):.0f} MB)")
+        except zipfile.BadZipFile as e:
+            raise UnsafeDeckError(f"Not a valid PPTX archive: {e}")
+        finally:
+            if position is not None:
+                pptx_source.seek(position)
+
+    def admit(self, name, data, max_pixels=None, allow_downscale=True):
+        """
+        Decide whether an image may be decoded. max_pixels tightens the
+        per-image limit (e.g. from a memory budget), also for images already
+        admitted under a looser one. Oversized single-frame
+        JPEGs are accepted with Verdict.max_pixels set when a reduced decode
+        brings them under the limit; everything else over budget is rejected.
+        """
+        if name.lower().endswith(VECTOR_EXTENSIONS):
+            return Verdict(True)
+
+        # The same part is met by ZIP extraction and by every shape placing it
+        digest = hashlib.sha1(data).digest()
+        verdict = self._verdicts.get(digest)
+        if verdict is None:
+            verdict = self._verdicts[digest] = self._judge(name, data, max_pixels, allow_downscale)
+        elif verdict.max_pixels and not allow_downscale:
+            return Verdict(False, verdict.header, reason="only fits the pixel budget at reduced scale")
+        elif max_pixels is not None and verdict.accepted and verdict.header:
+            # Judged under another call's limit; hold it to this one without charging the deck again
+            return self._within(name, verdict, max_pixels, allow_downscale)
+        return verdict
+
+    def _within(self, name, verdict, max_pixels, allow_downscale):
+        """An accepted verdict, or a smaller decode or rejection if it doesn't fit max_pixels"""
+        header = verdict.header
+        limit = min(max_pixels, verdict.max_pixels or max_pixels)
+        if header.pixels <= limit or limit == verdict.max_pixels:
+            return verdict
+        if allow_downscale and header.format == 'JPEG' and header.frames == 1 and \
+                jpeg_draft_size(header.width, header.height, limit):
+            return Verdict(True, header, max_pixels=limit)
+        return self._reject(name, header, f"{header.width}x{header.height}x{header.frames} exceeds "
+                                          f"the pixel limit ({limit} pixels)")
+
+    def _judge(self, name, data, max_pixels, allow_downscale):
+        try:
+            header = probe_image_header(data)
+        except Image.DecompressionBombError as e:
+            return self._reject(name, None, str(e))
+        if header is None:
+            # Not a budget problem - e.g. the XML part behind a shape - so don't report it
+            log.debug("Skipped %s: not a recognised raster image", name)
+            return Verdict(False, reason="not a recognised raster image")
+
+        limit = min(self.max_image_pixels, self.max_deck_pixels - self.deck_pixels)
+        if max_pixels is not None:
+            limit = min(limit, max_pixels)
+
+        if header.pixels <= limit:
+            self.deck_pixels += header.pixels
+            return Verdict(True, header)
+
+        if allow_downscale and header.format == 'JPEG' and header.frames == 1:
+            draft_size = jpeg_draft_size(header.width, header.height, limit)
+            if draft_size:
+                self.deck_pixels += draft_size[0] * draft_size[1]
+                log.info("Downscaling %s (%dx%d) to fit %d pixels", name, header.width, header.height, limit)
+                return Verdict(True, header, max_pixels=limit)
+
+        return self._reject(name, header, f"{header.width}x{header.height}x{header.frames} exceeds "
+                                          f"the pixel budget ({max(0, limit)} pixels left)")
+
+    def admit_inline(self, data, what):
+        """admit() for blobs that are inlined without decoding, so no downscale is possible"""
+        return self.admit(what, data, allow_downscale=False).accepted
+
+    def _reject(self, name, header, reason):
+        log.warning("Rejected image %s: %s", name, reason)
+        entry = {'name': name, 'reason': reason}
+        if entry not in self.rejected:
+            self.rejected.append(entry)
+        return Verdict(False, header, reason=reason)
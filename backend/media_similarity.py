@@ -0,0 +1,320 @@
+"""
+Perceptual-hash index of stored media (near-duplicate images)
+
+The same photo often reaches the template library several times, re-encoded
+at a slightly different size or quality, so its bytes and content hash differ
+each time. PerceptualIndex catches those copies. It keeps two 64-bit
+perceptual hashes per stored image, computed from a tiny greyscale downscale:
+
+- dHash: whether each pixel of a 9x8 thumbnail is brighter than its right neighbour
+- pHash: the signs, against their median, of the 8x8 lowest frequencies of
+  the 32x32 thumbnail's DCT
+
+Both hashes see only brightness, so the blue, red and green versions of one
+icon hash alike. Each image also gets a colour layout: the mean RGB of each
+cell of a 4x4 grid, with transparent areas composited over grey.
+
+Two images are near-duplicates when both hashes are within
+PPTX_NEAR_DUPLICATE_DISTANCE bits of each other (Hamming distance), every
+colour layout value is within COLOUR_TOLERANCE, their aspect ratios match and
+they are the same type. offload_media() asks the index
+before storing an image and points the element at the stored near-duplicate
+instead, as long as that rendition is at least as large. Otherwise the image is
+stored and indexed, so later and smaller copies resolve to it.
+
+A lookup XORs the query against every indexed hash at once and counts bits
+with NumPy, about a millisecond for 100k images. Hashing decodes JPEGs at
+1/8 scale (draft mode). NumPy is in the optional part of requirements.txt;
+without it, the same hashes are computed and compared in pure Python, which is
+slower for large libraries.
+
+The index is an append-only JSON-lines file (one ``{"key", "dhash", "phash",
+"colours", "width", "height"}`` per stored image; entries without colours never
+match) shared by every process that writes
+to the same store. Each process reads only the lines appended since its last
+lookup. It is opt-in because it changes which image an element shows:
+
+    PPTX_NEAR_DUPLICATES            1 to enable for ?media=external parses
+                                    (pptx_convert: --near-duplicates)
+    PPTX_NEAR_DUPLICATE_DISTANCE    max differing bits per hash (default 8, of 64)
+    PPTX_PERCEPTUAL_INDEX           index file (default PPTX_MEDIA_DIR/.perceptual-index.jsonl)
+"""
+
+import json
+import math
+import os
+import statistics
+import threading
+from io import BytesIO
+
+from PIL import Image
+
+from media_storage import MEDIA_DIR
+from parser_logging import get_logger
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+log = get_logger('media')
+
+NEAR_DUPLICATES = os.environ.get('PPTX_NEAR_DUPLICATES', '') in ('1', 'true', 'yes')
+NEAR_DUPLICATE_DISTANCE = int(os.environ.get('PPTX_NEAR_DUPLICATE_DISTANCE', 8))
+INDEX_NAME = '.perceptual-index.jsonl'
+
+# Formats worth hashing; vector formats (SVG, EMF, WMF) are left to exact dedup
+HASHABLE_EXTENSIONS = ('.jpg', '.png', '.gif', '.bmp', '.webp', '.tiff')
+# Aspect ratios (width / height) further apart than this are different pictures
+ASPECT_TOLERANCE = 0.02
+# A stored rendition is reused if it is at least this fraction of the new image's width
+MIN_REUSE_SCALE = 0.95
+# Largest difference (0-255) allowed in any channel of any colour layout cell
+COLOUR_TOLERANCE = 24
+
+_DHASH_SIZE = (9, 8)
+_PHASH_SIZE = 32
+_PHASH_BITS = 8
+# Coefficients this close to the median (relative to the largest) count as equal to it.
+# Symmetric images such as icons have frequencies that are zero but for float noise
+# and resampling, which would otherwise flip bits between copies of one image
+_PHASH_MARGIN = 1e-3
+_COLOUR_GRID = (4, 4)
+_COLOUR_MATTE = (128, 128, 128, 255)
+
+
+def _dct_rows(size, count):
+    """First count rows of the (unnormalised) DCT-II matrix for size samples"""
+    return [[math.cos(math.pi * (2 * x + 1) * u / (2 * size)) for x in range(size)] for u in range(count)]
+
+
+_DCT = _dct_rows(_PHASH_SIZE, _PHASH_BITS)
+if np is not None:
+    _DCT_MATRIX = np.array(_DCT)
+    _POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def _bits(flags):
+    value = 0
+    for flag in flags:
+        value = (value << 1) | bool(flag)
+    return value
+
+
+def _colour_layout(image):
+    """Mean RGB per cell of a 4x4 grid, as 48 bytes; transparency is composited over grey"""
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        image = Image.alpha_composite(Image.new('RGBA', rgba.size, _COLOUR_MATTE), rgba)
+    # BOX averages whole areas, so resized and re-encoded copies agree
+    return image.convert('RGB').resize(_COLOUR_GRID, Image.Resampling.BOX).tobytes()
+
+
+def colours_match(a, b, tolerance=COLOUR_TOLERANCE):
+    return a is not None and b is not None and max(abs(x - y) for x, y in zip(a, b)) <= tolerance
+
+
+def image_hashes(data):
+    """(dHash, pHash, width, height, colour layout) of encoded image bytes, None if they can't be decoded"""
+    try:
+        image = Image.open(BytesIO(data))
+        width, height = image.size
+        if image.format == 'JPEG':
+            image.draft('RGB', (_PHASH_SIZE, _PHASH_SIZE))
+        colours = _colour_layout(image)
+        gray = image.convert('L')
+    except Exception as e:
+        log.debug("Could not hash image: %s", e)
+        return None
+    # reducing_gap box-reduces large images first, which is most of the cost otherwise
+    small = gray.resize((_PHASH_SIZE, _PHASH_SIZE), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    tiny = gray.resize(_DHASH_SIZE, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    if np is not None:
+        pixels = np.asarray(tiny, dtype=np.int16)
+        dhash = _bits((pixels[:, 1:] > pixels[:, :-1]).ravel())
+        low = (_DCT_MATRIX @ np.asarray(small, dtype=np.float64) @ _DCT_MATRIX.T).ravel()
+        phash = _bits(low > np.median(low) + _PHASH_MARGIN * np.abs(low).max())
+    else:
+        columns = _DHASH_SIZE[0]
+        pixels = list(tiny.tobytes())
+        dhash = _bits(pixels[i + 1] > pixels[i] for i in range(len(pixels)) if (i + 1) % columns)
+        rows = [list(row) for row in zip(*[iter(small.tobytes())] * _PHASH_SIZE)]
+        # DCT along rows then columns: (D x P) x D^T, 8x8
+        partial = [[sum(d * rows[y][x] for y, d in enumerate(dct_row)) for x in range(_PHASH_SIZE)] for dct_row in _DCT]
+        low = [sum(value * d for value, d in zip(partial_row, dct_row)) for partial_row in partial for dct_row in _DCT]
+        threshold = statistics.median(low) + _PHASH_MARGIN * max(abs(value) for value in low)
+        phash = _bits(value > threshold for value in low)
+    return dhash, phash, width, height, colours
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class PerceptualIndex:
+    """
+    Perceptual hashes of the images in one media store, backed by the JSON-lines
+    file at path (None keeps the index in memory only)
+    """
+
+    def __init__(self, path=None, distance=NEAR_DUPLICATE_DISTANCE):
+        self.path = path
+        self.distance = distance
+        self.keys = []
+        self.sizes = []         # (width, height) per key
+        self.colours = []       # colour layout per key, None for entries written without one
+        self.dhashes = []
+        self.phashes = []
+        self._known = set()
+        self._offset = 0        # bytes of the index file read so far
+        self._unsaved = []
+        self._arrays = None     # NumPy copies of dhashes and phashes, extended as the index grows
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _add(self, key, dhash, phash, width, height, colours):
+        if key in self._known:
+            return
+        self._known.add(key)
+        self.keys.append(key)
+        self.sizes.append((width, height))
+        self.colours.append(colours)
+        self.dhashes.append(dhash)
+        self.phashes.append(phash)
+
+    def refresh(self):
+        """Read the entries other processes appended to the index file since the last call"""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # A line still being written by another process is read next time
+        complete = data[:data.rfind(b'\n') + 1]
+        self._offset += len(complete)
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+                colours = bytes.fromhex(entry['colours']) if 'colours' in entry else None
+                self._add(entry['key'], int(entry['dhash'], 16), int(entry['phash'], 16), entry['width'],
+                          entry['height'], colours)
+            except (ValueError, KeyError):
+                log.warning("Skipped malformed perceptual index line in %s", self.path)
+
+    def add(self, key, hashes):
+        """Index a stored image; written to the index file by save()"""
+        dhash, phash, width, height, colours = hashes
+        if key not in self._known:
+            self._add(key, dhash, phash, width, height, colours)
+            self._unsaved.append({'key': key, 'dhash': f'{dhash:016x}', 'phash': f'{phash:016x}',
+                                  'colours': colours.hex(), 'width': width, 'height': height})
+
+    def save(self):
+        """Append the entries added since the last save to the index file"""
+        with self._lock:
+            if self.path is None or not self._unsaved:
+                self._unsaved = []
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            lines = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in self._unsaved)
+            # One O_APPEND write per batch, so concurrent writers' lines don't interleave
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, lines.encode('utf-8'))
+            finally:
+                os.close(fd)
+            self._unsaved = []
+
+    def _distances(self, dhash, phash):
+        """(dHash distances, pHash distances) to every indexed image"""
+        if np is None:
+            return ([hamming(dhash, other) for other in self.dhashes],
+                    [hamming(phash, other) for other in self.phashes])
+        count = len(self.keys)
+        if self._arrays is None or len(self._arrays[0]) != count:
+            start = len(self._arrays[0]) if self._arrays is not None else 0
+            extra = (np.array(self.dhashes[start:], dtype=np.uint64), np.array(self.phashes[start:], dtype=np.uint64))
+            self._arrays = extra if self._arrays is None else tuple(
+                np.concatenate([old, new]) for old, new in zip(self._arrays, extra))
+        distances = []
+        for hashes, query in zip(self._arrays, (dhash, phash)):
+            xor = np.bitwise_xor(hashes, np.uint64(query))
+            if hasattr(np, 'bitwise_count'):
+                distances.append(np.bitwise_count(xor))
+            else:
+                distances.append(_POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1))
+        return distances
+
+    def find(self, hashes, extension=None):
+        """
+        Key of the closest indexed near-duplicate of an image with these hashes
+        and colours that is at least as large (and has the same extension, if
+        given), or None
+        """
+        with self._lock:
+            self.refresh()
+            if not self.keys:
+                return None
+            dhash, phash, width, height, colours = hashes
+            aspect = width / max(height, 1)
+            d_distances, p_distances = self._distances(dhash, phash)
+            if np is not None:
+                candidates = np.flatnonzero((d_distances <= self.distance) & (p_distances <= self.distance))
+            else:
+                candidates = [i for i, (d, p) in enumerate(zip(d_distances, p_distances))
+                              if d <= self.distance and p <= self.distance]
+            best = None
+            for i in candidates:
+                key = self.keys[i]
+                stored_width, stored_height = self.sizes[i]
+                if extension is not None and not key.endswith(extension):
+                    continue
+                if abs(stored_width / max(stored_height, 1) - aspect) > ASPECT_TOLERANCE * aspect:
+                    continue
+                if stored_width < width * MIN_REUSE_SCALE:
+                    continue
+                if not colours_match(self.colours[i], colours):
+                    continue
+                score = int(d_distances[i]) + int(p_distances[i])
+                if best is None or score < best[0]:
+                    best = (score, key)
+            return best[1] if best else None
+
+    def canonical(self, key, data):
+        """
+        Key to store image data under: an indexed near-duplicate's key, or its
+        own key (indexed for later lookups) when there is none
+        """
+        extension = os.path.splitext(key)[1]
+        if key in self._known or extension not in HASHABLE_EXTENSIONS:
+            return key
+        hashes = image_hashes(data)
+        if hashes is None:
+            return key
+        found = self.find(hashes, extension)
+        if found is not None:
+            log.debug("Reusing %s for near-duplicate %s", found, key)
+            return found
+        with self._lock:
+            self.add(key, hashes)
+        return key
+
+
+_indexes = {}
+
+
+def index_for(path):
+    """Process-wide PerceptualIndex for the index file at path"""
+    if path not in _indexes:
+        _indexes[path] = PerceptualIndex(path)
+    return _indexes[path]
+
+
+def default_index():
+    """The API's index when PPTX_NEAR_DUPLICATES is on, else None"""
+    if not NEAR_DUPLICATES:
+        return None
+    return index_for(os.environ.get('PPTX_PERCEPTUAL_INDEX') or os.path.join(MEDIA_DIR, INDEX_NAME))
@@ -0,0 +1,240 @@
+"""
+Media storage backends
+
+Images can be moved out of a parse result and stored once per content hash
+rather than being inlined as data URLs. offload_media() does that against any
+MediaStore:
+
+- FilesystemStore writes files under a directory. pptx_convert writes next to
+  its JSON output; the API (``?media=external``) writes to ``PPTX_MEDIA_DIR``
+  (default ``media``) and serves the files from /api/media/.
+- S3Store puts objects into an S3-compatible bucket (AWS, MinIO, R2, ...)
+  through boto3, which is only needed when this store is used.
+- LocalS3Client is an in-process stand-in for the boto3 client calls S3Store
+  makes, for exercising the S3 path without a bucket.
+
+A key is the content hash plus an extension, so stored media never changes.
+It can be cached forever, and anything already present is skipped instead of
+uploaded again. Existence checks and uploads for one result run concurrently.
+
+    PPTX_MEDIA_STORE            filesystem (default) or s3
+    PPTX_MEDIA_DIR              filesystem store directory (default media)
+    PPTX_S3_BUCKET              bucket for the s3 store
+    PPTX_S3_PREFIX              key prefix (default library/media/)
+    PPTX_S3_REGION              region (default AWS_REGION, then us-east-1)
+    PPTX_S3_ENDPOINT_URL        endpoint of an S3-compatible service
+    PPTX_MEDIA_BASE_URL         public URL prefix for s3 objects
+    PPTX_MEDIA_UPLOAD_WORKERS   concurrent existence checks/uploads (default 8)
+"""
+
+import base64
+import functools
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from binary_transport import RawMedia, media_elements
+from parser_logging import get_logger
+
+log = get_logger('media')
+
+MEDIA_DIR = os.environ.get('PPTX_MEDIA_DIR', 'media')
+MEDIA_UPLOAD_WORKERS = int(os.environ.get('PPTX_MEDIA_UPLOAD_WORKERS', 8))
+
+# Content-addressed objects never change
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+MEDIA_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/bmp': '.bmp',
+    'image/webp': '.webp',
+    'image/tiff': '.tiff',
+    'image/svg+xml': '.svg',
+    'image/x-emf': '.emf',
+    'image/x-wmf': '.wmf',
+}
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    partial = f'{path}.{os.getpid()}.partial'
+    with open(partial, 'wb') as f:
+        f.write(data)
+    os.replace(partial, path)
+
+
+def media_filename(data, mime):
+    return hashlib.sha256(data).hexdigest()[:32] + MEDIA_EXTENSIONS.get(mime, '.bin')
+
+
+class MediaStore:
+    """Content-addressed media storage; subclasses implement exists/put/url"""
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def put(self, key, data, content_type):
+        raise NotImplementedError
+
+    def url(self, key):
+        raise NotImplementedError
+
+    def put_missing(self, items, workers=MEDIA_UPLOAD_WORKERS):
+        """
+        Store every (key, data, content_type) in items that isn't present yet,
+        checking and uploading concurrently. Returns the keys that were written.
+        """
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items)))) as pool:
+            present = list(pool.map(lambda item: self.exists(item[0]), items))
+            missing = [item for item, is_present in zip(items, present) if not is_present]
+            list(pool.map(lambda item: self.put(*item), missing))
+        return [key for key, _, _ in missing]
+
+
+class FilesystemStore(MediaStore):
+    """Media files in a directory, referenced as base_url + key"""
+
+    def __init__(self, root=MEDIA_DIR, base_url='/api/media/'):
+        self.root = root
+        self.base_url = base_url
+
+    def exists(self, key):
+        return os.path.exists(os.path.join(self.root, key))
+
+    def put(self, key, data, content_type):
+        write_atomic(os.path.join(self.root, key), data)
+
+    def url(self, key):
+        return self.base_url + key
+
+
+class LocalS3Client:
+    """
+    In-memory stand-in for the boto3 S3 client methods S3Store uses
+    (head_object, put_object), with boto3's error shape for missing keys
+    """
+
+    class NoSuchKey(Exception):
+        def __init__(self, key):
+            super().__init__(f'Not Found: {key}')
+            self.response = {'Error': {'Code': '404'}}
+
+    def __init__(self):
+        self.objects = {}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self.NoSuchKey(Key)
+        data, metadata = self.objects[(Bucket, Key)]
+        return dict(metadata, ContentLength=len(data))
+
+    def put_object(self, Bucket, Key, Body, **metadata):
+        self.objects[(Bucket, Key)] = (bytes(Body), metadata)
+        return {}
+
+
+class S3Store(MediaStore):
+    """Objects in an S3-compatible bucket under prefix"""
+
+    def __init__(self, bucket, prefix='library/media/', region=None, endpoint_url=None,
+                 base_url=None, client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        region = region or os.environ.get('AWS_REGION', 'us-east-1')
+        if client is None:
+            import boto3  # only needed for this store
+            client = boto3.client('s3', region_name=region, endpoint_url=endpoint_url)
+        self.client = client
+        if base_url is None:
+            base_url = (f'{endpoint_url.rstrip("/")}/{bucket}/' if endpoint_url
+                        else f'https://{bucket}.s3.{region}.amazonaws.com/')
+        self.base_url = base_url
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put(self, key, data, content_type):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data,
+                               ContentType=content_type, CacheControl=IMMUTABLE_CACHE_CONTROL)
+
+    def url(self, key):
+        return self.base_url + self.prefix + key
+
+
+@functools.lru_cache(maxsize=None)
+def get_media_store(kind=None):
+    """Media store configured by the environment (see module docstring), one per process"""
+    kind = kind or os.environ.get('PPTX_MEDIA_STORE', 'filesystem')
+    if kind == 's3':
+        return S3Store(
+            os.environ['PPTX_S3_BUCKET'],
+            prefix=os.environ.get('PPTX_S3_PREFIX', 'library/media/'),
+            region=os.environ.get('PPTX_S3_REGION'),
+            endpoint_url=os.environ.get('PPTX_S3_ENDPOINT_URL'),
+            base_url=os.environ.get('PPTX_MEDIA_BASE_URL'),
+        )
+    if kind == 'filesystem':
+        return FilesystemStore()
+    raise ValueError(f'Unknown media store: {kind}')
+
+
+def inline_media(src):
+    """(data, mime) for an inline image source, or None"""
+    if isinstance(src, RawMedia):
+        return src.data, src.mime
+    if isinstance(src, str) and src.startswith('data:') and ';base64,' in src:
+        header, payload = src.split(',', 1)
+        return base64.b64decode(payload), header[len('data:'):].split(';', 1)[0]
+    return None
+
+
+def offload_media(result, store, workers=MEDIA_UPLOAD_WORKERS, similar=None):
+    """
+    Move inline images in result into store and replace each src with its URL.
+    With a media_similarity.PerceptualIndex as similar, images with a stored
+    near-duplicate point at that instead of being stored again.
+    Returns {'media', 'uploaded', 'skipped', 'near_duplicates', 'bytes_uploaded'}.
+    """
+    pending = {}
+    canonical = {}      # content key -> key stored or reused for it
+    references = []
+    for element in media_elements(result):
+        inline = inline_media(element.get('src'))
+        if inline is None:
+            continue
+        data, mime = inline
+        key = media_filename(data, mime)
+        if key not in canonical:
+            canonical[key] = similar.canonical(key, data) if similar is not None else key
+            if canonical[key] == key:
+                pending[key] = (key, data, mime)
+        references.append((element, canonical[key]))
+
+    written = set(store.put_missing(pending.values(), workers=workers))
+    if similar is not None:
+        similar.save()
+    for element, key in references:
+        element['src'] = store.url(key)
+
+    stats = {
+        'media': len(pending),
+        'uploaded': len(written),
+        'skipped': len(pending) - len(written),
+        'near_duplicates': len(canonical) - len(pending),
+        'bytes_uploaded': sum(len(pending[key][1]) for key in written),
+    }
+    if canonical:
+        log.info("Offloaded %d media (%d uploaded, %d already stored, %d near-duplicates reused)",
+                 stats['media'], stats['uploaded'], stats['skipped'], stats['near_duplicates'], extra=stats)
+    return stats
@@ -0,0 +1,69 @@
+"""
+Memory budget for bounded-memory PPTX imports
+
+When a ceiling is configured (``PPTX_MEMORY_CEILING_MB`` or the
+``memory_ceiling_mb`` argument of parse_pptx_to_json) the parser charges
+everything it retains - the source deck held by python-pptx and each encoded
+image - against a MemoryBudget, sizes per-image compression targets and decode
+limits from what is left, and aborts with MemoryBudgetExceeded instead of
+letting the worker get OOM-killed.
+"""
+
+import resource
+
+# base64 turns every 3 bytes into 4 characters
+BASE64_RATIO = 4 / 3
+
+# Share of the remaining budget media may claim; the rest is kept for building
+# and serialising the result JSON
+MEDIA_SHARE = 0.5
+
+# Decoding holds the decoded frame plus one converted copy, 4 bytes per pixel
+DECODE_BYTES_PER_PIXEL = 8
+
+MIN_MEDIA_TARGET_KB = 8
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when a parse would retain more than its memory ceiling"""
+
+
+class MemoryBudget:
+    """Bytes retained by one parse, checked against a ceiling"""
+
+    def __init__(self, ceiling_mb):
+        self.ceiling = int(ceiling_mb * 1024 * 1024)
+        self.used = 0
+
+    @property
+    def remaining(self):
+        return max(0, self.ceiling - self.used)
+
+    def charge(self, nbytes, what):
+        self.used += nbytes
+        if self.used > self.ceiling:
+            raise MemoryBudgetExceeded(
+                f"{what} needs {nbytes / (1024 * 1024):.1f} MB; "
+                f"import would exceed the {self.ceiling / (1024 * 1024):.0f} MB memory ceiling"
+            )
+
+    def release(self, nbytes):
+        self.used = max(0, self.used - nbytes)
+
+    def media_target_kb(self, default_kb, remaining_items):
+        """Compression target for the next image so the remaining media fit the budget"""
+        share = self.remaining * MEDIA_SHARE / max(1, remaining_items) / BASE64_RATIO / 1024
+        return max(MIN_MEDIA_TARGET_KB, min(default_kb, share))
+
+    def max_decode_pixels(self):
+        """Largest image that can be decoded without crossing the ceiling"""
+        return self.remaining // DECODE_BYTES_PER_PIXEL
+
+
+def current_rss():
+    """Resident set size of this process in bytes (0 where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return 0
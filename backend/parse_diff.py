@@ -0,0 +1,142 @@
+"""
+Element-level diff between two parses of a deck
+
+After a deck is re-imported, diff() compares the new parse with the previous
+one and reports only what changed, so an open (possibly collaborative) editing
+session can apply the re-import as a patch instead of replacing the document.
+Elements are matched on the shape part of their ID (see element_ids.py); an
+element whose ID changed kept its shape but not its content.
+
+The previous parse can be a full or compact result, a sharded result or just
+its manifest, whose slide entries list their element IDs:
+
+    {
+      "slides": {"count": 12, "previous_count": 11,
+                 "changed": [{"slide": 0, "background": "#112233"}]},
+      "added":   [{"slide": 3, "element": {...}}],
+      "removed": [{"slide": 5, "id": "text-261-4-0c1d2e3f"}],
+      "changed": [{"slide": 1, "previous": "image-257-3-aa00bb11", "element": {...}},
+                  {"slide": 4, "previous_slide": 2, "previous": "...", "element": {...}}],
+      "order":   [{"slide": 1, "ids": [...]}],
+      "backgrounds": [{"id": "3f2a...9c.jpg", "src": "...", ...}],
+      "unchanged": 57
+    }
+
+``slides.changed`` lists the properties that changed on slides the previous
+result had, and every property (``id`` and ``title`` included) of slides
+appended after them. ``order`` gives the final element IDs, in order, of every slide whose
+sequence of shapes changed (elements added, removed, moved or restacked).
+``backgrounds`` lists the background images (see backgrounds.py) that the
+previous result didn't have.
+"""
+
+from element_ids import element_key
+import compact_schema
+import firestore_shards
+
+
+def _result(result):
+    """The part of a (possibly sharded) result holding its slides and top-level fields"""
+    if firestore_shards.is_sharded(result):
+        return result.get('manifest', result)
+    return result
+
+
+def _slides(result):
+    if firestore_shards.is_sharded(result):
+        return _result(result)['slides']
+    return compact_schema.expand(result).get('slides', [])
+
+
+def _slide_ids(slide):
+    if 'ids' in slide:
+        return slide['ids']
+    return [element['id'] for element in slide.get('elements', [])]
+
+
+def _index(slides):
+    """
+    Map of element keys to (slide index, position, element id), plus the keys
+    of each slide in order
+    """
+    index = {}
+    sequences = []
+    occurrences = {}
+    for slide_num, slide in enumerate(slides):
+        sequence = []
+        for position, element_id in enumerate(_slide_ids(slide)):
+            key = element_key(element_id)
+            # Results from parser versions before 12 can repeat a shape's ID
+            count = occurrences[key] = occurrences.get(key, 0) + 1
+            if count > 1:
+                key = f'{key}#{count}'
+            index[key] = (slide_num, position, element_id)
+            sequence.append(key)
+        sequences.append(sequence)
+    return index, sequences
+
+
+def _slide_fields(slide):
+    return {key: value for key, value in slide.items() if key not in ('id', 'title', 'elements')}
+
+
+def diff(previous, current):
+    """Diff the current parse result against a previous result or manifest (see module docstring)"""
+    previous_slides = _slides(previous)
+    current_slides = _slides(current)
+    before, before_sequences = _index(previous_slides)
+    after, after_sequences = _index(current_slides)
+
+    added, changed = [], []
+    unchanged = 0
+    for key, (slide_num, position, element_id) in after.items():
+        element = current_slides[slide_num]['elements'][position]
+        if key not in before:
+            added.append({'slide': slide_num, 'element': element})
+            continue
+        previous_slide, _, previous_id = before[key]
+        if previous_id == element_id and previous_slide == slide_num:
+            unchanged += 1
+            continue
+        entry = {'slide': slide_num, 'previous': previous_id, 'element': element}
+        if previous_slide != slide_num:
+            entry['previous_slide'] = previous_slide
+        changed.append(entry)
+    removed = [{'slide': slide_num, 'id': element_id}
+               for key, (slide_num, _, element_id) in before.items() if key not in after]
+
+    slide_changes = []
+    for slide_num, slide in enumerate(current_slides):
+        if slide_num >= len(previous_slides):
+            # Appended slides carry all their properties; their elements are in added
+            slide_changes.append(dict(slide=slide_num, **{key: value for key, value in slide.items()
+                                                          if key != 'elements'}))
+            continue
+        previous_slide = previous_slides[slide_num]
+        if 'ids' in previous_slide:
+            continue  # manifests don't carry slide properties
+        fields = _slide_fields(slide)
+        previous_fields = _slide_fields(previous_slide)
+        delta = {key: value for key, value in fields.items() if previous_fields.get(key) != value}
+        if delta:
+            slide_changes.append(dict(slide=slide_num, **delta))
+
+    order = [{'slide': slide_num, 'ids': [after[key][2] for key in sequence]}
+             for slide_num, sequence in enumerate(after_sequences)
+             if slide_num >= len(before_sequences) or before_sequences[slide_num] != sequence]
+
+    previous_backgrounds = {background['id'] for background in
+                            _result(previous).get('backgrounds', [])}
+    backgrounds = [background for background in current.get('backgrounds', [])
+                   if background['id'] not in previous_backgrounds]
+
+    return {
+        'slides': {'count': len(current_slides), 'previous_count': len(previous_slides),
+                   'changed': slide_changes},
+        'added': added,
+        'removed': removed,
+        'changed': changed,
+        'order': order,
+        'backgrounds': backgrounds,
+        'unchanged': unchanged,
+    }
@@ -0,0 +1,84 @@
+"""
+Logging setup for the PPTX parser backend
+
+Each parser stage logs through its own child of the ``pptx`` logger, so the
+noisy per-shape stages can be turned up without flooding the rest:
+
+    PPTX_LOG_LEVEL=INFO PPTX_LOG_LEVELS="map=DEBUG,extract=WARNING" python3 app.py
+
+Per-shape diagnostics are emitted at DEBUG with lazy %-style arguments, so they
+are never formatted unless that stage is enabled. Set ``PPTX_LOG_FORMAT=json``
+to get one JSON object per line instead of plain text.
+"""
+
+import json
+import logging
+import os
+
+ROOT_LOGGER = 'pptx'
+STAGES = ('api', 'parse', 'guard', 'extract', 'compress', 'map', 'slides', 'optimize', 'media')
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Format records as JSON lines: timestamp, level, stage, message and any extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'stage': record.name.rpartition('.')[2],
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def get_logger(stage):
+    """Return the logger for a parser stage (``pptx.<stage>``)"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{stage}')
+
+
+def parse_stage_levels(spec):
+    """Parse ``"map=DEBUG,extract=WARNING"`` into ``{'map': 'DEBUG', 'extract': 'WARNING'}``"""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        stage, level = item.split('=', 1)
+        levels[stage.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level=None, stage_levels=None, fmt=None):
+    """
+    Install the parser log handler. Safe to call more than once; later calls
+    replace the handler and levels set by earlier ones.
+    """
+    level = (level or os.environ.get('PPTX_LOG_LEVEL', 'INFO')).upper()
+    if stage_levels is None:
+        stage_levels = parse_stage_levels(os.environ.get('PPTX_LOG_LEVELS'))
+    fmt = fmt or os.environ.get('PPTX_LOG_FORMAT', 'text')
+
+    root = logging.getLogger(ROOT_LOGGER)
+    for handler in list(root.handlers):
+        if getattr(handler, '_pptx_handler', False):
+            root.removeHandler(handler)
+
+    handler = logging.StreamHandler()
+    handler._pptx_handler = True
+    handler.setFormatter(StructuredFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+
+    for stage in set(STAGES) | set(stage_levels):
+        get_logger(stage).setLevel(stage_levels.get(stage, logging.NOTSET))
+    return root
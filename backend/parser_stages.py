@@ -0,0 +1,61 @@
+"""
+Stage instrumentation for the PPTX parser
+
+parse_pptx_to_json wraps each of its stages in ``stage(name)``. Nothing is
+recorded unless an observer is installed with ``observe()``, so the
+production path only pays for one attribute lookup per stage:
+
+    with observe(StageTimer()) as timer:
+        parse_pptx_to_json(path)
+    print(timer.timings)   # {'open': 0.01, 'extract': 0.2, ...}
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ('guard', 'open', 'extract', 'map', 'slides', 'optimize')
+
+_local = threading.local()
+
+
+class StageTimer:
+    """Observer that accumulates wall-clock seconds per stage"""
+
+    def __init__(self):
+        self.timings = {}
+        self._started = {}
+
+    def enter(self, name):
+        self._started[name] = time.perf_counter()
+
+    def exit(self, name):
+        elapsed = time.perf_counter() - self._started.pop(name)
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def observe(observer):
+    """Install an observer for every stage run on this thread until the block exits"""
+    observers = getattr(_local, 'observers', ())
+    _local.observers = observers + (observer,)
+    try:
+        yield observer
+    finally:
+        _local.observers = observers
+
+
+@contextmanager
+def stage(name):
+    """Mark a parser stage; notifies installed observers on entry and exit"""
+    observers = getattr(_local, 'observers', ())
+    if not observers:
+        yield
+        return
+    for observer in observers:
+        observer.enter(name)
+    try:
+        yield
+    finally:
+        for observer in reversed(observers):
+            observer.exit(name)
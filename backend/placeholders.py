@@ -0,0 +1,204 @@
+"""
+Placeholder inheritance (slide -> layout -> master)
+
+A placeholder on a slide usually defines little more than its text. Its
+position and text style come from the matching placeholder on the slide's
+layout, then the master's placeholder, then the master's ``p:txStyles``. The
+resolver indexes each layout's and master's placeholders by type and ``idx``
+the first time the layout is seen, and memoises the effective properties per
+(layout, type, idx, level). Each slide placeholder then costs a few dict
+lookups instead of a walk through the layout and master XML:
+
+    resolver = PlaceholderResolver()
+    geometry, style = resolver.resolve(slide.slide_layout, shape)
+    # geometry: (left, top, width, height) in EMU, or None if the shape has its own
+    # style: {'size': 44.0, 'typeface': 'Calibri Light', 'bold': True, 'italic': False,
+    #         'color': '#1f3864', 'align': 'center', 'bullet': '•'}  (keys present when set)
+
+Given a theme_colors.ThemeResolver, theme fonts (``+mj-lt``) and scheme colours
+are resolved too; otherwise only explicit typefaces and RGB colours are kept.
+"""
+
+from pptx.oxml.ns import qn
+
+from theme_colors import solid_fill
+
+ALIGNMENTS = {'l': 'left', 'ctr': 'center', 'r': 'right', 'just': 'justify', 'dist': 'justify'}
+
+# Layout placeholder type -> master placeholder type it inherits from
+MASTER_TYPES = {'title': 'title', 'ctrTitle': 'title', 'dt': 'dt', 'ftr': 'ftr', 'sldNum': 'sldNum', 'hdr': 'hdr'}
+# Master placeholder type -> p:txStyles child holding its default text style
+TEXT_STYLES = {'title': 'p:titleStyle', 'body': 'p:bodyStyle'}
+
+_LEVELS = [qn(f'a:lvl{level}pPr') for level in range(1, 10)]
+_SP, _PH, _NV_PR, _XFRM, _OFF, _EXT = (qn(tag) for tag in ('p:sp', 'p:ph', 'p:nvPr', 'a:xfrm', 'a:off', 'a:ext'))
+_DEF_RPR, _LATIN, _SRGB = (qn(tag) for tag in ('a:defRPr', 'a:latin', 'a:srgbClr'))
+_BU_CHAR, _BU_AUTO_NUM, _BU_NONE = (qn(tag) for tag in ('a:buChar', 'a:buAutoNum', 'a:buNone'))
+
+
+def bullet(p_pr):
+    """
+    Bullet set by a paragraph properties element: its character, the
+    auto-numbering scheme (e.g. 'arabicPeriod'), '' for none, or None if unset
+    """
+    if p_pr is None:
+        return None
+    for child in p_pr:
+        if child.tag == _BU_CHAR:
+            return child.get('char', '')
+        if child.tag == _BU_AUTO_NUM:
+            return child.get('type', 'arabicPeriod')
+        if child.tag == _BU_NONE:
+            return ''
+    return None
+
+
+def placeholder_key(element):
+    """(type, idx) of a placeholder shape element, or None for other shapes"""
+    nv = element[0] if len(element) else None
+    nv_pr = nv.find(_NV_PR) if nv is not None else None
+    ph = nv_pr.find(_PH) if nv_pr is not None else None
+    if ph is None:
+        return None
+    return ph.get('type', 'obj'), int(ph.get('idx', 0))
+
+
+def _geometry(element):
+    sp_pr = element.find(qn('p:spPr'))
+    # Graphic frames carry p:xfrm directly
+    xfrm = sp_pr.find(_XFRM) if sp_pr is not None else element.find(qn('p:xfrm'))
+    if xfrm is None:
+        return None
+    off, ext = xfrm.find(_OFF), xfrm.find(_EXT)
+    if off is None or ext is None:
+        return None
+    return int(off.get('x')), int(off.get('y')), int(ext.get('cx')), int(ext.get('cy'))
+
+
+def _list_style(element):
+    tx_body = element.find(qn('p:txBody'))
+    return tx_body.find(qn('a:lstStyle')) if tx_body is not None else None
+
+
+def text_style(list_style, level=0, theme=None, master=None):
+    """
+    Style set by one a:lstStyle (or p:titleStyle, ...) element for a paragraph
+    level; theme and master resolve theme fonts and colours
+    """
+    if list_style is None:
+        return {}
+    p_pr = list_style.find(_LEVELS[min(level, 8)])
+    if p_pr is None:
+        return {}
+    style = {}
+    if p_pr.get('algn') in ALIGNMENTS:
+        style['align'] = ALIGNMENTS[p_pr.get('algn')]
+    if bullet(p_pr) is not None:
+        style['bullet'] = bullet(p_pr)
+    r_pr = p_pr.find(_DEF_RPR)
+    if r_pr is None:
+        return style
+    if r_pr.get('sz'):
+        style['size'] = int(r_pr.get('sz')) / 100
+    if r_pr.get('b') is not None:
+        style['bold'] = r_pr.get('b') in ('1', 'true')
+    if r_pr.get('i') is not None:
+        style['italic'] = r_pr.get('i') in ('1', 'true')
+    latin = r_pr.find(_LATIN)
+    typeface = latin.get('typeface') if latin is not None else None
+    if typeface and typeface.startswith('+'):
+        typeface = theme.font(typeface, master) if theme else None
+    if typeface:
+        style['typeface'] = typeface
+    color = solid_fill(r_pr)
+    if theme and color is not None:
+        color = theme.resolve(color, master)
+    elif color is not None:
+        color = f"#{color.get('val').lower()}" if color.tag == _SRGB and color.get('val') else None
+    if color:
+        style['color'] = color
+    return style
+
+
+class _Placeholders:
+    """Placeholder shapes of one layout or master, by idx and by type"""
+
+    def __init__(self, root):
+        self.by_idx = {}
+        self.by_type = {}
+        for element in root.iter(_SP):
+            key = placeholder_key(element)
+            if key is not None:
+                self.by_idx.setdefault(key[1], element)
+                self.by_type.setdefault(key[0], element)
+
+
+class PlaceholderResolver:
+    """
+    Effective placeholder geometry and text style; one instance per
+    presentation, sharing the presentation's ThemeResolver if given
+    """
+
+    def __init__(self, theme=None):
+        self.theme = theme
+        self._layouts = {}
+        self._masters = {}
+        self._resolved = {}
+
+    def _master(self, master):
+        key = master.part.partname
+        if key not in self._masters:
+            tx_styles = master._element.find(qn('p:txStyles'))
+            self._masters[key] = (_Placeholders(master._element), tx_styles)
+        return self._masters[key]
+
+    def _layout(self, layout):
+        key = layout.part.partname
+        if key not in self._layouts:
+            self._layouts[key] = (_Placeholders(layout._element), self._master(layout.slide_master))
+        return key, self._layouts[key]
+
+    def _inherited(self, layout, ph_type, idx, level):
+        layout_key, (layout_placeholders, (master_placeholders, tx_styles)) = self._layout(layout)
+        memo_key = (layout_key, ph_type, idx, level)
+        if memo_key in self._resolved:
+            return self._resolved[memo_key]
+
+        layout_ph = layout_placeholders.by_idx.get(idx)
+        if layout_ph is None:
+            layout_ph = layout_placeholders.by_type.get(ph_type)
+        master_type = MASTER_TYPES.get(ph_type, 'body')
+        if layout_ph is not None:
+            master_type = MASTER_TYPES.get(placeholder_key(layout_ph)[0], 'body')
+        master_ph = master_placeholders.by_type.get(master_type)
+
+        # Least specific first, so later layers win
+        master = layout.slide_master
+        style = {}
+        if tx_styles is not None:
+            style.update(text_style(tx_styles.find(qn(TEXT_STYLES.get(master_type, 'p:otherStyle'))), level,
+                                    self.theme, master))
+        geometry = None
+        for element in (master_ph, layout_ph):
+            if element is not None:
+                style.update(text_style(_list_style(element), level, self.theme, master))
+                geometry = _geometry(element) or geometry
+
+        self._resolved[memo_key] = geometry, style
+        return geometry, style
+
+    def resolve(self, layout, shape, level=0):
+        """
+        (geometry, style) of shape on a slide using layout; geometry is None
+        when the shape positions itself, and both are empty for non-placeholders
+        """
+        key = placeholder_key(shape._element)
+        if key is None:
+            return None, {}
+        geometry, style = self._inherited(layout, key[0], key[1], level)
+        list_style = _list_style(shape._element)
+        if list_style is not None and len(list_style):
+            style = dict(style, **text_style(list_style, level, self.theme, layout.slide_master))
+        if _geometry(shape._element) is not None:
+            geometry = None
+        return geometry, style
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for parse_pptx_to_json
+
+Generates the synthetic corpus (see pptx_corpus.py), times the full parse and
+each parser stage, and writes the results as JSON. Pass ``--baseline`` to fail
+(exit code 1) when a deck got slower than the baseline by more than
+``--threshold``:
+
+    python3 pptx_benchmark.py --output bench.json
+    python3 pptx_benchmark.py --baseline bench.json --threshold 0.15
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from dataclasses import asdict
+
+from app import parse_pptx_to_json
+from parser_logging import configure_logging
+from parser_stages import StageTimer, observe
+from pptx_corpus import STANDARD_CORPUS, build_corpus
+
+# Differences below this many seconds are treated as noise by the regression gate
+NOISE_FLOOR_S = 0.005
+
+
+def benchmark_deck(path, repeat=3, warmup=1):
+    """Parse ``path`` repeatedly and return median total and per-stage seconds"""
+    for _ in range(warmup):
+        parse_pptx_to_json(path)
+
+    totals = []
+    stages = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with observe(StageTimer()) as timer:
+            parse_pptx_to_json(path)
+        totals.append(time.perf_counter() - started)
+        for name, seconds in timer.timings.items():
+            stages.setdefault(name, []).append(seconds)
+
+    return {
+        'total_s': statistics.median(totals),
+        'min_s': min(totals),
+        'max_s': max(totals),
+        'stages': {name: statistics.median(values) for name, values in stages.items()},
+    }
+
+
+def run_benchmarks(specs=STANDARD_CORPUS, corpus_dir='bench_corpus', repeat=3, warmup=1):
+    results = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'decks': {},
+    }
+    for spec, path in build_corpus(specs, corpus_dir):
+        deck = benchmark_deck(path, repeat=repeat, warmup=warmup)
+        deck['spec'] = asdict(spec)
+        results['decks'][spec.name] = deck
+        print(f"{spec.name:<14} {deck['total_s'] * 1000:9.1f} ms  " +
+              '  '.join(f"{name}={seconds * 1000:.1f}" for name, seconds in deck['stages'].items()))
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """Return ``(deck, baseline_s, current_s)`` for every deck slower than the baseline allows"""
+    regressions = []
+    for name, deck in results['decks'].items():
+        previous = baseline.get('decks', {}).get(name)
+        if not previous:
+            continue
+        allowed = previous['total_s'] * (1 + threshold)
+        if deck['total_s'] > allowed and deck['total_s'] - previous['total_s'] > NOISE_FLOOR_S:
+            regressions.append((name, previous['total_s'], deck['total_s']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-dir', default='bench_corpus', help='where generated decks are cached')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per deck (median is reported)')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per deck')
+    parser.add_argument('--only', help='comma-separated deck names to run')
+    parser.add_argument('--output', help='write results JSON to this file')
+    parser.add_argument('--baseline', help='results JSON from a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown vs baseline (0.15 = 15%%)')
+    args = parser.parse_args(argv)
+
+    configure_logging(level='WARNING')
+
+    specs = STANDARD_CORPUS
+    if args.only:
+        wanted = set(args.only.split(','))
+        specs = tuple(spec for spec in specs if spec.name in wanted)
+
+    results = run_benchmarks(specs, args.corpus_dir, repeat=args.repeat, warmup=args.warmup)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms "
+                  f"(+{(after / before - 1) * 100:.0f}%, allowed {args.threshold * 100:.0f}%)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
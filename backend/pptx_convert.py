@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Bulk converter: PPTX files -> editor JSON, offline
+
+Parses every deck found under the given directories or glob patterns in a
+process pool. Writes one JSON file per deck to ``--output-dir`` and every image
+once, by content hash, to ``--media-dir`` (or an S3 bucket with
+``--media-store s3``). Image elements point at those files by relative path
+(or URL) rather than carrying inline data URLs. Decks whose content
+hash matches the manifest from the previous run (and whose JSON is still
+there) are skipped:
+
+    python3 -m pptx_convert templates/ --output-dir converted
+    python3 -m pptx_convert 'library/**/*.pptx' --workers 8 --force
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app import PARSER_VERSION, MemoryBudgetExceeded, UnsafeDeckError, parse_pptx_to_json
+from media_similarity import INDEX_NAME, index_for
+from media_storage import FilesystemStore, get_media_store, offload_media, write_atomic
+from parser_logging import configure_logging
+import compact_schema
+import serializer
+
+MB = 1024 * 1024
+
+# Bump when the output layout changes so the next run re-converts everything
+# (parser changes are covered by PARSER_VERSION)
+FORMAT_VERSION = 1
+
+MANIFEST_NAME = '.pptx_convert.json'
+
+
+def find_decks(inputs):
+    """Map output names (relative paths without extension) to deck paths"""
+    decks = {}
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            root = pattern
+            paths = glob.glob(os.path.join(pattern, '**', '*.pptx'), recursive=True)
+        else:
+            root = None
+            paths = glob.glob(pattern, recursive=True)
+        for path in sorted(paths):
+            if not path.lower().endswith('.pptx') or os.path.basename(path).startswith('~$'):
+                continue  # PowerPoint lock files
+            name = os.path.splitext(os.path.relpath(path, root) if root else os.path.basename(path))[0]
+            if name in decks and os.path.abspath(decks[name]) != os.path.abspath(path):
+                raise SystemExit(f"error: {path} and {decks[name]} would both be written to {name}.json")
+            decks[name] = path
+    return decks
+
+
+def content_hash(path, compact=False, media_store='filesystem', near_duplicates=False):
+    schema = compact_schema.SCHEMA if compact else 'full'
+    media = f'{media_store}+near' if near_duplicates else media_store
+    digest = hashlib.sha256(f'pptx_convert/{FORMAT_VERSION}/{PARSER_VERSION}/{schema}/{media}:'.encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def convert_deck(path, json_path, media_dir, ceiling_mb=None, compact=False, media_store='filesystem',
+                 index_path=None):
+    """
+    Pool task: parse one deck and write its JSON; returns a stats dict. With
+    index_path, images reuse stored near-duplicates (see media_similarity.py).
+    """
+    started = time.perf_counter()
+    stats = {'path': path, 'bytes': os.path.getsize(path)}
+    try:
+        result = parse_pptx_to_json(path, memory_ceiling_mb=ceiling_mb, compact=compact)
+    except (MemoryBudgetExceeded, UnsafeDeckError) as e:
+        stats['error'] = str(e)
+        return stats
+    if result.get('metadata', {}).get('error'):
+        stats['error'] = result['metadata']['error']
+        return stats
+
+    if media_store == 'filesystem':
+        # Reference media relative to this deck's JSON file
+        relative = os.path.relpath(media_dir, os.path.dirname(json_path)).replace(os.sep, '/')
+        store = FilesystemStore(media_dir, base_url=relative + '/')
+    else:
+        store = get_media_store(media_store)
+    offloaded = offload_media(result, store, similar=index_for(index_path) if index_path else None)
+    stats.update(media_written=offloaded['uploaded'], near_duplicates=offloaded['near_duplicates'])
+    write_atomic(json_path, serializer.dumps(result))
+    stats.update(slides=len(result['slides']), duration_s=time.perf_counter() - started)
+    return stats
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='directories (searched recursively) or glob patterns')
+    parser.add_argument('--output-dir', default='converted', help='where deck JSON files are written')
+    parser.add_argument('--media-dir', help='where media files are written (default: OUTPUT_DIR/media)')
+    parser.add_argument('--media-store', choices=('filesystem', 's3'), default='filesystem',
+                        help='s3 uploads media to the bucket configured by PPTX_S3_* (see media_storage.py)')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='parser processes')
+    parser.add_argument('--ceiling-mb', type=float, help='per-deck memory ceiling (bounded-memory mode)')
+    parser.add_argument('--compact', action='store_true', help='write the compact schema (see compact_schema.py)')
+    parser.add_argument('--near-duplicates', action='store_true',
+                        help='reuse stored near-identical images instead of storing each re-encoded copy '
+                             '(perceptual hashes, see media_similarity.py)')
+    parser.add_argument('--force', action='store_true', help='convert decks even if their output is up to date')
+    args = parser.parse_args(argv)
+
+    configure_logging(level='WARNING')
+
+    media_dir = args.media_dir or os.path.join(args.output_dir, 'media')
+    # Shared by the pool's processes; next to the media it describes
+    index_path = os.path.join(media_dir if args.media_store == 'filesystem' else args.output_dir,
+                              INDEX_NAME) if args.near_duplicates else None
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    decks = find_decks(args.inputs)
+    if not decks:
+        print("No PPTX files found", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    jobs = {}
+    skipped = 0
+    for name, path in decks.items():
+        json_path = os.path.join(args.output_dir, name + '.json')
+        digest = content_hash(path, args.compact, args.media_store, args.near_duplicates)
+        if not args.force and manifest.get(name) == digest and os.path.exists(json_path):
+            skipped += 1
+            continue
+        jobs[name] = (path, json_path, digest)
+
+    converted = failed = slides = media_written = near_duplicates = 0
+    bytes_in = 0
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = {
+                pool.submit(convert_deck, path, json_path, media_dir, args.ceiling_mb, args.compact,
+                            args.media_store, index_path): name
+                for name, (path, json_path, _) in jobs.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    stats = {'error': f'{type(e).__name__}: {e}'}
+                if 'error' in stats:
+                    failed += 1
+                    manifest.pop(name, None)
+                    print(f"FAILED    {name}: {stats['error']}")
+                    continue
+                converted += 1
+                slides += stats['slides']
+                media_written += stats['media_written']
+                near_duplicates += stats['near_duplicates']
+                bytes_in += stats['bytes']
+                manifest[name] = jobs[name][2]
+                print(f"converted {name} ({stats['slides']} slides, {stats['duration_s']:.2f}s)")
+    finally:
+        if jobs:
+            write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{converted} converted, {skipped} up to date, {failed} failed in {elapsed:.1f}s "
+          f"({max(1, args.workers)} worker processes)")
+    if converted:
+        print(f"{converted / elapsed:.2f} decks/s, {slides / elapsed:.1f} slides/s, "
+              f"{bytes_in / MB / elapsed:.2f} MB/s, {media_written} new media files"
+              + (f", {near_duplicates} near-duplicates reused" if args.near_duplicates else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
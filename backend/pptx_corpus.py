@@ -0,0 +1,168 @@
+"""
+Synthetic PPTX corpus generator for parser benchmarks
+
+Builds deterministic decks from a DeckSpec (slide count, images per slide
+with size and format, text boxes, groups and tables) using python-pptx.
+Generated decks are cached by spec digest, so repeated benchmark runs reuse
+the same files.
+"""
+
+import hashlib
+import json
+import os
+import random
+from dataclasses import asdict, dataclass
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+from pptx import Presentation
+from pptx.util import Emu, Inches, Pt
+
+SLIDE_WIDTH = Inches(10)
+SLIDE_HEIGHT = Inches(7.5)
+BLANK_LAYOUT = 6
+
+
+@dataclass(frozen=True)
+class DeckSpec:
+    """Shape of a synthetic deck; per-slide counts are repeated on every slide"""
+    name: str
+    slides: int = 10
+    images: int = 0
+    image_size: tuple = (800, 600)
+    image_format: str = 'PNG'
+    shared_images: bool = False
+    text_boxes: int = 0
+    groups: int = 0
+    group_children: int = 3
+    tables: int = 0
+    table_size: tuple = (5, 4)
+    seed: int = 0
+
+    def digest(self):
+        payload = json.dumps(asdict(self), sort_keys=True).encode('utf-8')
+        return hashlib.sha1(payload).hexdigest()[:12]
+
+
+# Decks the regression gate runs against; keep them stable so results stay comparable
+STANDARD_CORPUS = (
+    DeckSpec('text-heavy', slides=40, text_boxes=12),
+    DeckSpec('image-heavy', slides=20, images=3, image_size=(1600, 1200), image_format='JPEG'),
+    DeckSpec('png-media', slides=10, images=2, image_size=(1200, 900), image_format='PNG'),
+    DeckSpec('shared-media', slides=30, images=2, image_size=(1024, 768), image_format='JPEG', shared_images=True),
+    DeckSpec('mixed', slides=25, images=1, text_boxes=5, groups=2, tables=1),
+)
+
+
+def make_image(width, height, image_format='PNG', seed=0):
+    """Render a deterministic gradient-plus-shapes image and return its encoded bytes"""
+    rng = random.Random(seed)
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = x0 + rng.randrange(1, width // 3 + 2), y0 + rng.randrange(1, height // 3 + 2)
+        colour = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        if rng.random() < 0.5:
+            draw.rectangle((x0, y0, x1, y1), fill=colour)
+        else:
+            draw.ellipse((x0, y0, x1, y1), fill=colour)
+
+    output = BytesIO()
+    save_format = image_format.upper()
+    if save_format == 'JPG':
+        save_format = 'JPEG'
+    image.save(output, format=save_format, **({'quality': 85} if save_format == 'JPEG' else {}))
+    return output.getvalue()
+
+
+def _grid_box(index, count, top=Inches(1)):
+    """Lay ``count`` boxes out in a grid below the title area"""
+    columns = max(1, int(count ** 0.5 + 0.999))
+    rows = max(1, (count + columns - 1) // columns)
+    width = (SLIDE_WIDTH - Inches(1)) // columns
+    height = (SLIDE_HEIGHT - top - Inches(0.5)) // rows
+    column, row = index % columns, index // columns
+    return Inches(0.5) + column * width, top + row * height, width - Inches(0.1), height - Inches(0.1)
+
+
+def generate_deck(spec, path):
+    """Write the deck described by ``spec`` to ``path``"""
+    rng = random.Random(spec.seed)
+    prs = Presentation()
+    prs.slide_width = SLIDE_WIDTH
+    prs.slide_height = SLIDE_HEIGHT
+    layout = prs.slide_layouts[BLANK_LAYOUT]
+
+    width, height = spec.image_size
+    shared = [make_image(width, height, spec.image_format, seed=spec.seed + i) for i in range(spec.images)] \
+        if spec.shared_images else None
+    objects_per_slide = spec.images + spec.text_boxes + spec.groups + spec.tables
+
+    for slide_num in range(spec.slides):
+        slide = prs.slides.add_slide(layout)
+        title = slide.shapes.add_textbox(Inches(0.5), Inches(0.2), Inches(9), Inches(0.7))
+        title.text_frame.text = f"{spec.name} slide {slide_num + 1}"
+        title.text_frame.paragraphs[0].runs[0].font.size = Pt(32)
+        slot = 0
+
+        for i in range(spec.images):
+            blob = shared[i] if shared else make_image(width, height, spec.image_format,
+                                                       seed=spec.seed + slide_num * 1000 + i)
+            left, top, box_width, box_height = _grid_box(slot, objects_per_slide)
+            slide.shapes.add_picture(BytesIO(blob), left, top, box_width, box_height)
+            slot += 1
+
+        for i in range(spec.text_boxes):
+            left, top, box_width, box_height = _grid_box(slot, objects_per_slide)
+            box = slide.shapes.add_textbox(left, top, box_width, box_height)
+            frame = box.text_frame
+            frame.text = f"Text box {i + 1}: " + ' '.join(rng.choice(_WORDS) for _ in range(12))
+            for _ in range(2):
+                paragraph = frame.add_paragraph()
+                paragraph.text = ' '.join(rng.choice(_WORDS) for _ in range(8))
+                paragraph.level = 1
+            run = frame.paragraphs[0].runs[0]
+            run.font.size = Pt(rng.choice((14, 16, 18, 24)))
+            run.font.bold = rng.random() < 0.3
+            slot += 1
+
+        for i in range(spec.groups):
+            left, top, box_width, box_height = _grid_box(slot, objects_per_slide)
+            group = slide.shapes.add_group_shape()
+            child_width = Emu(max(1, box_width // max(1, spec.group_children)))
+            for child in range(spec.group_children):
+                shape = group.shapes.add_shape(1, left + child * child_width, top, child_width, box_height)
+                shape.text_frame.text = f"Group {i + 1}.{child + 1}"
+            slot += 1
+
+        for i in range(spec.tables):
+            left, top, box_width, box_height = _grid_box(slot, objects_per_slide)
+            rows, cols = spec.table_size
+            table = slide.shapes.add_table(rows, cols, left, top, box_width, box_height).table
+            for r in range(rows):
+                for c in range(cols):
+                    table.cell(r, c).text = f"R{r + 1}C{c + 1}" if r else f"Header {c + 1}"
+            slot += 1
+
+    prs.save(path)
+    return path
+
+
+def build_corpus(specs=STANDARD_CORPUS, directory='bench_corpus'):
+    """Generate any missing decks for ``specs`` and return ``[(spec, path), ...]``"""
+    os.makedirs(directory, exist_ok=True)
+    decks = []
+    for spec in specs:
+        path = os.path.join(directory, f"{spec.name}-{spec.digest()}.pptx")
+        if not os.path.exists(path):
+            generate_deck(spec, path + '.tmp')
+            os.replace(path + '.tmp', path)
+        decks.append((spec, path))
+    return decks
+
+
+_WORDS = (
+    'strategy', 'growth', 'market', 'revenue', 'team', 'product', 'launch', 'customer',
+    'roadmap', 'quarter', 'design', 'research', 'insight', 'pipeline', 'goal', 'metric',
+)
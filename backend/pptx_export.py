@@ -0,0 +1,705 @@
+#!/usr/bin/env python3
+"""
+Editor JSON -> PPTX, streamed part by part
+
+PptxWriter writes a presentation straight into a ``zipfile`` as it goes. Each
+slide's XML, relationships and charts are generated, written and dropped when
+the slide is added, and each image is written the first time a slide uses it,
+so the writer holds about one slide plus one image however long the deck is:
+
+    with PptxWriter('deck.pptx', (960, 540), title='Deck') as writer:
+        for slide in slides:            # e.g. loaded one at a time from Firestore
+            writer.add_slide(slide)
+
+    export_pptx(result, 'deck.pptx')    # full, compact or sharded parse result
+
+export_pptx(), stream_pptx(), ``POST /api/export-pptx`` and the CLI take a
+result that is already loaded, so memory also holds the whole input JSON,
+inline (base64) images included. Only the output side is bounded. Export
+results whose images are media store URLs (``?media=external``), or feed
+PptxWriter from a source that loads slides one at a time, to keep the input
+small as well.
+
+Images are deduplicated by content. Identical bytes become one
+``ppt/media/<content hash>`` part (media_storage.media_filename) that every
+slide using them relates to, whether a slide refers to them by data URL,
+RawMedia, media store URL, path or ``media:<id>``. Only the content hash ->
+part mapping stays in memory. The slide master, layouts and theme are
+python-pptx's default template; the parts that list every slide
+(presentation.xml, its relationships and ``[Content_Types].xml``) are
+written last.
+
+Elements map to DrawingML as follows: text -> text box (``spans``,
+``spanStyles`` and ``paragraphs`` become runs and paragraph properties),
+rectangle/circle/line and editor shapes -> preset geometry, image ->
+picture, table -> table graphic frame (merges included), chart -> chart part
+built from the cached series. Slide colours and ``backgroundImage`` become the
+slide's own ``p:bg``. Charts carry no embedded workbook: PowerPoint draws
+them, but "Edit Data" has nothing to open. Remote media URLs (S3, ...) are
+not fetched; elements whose image can't be read are left out.
+
+``stream_pptx()`` yields the file in chunks as slides are written; it backs
+``POST /api/export-pptx``. Offline:
+
+    python3 -m pptx_export converted/deck.json deck.pptx
+"""
+
+import argparse
+import functools
+import os
+import sys
+import time
+import zipfile
+from io import BytesIO
+from xml.sax.saxutils import escape, quoteattr
+
+import pptx
+from lxml import etree
+from PIL import Image, ImageColor
+from pptx.chart.chart import Chart
+from pptx.chart.data import CategoryChartData, XyChartData
+from pptx.chart.xmlwriter import ChartXmlWriter
+from pptx.dml.color import RGBColor
+from pptx.enum.chart import XL_CHART_TYPE
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+
+from batch_import import media_id
+from group_shapes import EMU_PER_PX
+from media_storage import MEDIA_EXTENSIONS, FilesystemStore, inline_media, media_filename
+from parser_logging import configure_logging, get_logger
+import compact_schema
+import firestore_shards
+import serializer
+
+log = get_logger('media')
+
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+TEMPLATE_PATH = os.path.join(os.path.dirname(pptx.__file__), 'templates', 'default.pptx')
+# Layout new slides use (it has no placeholders)
+TEMPLATE_LAYOUT = 'Blank'
+
+EMU_PER_PT = 12700
+BULLET_INDENT = 342900
+# Images PowerPoint opens as they are; anything else is converted to PNG
+NATIVE_IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/bmp', 'image/tiff', 'image/x-emf', 'image/x-wmf'}
+# Already compressed: stored rather than deflated again
+STORED_IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/gif'}
+
+MIME_TYPES = {extension: mime for mime, extension in MEDIA_EXTENSIONS.items()}
+MIME_TYPES['.jpeg'] = 'image/jpeg'
+
+ALIGN_CODES = {'left': 'l', 'center': 'ctr', 'right': 'r', 'justify': 'just'}
+ANCHOR_CODES = {'top': 't', 'middle': 'ctr', 'bottom': 'b'}
+SHAPE_PRESETS = {'rectangle': 'rect', 'circle': 'ellipse', 'triangle': 'triangle', 'diamond': 'diamond',
+                 'star': 'star5', 'hexagon': 'hexagon'}
+
+# (chartType, grouping) -> python-pptx chart type; other kinds are drawn as line charts
+CHART_TYPES = {
+    ('column', None): XL_CHART_TYPE.COLUMN_CLUSTERED, ('column', 'stacked'): XL_CHART_TYPE.COLUMN_STACKED,
+    ('column', 'percentStacked'): XL_CHART_TYPE.COLUMN_STACKED_100,
+    ('bar', None): XL_CHART_TYPE.BAR_CLUSTERED, ('bar', 'stacked'): XL_CHART_TYPE.BAR_STACKED,
+    ('bar', 'percentStacked'): XL_CHART_TYPE.BAR_STACKED_100,
+    ('line', None): XL_CHART_TYPE.LINE, ('line', 'stacked'): XL_CHART_TYPE.LINE_STACKED,
+    ('line', 'percentStacked'): XL_CHART_TYPE.LINE_STACKED_100,
+    ('area', None): XL_CHART_TYPE.AREA, ('area', 'stacked'): XL_CHART_TYPE.AREA_STACKED,
+    ('area', 'percentStacked'): XL_CHART_TYPE.AREA_STACKED_100,
+    ('pie', None): XL_CHART_TYPE.PIE, ('doughnut', None): XL_CHART_TYPE.DOUGHNUT,
+    ('radar', None): XL_CHART_TYPE.RADAR,
+    ('scatter', None): XL_CHART_TYPE.XY_SCATTER, ('bubble', None): XL_CHART_TYPE.XY_SCATTER,
+}
+# Series of these are coloured by their line rather than their fill
+LINE_CHART_TYPES = {XL_CHART_TYPE.LINE, XL_CHART_TYPE.LINE_STACKED, XL_CHART_TYPE.LINE_STACKED_100,
+                    XL_CHART_TYPE.XY_SCATTER, XL_CHART_TYPE.RADAR}
+
+_NAMESPACES = nsdecls('a', 'r', 'p')
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_TYPES_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+_CORE_TITLE = '{http://purl.org/dc/elements/1.1/}title'
+_TABLE_URI = 'http://schemas.openxmlformats.org/drawingml/2006/table'
+_CHART_URI = 'http://schemas.openxmlformats.org/drawingml/2006/chart'
+_EMPTY_GROUP = ('<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+                '<p:grpSpPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/>'
+                '<a:chOff x="0" y="0"/><a:chExt cx="0" cy="0"/></a:xfrm></p:grpSpPr>')
+_STRETCH = '<a:stretch><a:fillRect/></a:stretch>'
+
+# Parts rewritten when the presentation is closed rather than copied from the template
+_TEMPLATE_REWRITTEN = ('[Content_Types].xml', 'ppt/presentation.xml', 'ppt/_rels/presentation.xml.rels',
+                       'docProps/core.xml')
+
+
+@functools.lru_cache(maxsize=1)
+def _template():
+    """({part name: bytes} of the default template, part name of its blank layout)"""
+    with zipfile.ZipFile(TEMPLATE_PATH) as template:
+        parts = {name: template.read(name) for name in template.namelist()}
+    layouts = sorted(name for name in parts if name.startswith('ppt/slideLayouts/slideLayout'))
+    layout = layouts[0]
+    for name in layouts:
+        if etree.fromstring(parts[name]).find(qn('p:cSld')).get('name') == TEMPLATE_LAYOUT:
+            layout = name
+    return parts, layout
+
+
+def _emu(px):
+    return int(round((px or 0) * EMU_PER_PX))
+
+
+def _color(value):
+    """('RRGGBB', alpha 0-255) for a CSS colour, None for none or 'transparent'"""
+    if not value or value == 'transparent':
+        return None
+    try:
+        rgba = ImageColor.getrgb(value)
+    except ValueError:
+        return None
+    return '%02X%02X%02X' % rgba[:3], rgba[3] if len(rgba) == 4 else 255
+
+
+def _solid_fill(value):
+    """a:solidFill for a CSS colour, a:noFill when there is none"""
+    color = _color(value)
+    if color is None:
+        return '<a:noFill/>'
+    rgb, alpha = color
+    if alpha < 255:
+        return f'<a:solidFill><a:srgbClr val="{rgb}"><a:alpha val="{alpha * 100000 // 255}"/></a:srgbClr></a:solidFill>'
+    return f'<a:solidFill><a:srgbClr val="{rgb}"/></a:solidFill>'
+
+
+def _xfrm(element, tag='a:xfrm'):
+    rotation = int(round((element.get('rotation') or 0) * 60000)) % 21600000
+    rotate = f' rot="{rotation}"' if rotation else ''
+    return (f'<{tag}{rotate}>'
+            f'<a:off x="{_emu(element.get("x"))}" y="{_emu(element.get("y"))}"/>'
+            f'<a:ext cx="{max(0, _emu(element.get("width")))}" cy="{max(0, _emu(element.get("height")))}"/></{tag}>')
+
+
+def _run_properties(style, tag='a:rPr'):
+    family = style.get('fontFamily') or ''
+    italic = family.lower().endswith(' italic')
+    if italic:
+        family = family[:-len(' italic')]
+    weight = str(style.get('fontWeight', ''))
+    bold = weight == 'bold' or (weight.isdigit() and int(weight) >= 700)
+    attributes = ' lang="en-US"'
+    if style.get('fontSize'):
+        attributes += f' sz="{int(round(style["fontSize"] * 100))}"'
+    attributes += f' b="{int(bold)}" i="{int(italic)}"'
+    if style.get('underline'):
+        attributes += ' u="sng"'
+    children = _solid_fill(style['color']) if _color(style.get('color')) else ''
+    if family:
+        children += f'<a:latin typeface={quoteattr(family)}/>'
+    return f'<{tag}{attributes} dirty="0">{children}</{tag}>'
+
+
+def _paragraph_properties(properties, align):
+    level = properties.get('level', 0)
+    marker = properties.get('bullet')
+    attributes = f' lvl="{level}"' if level else ''
+    if marker:
+        attributes += f' marL="{BULLET_INDENT * (level + 1)}" indent="{-BULLET_INDENT}"'
+    align = properties.get('align', align)
+    if align in ALIGN_CODES:
+        attributes += f' algn="{ALIGN_CODES[align]}"'
+    if marker:
+        # Auto-numbering schemes are names like 'arabicPeriod'; anything else is the bullet character
+        bullet = (f'<a:buAutoNum type="{marker}"/>' if len(marker) > 1 and marker.isalpha()
+                  else f'<a:buChar char={quoteattr(marker)}/>')
+    else:
+        bullet = '<a:buNone/>' if marker == '' else ''
+    return f'<a:pPr{attributes}>{bullet}</a:pPr>' if attributes or bullet else ''
+
+
+def _text_segments(element):
+    """(text, style override) pieces of an element's content, from its spans"""
+    content = element.get('content') or ''
+    spans = element.get('spans')
+    if not spans:
+        return [(content, {})]
+    styles = element.get('spanStyles', [])
+    segments = []
+    position = 0
+    for length, index in spans:
+        segments.append((content[position:position + length], styles[index] if index < len(styles) else {}))
+        position += length
+    if position < len(content):
+        segments.append((content[position:], {}))
+    return segments
+
+
+def _paragraphs(segments, base, align, paragraph_runs=()):
+    """a:p elements for text segments; '\\n' starts a paragraph and '\\v' is a line break"""
+    paragraphs = [[]]
+    for text, override in segments:
+        for number, piece in enumerate(text.split('\n')):
+            if number:
+                paragraphs.append([])
+            if piece:
+                paragraphs[-1].append((piece, override))
+    properties = [entry for count, entry in paragraph_runs for _ in range(count)]
+
+    xml = []
+    for number, runs in enumerate(paragraphs):
+        p = ['<a:p>', _paragraph_properties(properties[number] if number < len(properties) else {}, align)]
+        for text, override in runs:
+            r_pr = _run_properties({**base, **override})
+            for line_number, line in enumerate(text.split('\v')):
+                if line_number:
+                    p.append(f'<a:br>{r_pr}</a:br>')
+                if line:
+                    p.append(f'<a:r>{r_pr}<a:t>{escape(line)}</a:t></a:r>')
+        p.append(_run_properties(base, 'a:endParaRPr'))
+        p.append('</a:p>')
+        xml.append(''.join(p))
+    return ''.join(xml)
+
+
+def media_resolver(store=None, root=None, media=None):
+    """
+    Function from an element src to its (bytes, mime type), or None. Reads
+    inline data, then media(src) (e.g. firestore_shards.media_reader), then
+    files of a filesystem store and paths relative to root.
+    """
+    def resolve(src):
+        inline = inline_media(src)
+        if inline is not None:
+            return inline
+        if not isinstance(src, str) or not src:
+            return None
+        if media is not None:
+            found = media(src)
+            if found is not None:
+                return found
+        path = None
+        if isinstance(store, FilesystemStore) and src.startswith(store.base_url):
+            path = os.path.join(store.root, os.path.basename(src[len(store.base_url):]))
+        elif root is not None and '://' not in src and not src.startswith('/'):
+            path = os.path.join(root, src)
+        if path is None or not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read(), MIME_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+    return resolve
+
+
+class PptxWriter:
+    """
+    Writes a PPTX to target (a path or a binary file object, which needn't be
+    seekable) one slide at a time; slide_size is in px, backgrounds the parse
+    result's background table and resolve a media_resolver()
+    """
+
+    def __init__(self, target, slide_size=(960, 540), backgrounds=None, title=None, resolve=None):
+        self.slide_width, self.slide_height = slide_size
+        self.backgrounds = {background['id']: background['src'] for background in backgrounds or ()}
+        self.title = title
+        self.resolve = resolve or media_resolver()
+        self.stats = {'slides': 0, 'media': 0, 'media_references': 0, 'media_bytes': 0, 'charts': 0}
+        self._sources = {}          # src reference or data URL hash -> media part name, None if unusable
+        self._media = set()         # media part names written
+        self._extensions = {}       # media extension -> content type
+        self._slides = []           # slide part names, in order
+        self._charts = 0
+        self._zip = zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED)
+        parts, self._layout = _template()
+        for name, data in parts.items():
+            if name not in _TEMPLATE_REWRITTEN:
+                self._zip.writestr(name, data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+
+    # -- media --------------------------------------------------------------
+
+    def _media_part(self, src):
+        """Part name of src's image, written the first time it's seen; None if it can't be read"""
+        key = media_id(src) if isinstance(src, str) and src.startswith('data:') else src if isinstance(src, str) else None
+        if key is not None and key in self._sources:
+            return self._sources[key]
+        part = None
+        loaded = self.resolve(src) if src else None
+        if loaded is not None:
+            data, mime = self._native(*loaded)
+            if data is not None:
+                name = media_filename(data, mime)
+                part = f'ppt/media/{name}'
+                if part not in self._media:
+                    self._media.add(part)
+                    self._extensions[os.path.splitext(name)[1][1:]] = mime
+                    compression = zipfile.ZIP_STORED if mime in STORED_IMAGE_TYPES else zipfile.ZIP_DEFLATED
+                    self._zip.writestr(part, data, compress_type=compression)
+                    self.stats['media'] += 1
+                    self.stats['media_bytes'] += len(data)
+        else:
+            log.warning("Could not read image %.80s", str(src))
+        if key is not None:
+            self._sources[key] = part
+        return part
+
+    def _native(self, data, mime):
+        """(bytes, mime type) PowerPoint can open: as they are, else converted to PNG; (None, None) if not possible"""
+        if mime in NATIVE_IMAGE_TYPES:
+            return data, mime
+        try:
+            image = Image.open(BytesIO(data))
+            output = BytesIO()
+            image.save(output, format='PNG')
+        except Exception as e:
+            log.warning("Could not convert %s image for export: %s", mime, e)
+            return None, None
+        return output.getvalue(), 'image/png'
+
+    # -- elements -----------------------------------------------------------
+
+    def _text(self, element, shape_id):
+        base = {key: element[key] for key in ('fontSize', 'fontFamily', 'fontWeight', 'color', 'underline')
+                if key in element}
+        body = _paragraphs(_text_segments(element), base, element.get('textAlign', 'left'), element.get('paragraphs', ()))
+        return (f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="TextBox {shape_id - 1}"/><p:cNvSpPr txBox="1"/><p:nvPr/></p:nvSpPr>'
+                f'<p:spPr>{_xfrm(element)}<a:prstGeom prst="rect"><a:avLst/></a:prstGeom><a:noFill/></p:spPr>'
+                f'<p:txBody><a:bodyPr wrap="square" rtlCol="0"><a:noAutofit/></a:bodyPr><a:lstStyle/>{body}</p:txBody></p:sp>')
+
+    def _shape(self, element, shape_id, kind):
+        stroke_width = element.get('strokeWidth', 1)
+        stroke_color = _color(element.get('stroke'))
+        if stroke_width and stroke_color is not None:
+            line = f'<a:ln w="{int(stroke_width * EMU_PER_PT)}">{_solid_fill(element["stroke"])}</a:ln>'
+        else:
+            line = '<a:ln><a:noFill/></a:ln>'
+        if kind == 'line':
+            return (f'<p:cxnSp><p:nvCxnSpPr><p:cNvPr id="{shape_id}" name="Straight Connector {shape_id - 1}"/>'
+                    f'<p:cNvCxnSpPr/><p:nvPr/></p:nvCxnSpPr><p:spPr>{_xfrm(element)}'
+                    f'<a:prstGeom prst="line"><a:avLst/></a:prstGeom>{line}</p:spPr></p:cxnSp>')
+        preset = SHAPE_PRESETS.get(kind, 'rect')
+        return (f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="{kind.title()} {shape_id - 1}"/><p:cNvSpPr/><p:nvPr/></p:nvSpPr>'
+                f'<p:spPr>{_xfrm(element)}<a:prstGeom prst="{preset}"><a:avLst/></a:prstGeom>'
+                f'{_solid_fill(element.get("fill"))}{line}</p:spPr></p:sp>')
+
+    def _picture(self, element, shape_id, relate):
+        part = self._media_part(element.get('src'))
+        if part is None:
+            return ''
+        self.stats['media_references'] += 1
+        return (f'<p:pic><p:nvPicPr><p:cNvPr id="{shape_id}" name="Picture {shape_id - 1}" descr={quoteattr(element.get("alt") or "")}/>'
+                f'<p:cNvPicPr><a:picLocks noChangeAspect="1"/></p:cNvPicPr><p:nvPr/></p:nvPicPr>'
+                f'<p:blipFill><a:blip r:embed="{relate(RT.IMAGE, part)}"/>{_STRETCH}</p:blipFill>'
+                f'<p:spPr>{_xfrm(element)}<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr></p:pic>')
+
+    def _graphic_frame(self, element, shape_id, name, uri, graphic):
+        return (f'<p:graphicFrame><p:nvGraphicFramePr><p:cNvPr id="{shape_id}" name="{name} {shape_id - 1}"/>'
+                f'<p:cNvGraphicFramePr><a:graphicFrameLocks noGrp="1"/></p:cNvGraphicFramePr><p:nvPr/></p:nvGraphicFramePr>'
+                f'{_xfrm(element, "p:xfrm")}<a:graphic><a:graphicData uri="{uri}">{graphic}</a:graphicData></a:graphic></p:graphicFrame>')
+
+    def _table(self, element, shape_id):
+        columns = element.get('columns') or []
+        rows = element.get('rows') or []
+        if not columns or not rows:
+            return ''
+        cells = element.get('cells', [])
+        cell_styles = element.get('cellStyles', [])
+        style_index = [index for count, index in element.get('styleRuns', []) for _ in range(count)]
+        spans = {}      # (row, column) -> (rowSpan, columnSpan) of merge origins
+        covered = {}    # (row, column) -> (hMerge, vMerge) of cells inside a merge
+        for row, column, row_span, column_span in element.get('merges', []):
+            spans[row, column] = row_span, column_span
+            for r in range(row, row + row_span):
+                for c in range(column, column + column_span):
+                    if (r, c) != (row, column):
+                        covered[r, c] = c > column, r > row
+
+        xml = [f'<a:tbl><a:tblPr firstRow="{int(bool(element.get("header")))}" bandRow="{int(bool(element.get("banded")))}"/><a:tblGrid>']
+        xml.extend(f'<a:gridCol w="{_emu(width)}"/>' for width in columns)
+        xml.append('</a:tblGrid>')
+        for row, height in enumerate(rows):
+            xml.append(f'<a:tr h="{_emu(height)}">')
+            for column in range(len(columns)):
+                cell = row * len(columns) + column
+                style = cell_styles[style_index[cell]] if cell < len(style_index) and style_index[cell] < len(cell_styles) else {}
+                attributes = ''
+                if (row, column) in spans:
+                    row_span, column_span = spans[row, column]
+                    attributes += f' rowSpan="{row_span}"' if row_span > 1 else ''
+                    attributes += f' gridSpan="{column_span}"' if column_span > 1 else ''
+                h_merge, v_merge = covered.get((row, column), (False, False))
+                attributes += ' hMerge="1"' if h_merge else ''
+                attributes += ' vMerge="1"' if v_merge else ''
+                text = cells[cell] if cell < len(cells) and cells[cell] else ''
+                base = {key: style[key] for key in ('fontSize', 'fontFamily', 'fontWeight', 'color', 'underline') if key in style}
+                anchor = ANCHOR_CODES.get(style.get('verticalAlign'))
+                tc_pr = f'<a:tcPr anchor="{anchor}">' if anchor else '<a:tcPr>'
+                tc_pr += (_solid_fill(style['fill']) if _color(style.get('fill')) else '') + '</a:tcPr>'
+                xml.append(f'<a:tc{attributes}><a:txBody><a:bodyPr/><a:lstStyle/>'
+                           f'{_paragraphs([(text, {})], base, style.get("textAlign"))}</a:txBody>{tc_pr}</a:tc>')
+            xml.append('</a:tr>')
+        xml.append('</a:tbl>')
+        return self._graphic_frame(element, shape_id, 'Table', _TABLE_URI, ''.join(xml))
+
+    def _chart(self, element, shape_id, relate):
+        chart_space = _chart_space(element)
+        if chart_space is None:
+            return ''
+        self._charts += 1
+        self.stats['charts'] += 1
+        part = f'ppt/charts/chart{self._charts}.xml'
+        self._zip.writestr(part, chart_space)
+        graphic = f'<c:chart xmlns:c="{_CHART_URI}" r:id="{relate(RT.CHART, part)}"/>'
+        return self._graphic_frame(element, shape_id, 'Chart', _CHART_URI, graphic)
+
+    # -- slides -------------------------------------------------------------
+
+    def add_slide(self, slide):
+        """Write one (full-schema) slide with its relationships, new images and charts"""
+        number = len(self._slides) + 1
+        relationships = [(RT.SLIDE_LAYOUT, self._layout)]
+        targets = {}
+
+        def relate(rel_type, part):
+            if (rel_type, part) not in targets:
+                relationships.append((rel_type, part))
+                targets[rel_type, part] = f'rId{len(relationships)}'
+            return targets[rel_type, part]
+
+        background = ''
+        image = self._media_part(self.backgrounds[slide['backgroundImage']]) \
+            if slide.get('backgroundImage') in self.backgrounds else None
+        if image is not None:
+            self.stats['media_references'] += 1
+            background = (f'<p:bg><p:bgPr><a:blipFill dpi="0" rotWithShape="1"><a:blip r:embed="{relate(RT.IMAGE, image)}"/>'
+                          f'<a:srcRect/>{_STRETCH}</a:blipFill><a:effectLst/></p:bgPr></p:bg>')
+        elif _color(slide.get('background')) is not None:
+            background = f'<p:bg><p:bgPr>{_solid_fill(slide["background"])}<a:effectLst/></p:bgPr></p:bg>'
+
+        shapes = []
+        shape_id = 1
+        for element in sorted(slide.get('elements', []), key=lambda element: element.get('zIndex', 1)):
+            shape_id += 1
+            kind = element.get('shapeType') if element.get('type') == 'shape' else element.get('type')
+            try:
+                if kind == 'text':
+                    shapes.append(self._text(element, shape_id))
+                elif kind == 'image':
+                    shapes.append(self._picture(element, shape_id, relate))
+                elif kind == 'table':
+                    shapes.append(self._table(element, shape_id))
+                elif kind == 'chart':
+                    shapes.append(self._chart(element, shape_id, relate))
+                else:
+                    shapes.append(self._shape(element, shape_id, kind or 'rectangle'))
+            except Exception as e:
+                log.warning("Could not export %s element %s: %s", kind, element.get('id'), e)
+
+        part = f'ppt/slides/slide{number}.xml'
+        self._zip.writestr(part, f'{_XML_DECLARATION}<p:sld {_NAMESPACES}><p:cSld>{background}<p:spTree>{_EMPTY_GROUP}'
+                                 f'{"".join(shapes)}</p:spTree></p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>')
+        self._zip.writestr(f'ppt/slides/_rels/slide{number}.xml.rels', _relationships(
+            (f'rId{index}', rel_type, '../' + target.split('/', 1)[1])
+            for index, (rel_type, target) in enumerate(relationships, 1)))
+        self._slides.append(part)
+        self.stats['slides'] += 1
+
+    def close(self):
+        """Write the parts that list every slide and finish the ZIP"""
+        parts, _ = _template()
+
+        presentation = etree.fromstring(parts['ppt/presentation.xml'])
+        relationships = etree.fromstring(parts['ppt/_rels/presentation.xml.rels'])
+        next_id = 1 + max(int(rel.get('Id')[3:]) for rel in relationships)
+        slide_ids = etree.Element(qn('p:sldIdLst'))
+        for index, part in enumerate(self._slides):
+            rel_id = f'rId{next_id + index}'
+            etree.SubElement(relationships, f'{{{_RELS_NS}}}Relationship', Id=rel_id, Type=RT.SLIDE,
+                             Target=part.split('/', 1)[1])
+            etree.SubElement(slide_ids, qn('p:sldId'), {'id': str(256 + index), qn('r:id'): rel_id})
+        if len(slide_ids):
+            presentation.find(qn('p:sldMasterIdLst')).addnext(slide_ids)
+        size = presentation.find(qn('p:sldSz'))
+        size.set('cx', str(_emu(self.slide_width)))
+        size.set('cy', str(_emu(self.slide_height)))
+        size.attrib.pop('type', None)
+
+        content_types = etree.fromstring(parts['[Content_Types].xml'])
+        defaults = {default.get('Extension') for default in content_types.iterfind(f'{{{_TYPES_NS}}}Default')}
+        for extension, mime in sorted(self._extensions.items()):
+            if extension not in defaults:
+                content_types.insert(0, etree.Element(f'{{{_TYPES_NS}}}Default', Extension=extension, ContentType=mime))
+        for part in self._slides:
+            etree.SubElement(content_types, f'{{{_TYPES_NS}}}Override', PartName='/' + part, ContentType=CT.PML_SLIDE)
+        for number in range(1, self._charts + 1):
+            etree.SubElement(content_types, f'{{{_TYPES_NS}}}Override', PartName=f'/ppt/charts/chart{number}.xml',
+                             ContentType=CT.DML_CHART)
+
+        core = etree.fromstring(parts['docProps/core.xml'])
+        if self.title and core.find(_CORE_TITLE) is not None:
+            core.find(_CORE_TITLE).text = self.title
+
+        for name, root in (('ppt/presentation.xml', presentation), ('ppt/_rels/presentation.xml.rels', relationships),
+                           ('docProps/core.xml', core), ('[Content_Types].xml', content_types)):
+            self._zip.writestr(name, etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True))
+        self._zip.close()
+
+
+def _relationships(relationships):
+    items = ''.join(f'<Relationship Id="{rel_id}" Type="{rel_type}" Target={quoteattr(target)}/>'
+                    for rel_id, rel_type, target in relationships)
+    return f'{_XML_DECLARATION}<Relationships xmlns="{_RELS_NS}">{items}</Relationships>'
+
+
+def _chart_space(element):
+    """Chart part XML for a chart element, or None if it has no series"""
+    series = element.get('series') or []
+    if not series:
+        return None
+    grouping = element.get('grouping')
+    chart_type = CHART_TYPES.get((element.get('chartType'), grouping)) or \
+        CHART_TYPES.get((element.get('chartType'), None), XL_CHART_TYPE.LINE)
+
+    if chart_type == XL_CHART_TYPE.XY_SCATTER:
+        data = XyChartData()
+        for number, entry in enumerate(series):
+            points = data.add_series(entry.get('name') or f'Series {number + 1}')
+            for x, y in zip(entry.get('x') or range(1, len(entry.get('values') or []) + 1), entry.get('values') or []):
+                if x is not None and y is not None:
+                    points.add_data_point(x, y)
+    else:
+        categories = element.get('categories') or []
+        count = len(categories) or max(len(entry.get('values') or []) for entry in series)
+        data = CategoryChartData()
+        data.categories = [category if category is not None else '' for category in categories] or range(1, count + 1)
+        for number, entry in enumerate(series):
+            values = list(entry.get('values') or [])[:count]
+            data.add_series(entry.get('name') or f'Series {number + 1}', values + [None] * (count - len(values)))
+
+    xml = ChartXmlWriter(chart_type, data).xml
+    chart_space = parse_xml(xml.encode('utf-8') if isinstance(xml, str) else xml)
+    chart = Chart(chart_space, None)
+    chart.has_title = bool(element.get('title'))
+    if element.get('title'):
+        chart.chart_title.text_frame.text = element['title']
+    chart.has_legend = bool(element.get('legend'))
+    for entry, plot_series in zip(series, chart.plots[0].series if len(chart.plots) else ()):
+        color = _color(entry.get('color'))
+        if color is None:
+            continue
+        if chart_type in LINE_CHART_TYPES:
+            plot_series.format.line.color.rgb = RGBColor.from_string(color[0])
+        else:
+            plot_series.format.fill.solid()
+            plot_series.format.fill.fore_color.rgb = RGBColor.from_string(color[0])
+    return etree.tostring(chart_space, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def _presentation(result, store=None, root=None):
+    """(deck fields, slide iterator, media_resolver) for a full, compact or sharded result"""
+    if firestore_shards.is_sharded(result):
+        deck = result['manifest']
+        slides = firestore_shards.iter_slides(result)
+        resolve = media_resolver(store, root, firestore_shards.media_reader(result))
+    else:
+        deck = result
+        if compact_schema.is_compact(result):
+            slides = (compact_schema.expand_slide(slide, slide_num, result['styles'])
+                      for slide_num, slide in enumerate(result['slides']))
+        else:
+            slides = iter(result.get('slides', []))
+        resolve = media_resolver(store, root)
+    return deck, slides, resolve
+
+
+def _export(result, target, store=None, root=None):
+    """Write result to target, yielding after every slide; returns the writer's stats"""
+    started = time.perf_counter()
+    deck, slides, resolve = _presentation(result, store, root)
+    metadata = deck.get('metadata', {})
+    writer = PptxWriter(target, (metadata.get('slide_width') or 960, metadata.get('slide_height') or 540),
+                        deck.get('backgrounds'), deck.get('title'), resolve)
+    with writer:
+        for slide in slides:
+            writer.add_slide(slide)
+            yield
+    stats = writer.stats
+    log.info("Exported %s: %d slides, %d media parts for %d references (%.1f MB) in %.2fs",
+             deck.get('title'), stats['slides'], stats['media'], stats['media_references'],
+             stats['media_bytes'] / (1024 * 1024), time.perf_counter() - started, extra=stats)
+    return stats
+
+
+def export_pptx(result, target, store=None, root=None):
+    """
+    Write a full, compact or sharded parse result to target (path or file
+    object) as PPTX. Image srcs that are URLs of store or paths relative to
+    root are read from there. Returns the writer's stats.
+    """
+    export = _export(result, target, store, root)
+    while True:
+        try:
+            next(export)
+        except StopIteration as done:
+            return done.value
+
+
+class _Chunks:
+    """Write-only, unseekable file object that collects what zipfile writes"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_pptx(result, store=None, root=None):
+    """Yield the PPTX for result in chunks, one or more per slide, as it is written"""
+    buffer = _Chunks()
+    for _ in _export(result, buffer, store, root):
+        data = buffer.drain()
+        if data:
+            yield data
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('input', help='parse result JSON (full, compact or sharded)')
+    parser.add_argument('output', help='PPTX file to write')
+    parser.add_argument('--media-root', help="directory relative image paths are read from (default: the JSON file's)")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    with open(args.input, 'rb') as f:
+        result = serializer.loads(f.read())
+    root = args.media_root or os.path.dirname(os.path.abspath(args.input))
+    partial = f'{args.output}.{os.getpid()}.partial'
+    try:
+        stats = export_pptx(result, partial, root=root)
+        os.replace(partial, args.output)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    print(f"{args.output}: {stats['slides']} slides, {stats['media']} media parts "
+          f"for {stats['media_references']} references, {stats['charts']} charts")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Memory high-water-mark harness for parse_pptx_to_json
+
+Runs the benchmark corpus (see pptx_corpus.py) under tracemalloc and reports,
+per parser stage, the traced peak and the memory still held when the stage
+ends, plus the process RSS. Pass ``--ceiling-mb`` to measure the
+bounded-memory import mode instead of the default one:
+
+    python3 pptx_memory.py --output memory.json
+    python3 pptx_memory.py --ceiling-mb 256 --only image-heavy
+"""
+
+import argparse
+import gc
+import json
+import resource
+import sys
+import tracemalloc
+
+from app import MemoryBudgetExceeded, parse_pptx_to_json
+from memory_budget import current_rss
+from parser_logging import configure_logging
+from parser_stages import observe
+from pptx_corpus import STANDARD_CORPUS, build_corpus
+
+MB = 1024 * 1024
+
+
+def max_rss():
+    """Process-lifetime RSS high-water mark in bytes"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+class StageMemory:
+    """Stage observer recording tracemalloc peaks and RSS per stage"""
+
+    def __init__(self):
+        self.stages = {}
+        self._held_before = {}
+
+    def enter(self, name):
+        tracemalloc.reset_peak()
+        self._held_before[name] = tracemalloc.get_traced_memory()[0]
+
+    def exit(self, name):
+        held, peak = tracemalloc.get_traced_memory()
+        self.stages[name] = {
+            'peak_mb': peak / MB,
+            'added_mb': (held - self._held_before.pop(name)) / MB,
+            'rss_mb': current_rss() / MB,
+        }
+
+
+def measure_deck(path, ceiling_mb=None):
+    """Parse ``path`` once under tracemalloc and return per-stage memory figures"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        error = None
+        with observe(StageMemory()) as memory:
+            try:
+                parse_pptx_to_json(path, memory_ceiling_mb=ceiling_mb or 0)
+            except MemoryBudgetExceeded as e:
+                error = str(e)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'peak_mb': max([peak / MB] + [stage['peak_mb'] for stage in memory.stages.values()]),
+        'max_rss_mb': max_rss() / MB,
+        'stages': memory.stages,
+        'error': error,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-dir', default='bench_corpus', help='where generated decks are cached')
+    parser.add_argument('--only', help='comma-separated deck names to run')
+    parser.add_argument('--ceiling-mb', type=float, help='run in bounded-memory mode with this ceiling')
+    parser.add_argument('--output', help='write results JSON to this file')
+    args = parser.parse_args(argv)
+
+    configure_logging(level='WARNING')
+
+    specs = STANDARD_CORPUS
+    if args.only:
+        wanted = set(args.only.split(','))
+        specs = tuple(spec for spec in specs if spec.name in wanted)
+
+    results = {'ceiling_mb': args.ceiling_mb, 'decks': {}}
+    for spec, path in build_corpus(specs, args.corpus_dir):
+        deck = measure_deck(path, args.ceiling_mb)
+        results['decks'][spec.name] = deck
+        status = f"  REJECTED: {deck['error']}" if deck['error'] else ''
+        print(f"{spec.name:<14} peak {deck['peak_mb']:7.1f} MB  " +
+              '  '.join(f"{name}={stage['peak_mb']:.1f}" for name, stage in deck['stages'].items()) + status)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Rich text runs as run-length-encoded style spans
+
+A text element's top-level style (fontSize, fontFamily, ...) is that of its
+first run. When the rest of the text frame is formatted differently, the
+element also gets:
+
+    "spans":      [[12, 0], [5, 1], [30, 0]]      # [character count, spanStyles index]
+    "spanStyles": [{}, {"fontWeight": "bold", "color": "#c00000"}]
+    "paragraphs": [[1, {}], [3, {"level": 1, "bullet": "•"}]]   # [paragraph count, properties]
+
+Spans cover ``content`` exactly, newlines included. Each span style holds only
+the properties that differ from the element's own, and is stored once per
+element however many runs use it. Paragraph properties (level, alignment,
+bullet) are run-length encoded the same way. Uniformly formatted text gets
+none of these keys, so simple text boxes cost nothing extra.
+
+A run's style is its own ``a:rPr``, then what its paragraph level inherits
+(placeholder, layout, master; see placeholders.py), then the parser defaults.
+"""
+
+from pptx.oxml.ns import qn
+
+from placeholders import ALIGNMENTS, bullet
+from theme_colors import solid_fill
+
+DEFAULT_STYLE = {'fontSize': 24, 'fontFamily': 'Inter', 'fontWeight': '600', 'color': '#000000'}
+ITALIC_SUFFIX = ' Italic'
+
+_P, _PPR, _R, _BR, _FLD, _T, _RPR, _LATIN = (qn(tag) for tag in ('a:p', 'a:pPr', 'a:r', 'a:br', 'a:fld', 'a:t', 'a:rPr', 'a:latin'))
+
+
+def _flag(r_pr, name):
+    value = r_pr.get(name) if r_pr is not None else None
+    return None if value is None else value in ('1', 'true')
+
+
+def run_style(r_pr, inherited, theme, master):
+    """Effective style of one run: its a:rPr, then the inherited paragraph style, then defaults"""
+    size = r_pr.get('sz') if r_pr is not None else None
+    latin = r_pr.find(_LATIN) if r_pr is not None else None
+    typeface = theme.font(latin.get('typeface'), master) if latin is not None else None
+    bold = _flag(r_pr, 'b')
+    italic = _flag(r_pr, 'i')
+    family = typeface or inherited.get('typeface', DEFAULT_STYLE['fontFamily'])
+    if (italic if italic is not None else inherited.get('italic')) and ITALIC_SUFFIX.lower() not in family.lower():
+        family += ITALIC_SUFFIX
+
+    style = {
+        'fontSize': int(int(size) / 100) if size else int(inherited.get('size', DEFAULT_STYLE['fontSize'])),
+        'fontFamily': family,
+        'fontWeight': 'bold' if (bold if bold is not None else inherited.get('bold')) else DEFAULT_STYLE['fontWeight'],
+        'color': theme.resolve(solid_fill(r_pr), master) or inherited.get('color', DEFAULT_STYLE['color']),
+    }
+    if r_pr is not None and r_pr.get('u', 'none') != 'none':
+        style['underline'] = True
+    return style
+
+
+def _paragraph_properties(p_pr, level, inherited, text_align):
+    properties = {}
+    if level:
+        properties['level'] = level
+    align = ALIGNMENTS.get(p_pr.get('algn')) if p_pr is not None else None
+    align = align or inherited.get('align', text_align)
+    if align != text_align:
+        properties['align'] = align
+    own_bullet = bullet(p_pr)
+    marker = own_bullet if own_bullet is not None else inherited.get('bullet')
+    if marker:
+        properties['bullet'] = marker
+    return properties
+
+
+def run_length(values):
+    """[[count, value], ...] for consecutive equal values"""
+    encoded = []
+    for value in values:
+        if encoded and encoded[-1][1] == value:
+            encoded[-1][0] += 1
+        else:
+            encoded.append([1, value])
+    return encoded
+
+
+def rich_text(tx_body, content, base, level_style, theme, master):
+    """
+    Extra element keys (spans, spanStyles, paragraphs) for the text in tx_body,
+    or {} when it is uniformly styled. content is the element's (stripped)
+    text and base its own style; level_style(level) returns the inherited
+    style for a paragraph level.
+    """
+    text_align = base.get('textAlign', 'left')
+    overrides = {}      # style override (as a sorted tuple) -> spanStyles index
+    span_styles = []
+    pieces = []         # (text, spanStyles index)
+    paragraph_props = []
+    styles_by_level = {}
+
+    for paragraph in tx_body.iterchildren(_P):
+        p_pr = paragraph.find(_PPR)
+        level = int(p_pr.get('lvl', 0)) if p_pr is not None else 0
+        if level not in styles_by_level:
+            styles_by_level[level] = level_style(level)
+        inherited = styles_by_level[level]
+        paragraph_props.append(_paragraph_properties(p_pr, level, inherited, text_align))
+
+        if pieces:
+            pieces.append(('\n', pieces[-1][1]))
+        for child in paragraph:
+            if child.tag == _R or child.tag == _FLD:
+                text = child.findtext(_T) or ''
+            elif child.tag == _BR:
+                text = '\v'
+            else:
+                continue
+            style = run_style(child.find(_RPR), inherited, theme, master)
+            override = tuple(sorted((key, value) for key, value in style.items() if base.get(key) != value))
+            if override not in overrides:
+                overrides[override] = len(span_styles)
+                span_styles.append(dict(override))
+            pieces.append((text, overrides[override]))
+
+    full_text = ''.join(text for text, _ in pieces)
+    if full_text.strip() != content:
+        return {}  # text the parser reads differently (e.g. unsupported inline content)
+
+    # Cut the spans down to the stripped content
+    start = len(full_text) - len(full_text.lstrip())
+    end = start + len(content)
+    spans = []
+    position = 0
+    for text, index in pieces:
+        length = min(position + len(text), end) - max(position, start)
+        position += len(text)
+        if length <= 0:
+            continue
+        if spans and spans[-1][1] == index:
+            spans[-1][0] += length
+        else:
+            spans.append([length, index])
+
+    uniform_text = len(spans) <= 1 and not (spans and span_styles[spans[0][1]])
+    uniform_paragraphs = not any(paragraph_props)
+    if uniform_text and uniform_paragraphs:
+        return {}
+    extra = {}
+    if not uniform_text:
+        extra['spans'] = spans
+        extra['spanStyles'] = span_styles
+    if not uniform_paragraphs:
+        extra['paragraphs'] = run_length(paragraph_props)
+    return extra
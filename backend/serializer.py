@@ -0,0 +1,77 @@
+"""
+JSON serialisation for parse results
+
+Parse results are multi-megabyte structures that are mostly base64 strings.
+When orjson is installed it encodes them straight to UTF-8 bytes several times
+faster than the stdlib; otherwise (or with ``PPTX_JSON_BACKEND=json``) the
+stdlib encoder is used with the same compact output. Everything that encodes a
+parse result goes through here:
+
+- dumps() for files and NDJSON lines
+- size() for the Firebase size accounting
+- JSONProvider, installed on the app by create_app(), so jsonify() responses
+  are written as bytes without an intermediate str
+"""
+
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if os.environ.get('PPTX_JSON_BACKEND') == 'json':
+    orjson = None
+
+BACKEND = 'orjson' if orjson else 'json'
+
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+_size_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def dumps(obj):
+    """Compact UTF-8 encoded JSON as bytes"""
+    if orjson:
+        return orjson.dumps(obj)
+    return _encoder.encode(obj).encode('utf-8')
+
+
+def loads(data):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def size(obj, streaming=False):
+    """
+    Encoded size of obj in bytes. The streaming variant encodes chunk by chunk
+    instead of materialising the whole document (slower, but no full copy).
+    Objects JSON can't represent (e.g. binary_transport.RawMedia, which is
+    never sent as JSON) count as their str().
+    """
+    if streaming:
+        return sum(len(chunk.encode('utf-8')) for chunk in _size_encoder.iterencode(obj))
+    if orjson:
+        return len(orjson.dumps(obj, default=str))
+    return len(_size_encoder.encode(obj).encode('utf-8'))
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by dumps()/loads(); responses are bytes"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson and not kwargs:
+            return orjson.dumps(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
@@ -0,0 +1,24 @@
+#!/bin/bash
+
+# Start the PPTX parser backend under gunicorn (see gunicorn.conf.py)
+echo "🚀 Starting PPTX Parser Backend (production)..."
+
+# Check if virtual environment exists
+if [ ! -d "venv" ]; then
+    echo "📦 Creating virtual environment..."
+    python3 -m venv venv
+fi
+
+# Activate virtual environment
+echo "🔧 Activating virtual environment..."
+source venv/bin/activate
+
+# Install/update dependencies
+echo "📥 Installing dependencies..."
+pip install -r requirements.txt
+
+export PYTHONPATH="${PYTHONPATH}:$(pwd)"
+
+# Workers default to one per core; override with WEB_CONCURRENCY
+echo "🌐 Starting gunicorn on ${PPTX_BIND:-0.0.0.0:5001}..."
+exec gunicorn -c gunicorn.conf.py
@@ -0,0 +1,124 @@
+"""
+Table extraction (graphic frames holding ``a:tbl``)
+
+A table becomes one element with its grid as a compact cell matrix rather
+than an element per cell:
+
+    "columns":    [120, 80, 80]           # column widths in px
+    "rows":       [40, 32, 32]            # row heights in px
+    "cells":      ["Region", "Q1", ...]   # cell text, row-major, len(rows) * len(columns)
+    "merges":     [[0, 1, 1, 2]]          # [row, column, rowSpan, columnSpan] of merged cells
+    "cellStyles": [{...}, {...}]          # distinct cell styles
+    "styleRuns":  [[3, 0], [6, 1]]        # [cell count, cellStyles index], row-major
+
+Cells covered by a merge keep their slot in ``cells`` (usually empty text).
+A cell style holds the cell's solid fill, the style of its first run (see
+rich_text.run_style) and its alignment; each distinct style is stored once and
+runs of cells sharing a style are run-length encoded, so a table of a few
+hundred uniformly formatted cells costs little more than its text. The table
+XML is read in a single pass. Table styles (``tableStyleId``) aren't resolved;
+``header`` and ``banded`` carry the table's first-row and banded-row flags.
+"""
+
+from pptx.oxml.ns import qn
+
+from group_shapes import EMU_PER_PX
+from placeholders import ALIGNMENTS
+from rich_text import run_length, run_style
+from theme_colors import solid_fill
+
+# PowerPoint's default size for table text
+TABLE_TEXT_SIZE = 18
+
+VERTICAL_ALIGNMENTS = {'t': 'top', 'ctr': 'middle', 'b': 'bottom'}
+
+_GRAPHIC, _GRAPHIC_DATA, _TBL = (qn(tag) for tag in ('a:graphic', 'a:graphicData', 'a:tbl'))
+_TBL_PR, _TBL_GRID, _GRID_COL, _TR, _TC, _TC_PR = (qn(tag) for tag in ('a:tblPr', 'a:tblGrid', 'a:gridCol', 'a:tr', 'a:tc', 'a:tcPr'))
+_TX_BODY, _P, _PPR, _R, _BR, _FLD, _T, _RPR = (qn(tag) for tag in ('a:txBody', 'a:p', 'a:pPr', 'a:r', 'a:br', 'a:fld', 'a:t', 'a:rPr'))
+
+
+def table_element(shape):
+    """The a:tbl of a graphic frame, or None if it holds something else"""
+    graphic = shape._element.find(_GRAPHIC)
+    data = graphic.find(_GRAPHIC_DATA) if graphic is not None else None
+    return data.find(_TBL) if data is not None else None
+
+
+def _cell_text(tx_body):
+    """(text, first a:rPr, first a:pPr) of a cell's text body"""
+    paragraphs = []
+    first_r_pr = first_p_pr = None
+    for paragraph in tx_body.iterchildren(_P) if tx_body is not None else ():
+        if first_p_pr is None:
+            first_p_pr = paragraph.find(_PPR)
+        text = []
+        for child in paragraph:
+            if child.tag == _R or child.tag == _FLD:
+                text.append(child.findtext(_T) or '')
+                if first_r_pr is None:
+                    first_r_pr = child.find(_RPR)
+            elif child.tag == _BR:
+                text.append('\v')
+        paragraphs.append(''.join(text))
+    return '\n'.join(paragraphs), first_r_pr, first_p_pr
+
+
+def _cell_style(tc, r_pr, p_pr, theme, master):
+    tc_pr = tc.find(_TC_PR)
+    style = run_style(r_pr, {'size': TABLE_TEXT_SIZE}, theme, master)
+    fill = theme.resolve(solid_fill(tc_pr), master)
+    if fill:
+        style['fill'] = fill
+    align = ALIGNMENTS.get(p_pr.get('algn')) if p_pr is not None else None
+    if align:
+        style['textAlign'] = align
+    anchor = tc_pr.get('anchor') if tc_pr is not None else None
+    if anchor in VERTICAL_ALIGNMENTS:
+        style['verticalAlign'] = VERTICAL_ALIGNMENTS[anchor]
+    return style
+
+
+def table_fields(tbl, transform, theme, master):
+    """Element fields for a table; transform is the frame's (see group_shapes.flatten)"""
+    scale_x, scale_y = transform[0], transform[1]
+    columns = []
+    rows = []
+    cells = []
+    merges = []
+    styles = {}         # style (as a sorted tuple) -> cellStyles index
+    cell_styles = []
+    cell_style_index = []
+    header = banded = False
+
+    for child in tbl:
+        if child.tag == _TBL_PR:
+            header = child.get('firstRow') in ('1', 'true')
+            banded = child.get('bandRow') in ('1', 'true')
+        elif child.tag == _TBL_GRID:
+            columns = [int(int(col.get('w', 0)) * scale_x / EMU_PER_PX) for col in child.iterchildren(_GRID_COL)]
+        elif child.tag == _TR:
+            row = len(rows)
+            rows.append(int(int(child.get('h', 0)) * scale_y / EMU_PER_PX))
+            for column, tc in enumerate(child.iterchildren(_TC)):
+                text, r_pr, p_pr = _cell_text(tc.find(_TX_BODY))
+                cells.append(text)
+                row_span, column_span = int(tc.get('rowSpan', 1)), int(tc.get('gridSpan', 1))
+                if row_span > 1 or column_span > 1:
+                    merges.append([row, column, row_span, column_span])
+
+                key = tuple(sorted(_cell_style(tc, r_pr, p_pr, theme, master).items()))
+                if key not in styles:
+                    styles[key] = len(cell_styles)
+                    cell_styles.append(dict(key))
+                cell_style_index.append(styles[key])
+
+    return {
+        "columns": columns,
+        "rows": rows,
+        "cells": cells,
+        "merges": merges,
+        "cellStyles": cell_styles,
+        "styleRuns": run_length(cell_style_index),
+        "header": header,
+        "banded": banded,
+    }
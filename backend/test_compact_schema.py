@@ -0,0 +1,62 @@
+"""Tests for compact_schema: compact() and expand() are exact inverses"""
+
+import copy
+import os
+
+import pytest
+
+import compact_schema
+from app import parse_pptx_to_json
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DECKS = ['test_presentation.pptx', 'test_presentation_with_image.pptx', 'advanced_test_presentation.pptx']
+
+
+def text(**style):
+    element = {'id': 'text-256-2-00000000', 'type': 'text', 'x': 10, 'y': 20, 'width': 200, 'height': 60,
+               'content': 'Hello', 'fontSize': 24, 'fontFamily': 'Inter', 'fontWeight': '600',
+               'color': '#000000', 'textAlign': 'left', 'rotation': 0, 'zIndex': 1, 'selected': False}
+    element.update(style)
+    return element
+
+
+def result(*slides):
+    return {'title': 'Deck', 'slides': [{'id': f'slide-{n + 1}', 'title': f'Slide {n + 1}', 'content': '',
+                                         'background': '#ffffff', 'elements': elements}
+                                        for n, elements in enumerate(slides)],
+            'metadata': {'total_slides': len(slides)}}
+
+
+def test_defaults_are_omitted():
+    compacted = compact_schema.compact(result([text()]))
+    assert compacted['schema'] == compact_schema.SCHEMA
+    assert compacted['styles'] == []
+    assert compacted['slides'] == [{'elements': [{'id': 'text-256-2-00000000', 'type': 'text', 'x': 10, 'y': 20,
+                                                  'width': 200, 'height': 60, 'content': 'Hello'}]}]
+
+
+def test_styles_are_shared():
+    bold_red = {'fontWeight': 'bold', 'color': '#ff0000'}
+    original = result([text(**bold_red), text(fontSize=40)], [text(**bold_red)])
+    compacted = compact_schema.compact(original)
+    assert compacted['styles'] == [bold_red, {'fontSize': 40}]
+    assert [element['style'] for slide in compacted['slides'] for element in slide['elements']] == [0, 1, 0]
+
+
+def test_round_trip_keeps_custom_slide_fields():
+    original = result([text(rotation=15, zIndex=3)], [])
+    original['slides'][1].update(id='intro', title='Intro', background='#112233', backgroundImage='a.jpg')
+    snapshot = copy.deepcopy(original)
+    assert compact_schema.expand(compact_schema.compact(original)) == original
+    assert original == snapshot
+
+
+def test_full_results_pass_through_expand():
+    original = result([text()])
+    assert compact_schema.expand(original) is original
+
+
+@pytest.mark.parametrize('deck', DECKS)
+def test_parser_output_round_trip(deck):
+    parsed = parse_pptx_to_json(os.path.join(REPO_ROOT, deck))
+    assert compact_schema.expand(compact_schema.compact(parsed)) == parsed
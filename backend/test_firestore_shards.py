@@ -0,0 +1,39 @@
+"""Tests for firestore_shards: document budgets and the unshard() round trip"""
+
+import base64
+
+import pytest
+
+import serializer
+from firestore_shards import SHARD_MAX_BYTES, ShardTooLarge, shard, unshard
+
+PNG = 'data:image/png;base64,' + base64.b64encode(b'\x89PNG' + bytes(range(256)) * 16).decode()
+
+
+def text(slide_num, shape_id, content='Hello'):
+    return {'id': f'text-{256 + slide_num}-{shape_id}-00000000', 'type': 'text', 'content': content}
+
+
+def deck(slides):
+    return {'title': 'Deck', 'slides': [{'id': f'slide-{n + 1}', 'background': '#ffffff', 'elements': elements}
+                                        for n, elements in enumerate(slides)]}
+
+
+def test_round_trip_with_split_slides_and_media():
+    result = deck([[text(0, shape_id, 'x' * 300) for shape_id in range(20)] + [{'type': 'image', 'src': PNG}]])
+    sharded = shard(result, max_bytes=4096)
+    assert len(sharded['slides']) > 1 and len(sharded['media']) > 1
+    assert all(serializer.size(doc) <= 4096 for doc in sharded['slides'] + sharded['media'])
+    assert unshard(sharded) == result
+
+
+def test_oversized_element_is_rejected():
+    with pytest.raises(ShardTooLarge):
+        shard(deck([[text(0, 2, 'x' * 8192)]]), max_bytes=4096)
+
+
+def test_oversized_manifest_is_rejected():
+    # 400 slides of 100 small elements: every slide fits, their IDs don't fit one manifest
+    result = deck([[text(slide_num, shape_id) for shape_id in range(100)] for slide_num in range(400)])
+    with pytest.raises(ShardTooLarge, match='Manifest'):
+        shard(result, max_bytes=SHARD_MAX_BYTES)
@@ -0,0 +1,81 @@
+"""Tests for group_shapes: flatten() and place() with composed group transforms"""
+
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE
+from pptx.oxml.ns import qn
+from pptx.util import Emu
+
+from group_shapes import EMU_PER_PX, IDENTITY, flatten, place
+
+
+def px(value):
+    return Emu(int(value * EMU_PER_PX))
+
+
+def set_group_xfrm(group, off, ext, ch_off, ch_ext):
+    """Give group an explicit off/ext <- chOff/chExt mapping, all in px"""
+    xfrm = group._element.grpSpPr.find(qn('a:xfrm'))
+    for tag, (x_name, y_name), values in (('a:off', ('x', 'y'), off), ('a:ext', ('cx', 'cy'), ext),
+                                          ('a:chOff', ('x', 'y'), ch_off), ('a:chExt', ('cx', 'cy'), ch_ext)):
+        element = xfrm.find(qn(tag))
+        element.set(x_name, str(px(values[0])))
+        element.set(y_name, str(px(values[1])))
+
+
+def blank_slide():
+    prs = Presentation()
+    return prs.slides.add_slide(prs.slide_layouts[6])
+
+
+def rectangle(shapes, x, y, width, height):
+    return shapes.add_shape(MSO_SHAPE.RECTANGLE, px(x), px(y), px(width), px(height))
+
+
+def test_ungrouped_shapes_keep_their_position():
+    slide = blank_slide()
+    shape = rectangle(slide.shapes, 10, 20, 30, 40)
+    assert flatten(slide.shapes) == [(shape, IDENTITY)]
+    assert place(shape, IDENTITY) == (10, 20, 30, 40)
+
+
+def test_group_scales_and_offsets_children():
+    slide = blank_slide()
+    group = slide.shapes.add_group_shape()
+    child = rectangle(group.shapes, 100, 100, 50, 25)
+    # Child space (100, 100)-(200, 150) drawn at (300, 50), twice as large
+    set_group_xfrm(group, off=(300, 50), ext=(200, 100), ch_off=(100, 100), ch_ext=(100, 50))
+    [(shape, transform)] = flatten(slide.shapes)
+    assert shape == child
+    assert place(shape, transform) == (300, 50, 100, 50)
+
+
+def test_nested_groups_compose():
+    slide = blank_slide()
+    outer = slide.shapes.add_group_shape()
+    inner = outer.shapes.add_group_shape()
+    child = rectangle(inner.shapes, 0, 0, 10, 10)
+    set_group_xfrm(inner, off=(10, 10), ext=(20, 20), ch_off=(0, 0), ch_ext=(10, 10))
+    set_group_xfrm(outer, off=(100, 200), ext=(90, 90), ch_off=(10, 10), ch_ext=(30, 30))
+    [(shape, transform)] = flatten(slide.shapes)
+    assert shape == child
+    # inner puts the child at (10, 10) 20x20; outer maps (10, 10) to (100, 200) and triples it
+    assert place(shape, transform) == (100, 200, 60, 60)
+
+
+def test_z_order_and_deep_nesting():
+    slide = blank_slide()
+    first = rectangle(slide.shapes, 0, 0, 10, 10)
+    shapes = slide.shapes
+    for _ in range(200):
+        shapes = shapes.add_group_shape().shapes
+    deepest = rectangle(shapes, 5, 5, 10, 10)
+    last = rectangle(slide.shapes, 20, 20, 10, 10)
+    assert [shape for shape, _ in flatten(slide.shapes)] == [first, deepest, last]
+
+
+def test_geometry_override_and_defaults():
+    slide = blank_slide()
+    shape = rectangle(slide.shapes, 10, 20, 30, 40)
+    transform = (2.0, 2.0, px(5), px(5))
+    assert place(shape, transform, geometry=(px(1), px(2), px(3), px(4))) == (7, 9, 6, 8)
+    assert place(shape, IDENTITY, default=(1, 2, 3, 4), geometry=(None, None, px(3), None)) == (1, 2, 3, 4)
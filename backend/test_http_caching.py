@@ -0,0 +1,31 @@
+"""Tests for http_caching: parse result ETags and If-None-Match on POST"""
+
+import os
+
+import pytest
+
+from app import create_app
+
+DECK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_presentation.pptx')
+
+
+@pytest.fixture
+def client():
+    return create_app({'TESTING': True}).test_client()
+
+
+def post_deck(client, **headers):
+    with open(DECK, 'rb') as f:
+        return client.post('/api/parse-pptx', data={'file': (f, 'deck.pptx')}, headers=headers)
+
+
+def test_matching_etag_is_a_failed_precondition(client):
+    first = post_deck(client)
+    assert first.status_code == 200 and first.headers['ETag']
+    repeat = post_deck(client, **{'If-None-Match': first.headers['ETag']})
+    assert repeat.status_code == 412
+    assert repeat.headers['ETag'] == first.headers['ETag'] and not repeat.data
+
+
+def test_other_etag_is_parsed(client):
+    assert post_deck(client, **{'If-None-Match': '"stale"'}).status_code == 200
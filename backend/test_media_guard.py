@@ -0,0 +1,39 @@
+"""Tests for media_guard: MediaGuard.admit() pixel limits and its per-deck verdict cache"""
+
+from io import BytesIO
+
+from PIL import Image
+
+from media_guard import MediaGuard
+
+
+def encode(format, size=(100, 100)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, format)
+    return buffer.getvalue()
+
+
+def test_each_image_is_charged_once():
+    guard = MediaGuard()
+    png = encode('PNG')
+    assert guard.admit('a.png', png).accepted and guard.admit('b.png', png).accepted
+    assert guard.deck_pixels == 100 * 100
+
+
+def test_tighter_limit_applies_after_an_unrestricted_admit():
+    guard = MediaGuard()
+    png = encode('PNG')
+    assert guard.admit_inline(png, 'inline image')
+    verdict = guard.admit('background.png', png, max_pixels=5000)
+    assert not verdict.accepted
+    assert guard.rejected[-1]['name'] == 'background.png'
+    assert guard.admit('picture.png', png).accepted
+
+
+def test_tighter_limit_downscales_a_jpeg_already_admitted():
+    guard = MediaGuard()
+    jpeg = encode('JPEG')
+    assert guard.admit('a.jpg', jpeg).max_pixels is None
+    assert guard.admit('b.jpg', jpeg, max_pixels=2500).max_pixels == 2500
+    assert not guard.admit('c.jpg', jpeg, max_pixels=2500, allow_downscale=False).accepted
+    assert guard.deck_pixels == 100 * 100
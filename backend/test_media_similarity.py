@@ -0,0 +1,94 @@
+"""Tests for media_similarity: near-duplicate lookup in PerceptualIndex"""
+
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+import media_similarity
+from media_similarity import PerceptualIndex, hamming, image_hashes
+
+COLOURS = {'blue': (30, 90, 220), 'red': (220, 40, 40), 'green': (40, 170, 60), 'orange': (245, 140, 20)}
+
+
+def encode(image, format='PNG', **options):
+    buffer = BytesIO()
+    image.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+def icon(colour, size=256):
+    image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((size * 0.08, size * 0.08, size * 0.92, size * 0.92), fill=colour)
+    draw.rectangle((size * 0.4, size * 0.25, size * 0.6, size * 0.75), fill='white')
+    return image.filter(ImageFilter.GaussianBlur(size / 64))
+
+
+def photo(width=400, height=300):
+    gradient = Image.linear_gradient('L')
+    image = Image.merge('RGB', (gradient.resize((width, height)), Image.radial_gradient('L').resize((width, height)),
+                                gradient.rotate(90).resize((width, height))))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((width * 0.25, height * 0.3, width * 0.75, height * 0.7), fill=(240, 200, 40))
+    draw.rectangle((width * 0.1, height * 0.1, width * 0.3, height * 0.5), fill=(30, 60, 160))
+    return image.filter(ImageFilter.GaussianBlur(width / 100))
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'pure-python'])
+def index(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(media_similarity, 'np', None)
+    elif media_similarity.np is None:
+        pytest.skip('NumPy is not installed')
+    return PerceptualIndex()
+
+
+def test_resized_copy_reuses_larger_rendition(index):
+    original = encode(photo(), 'JPEG', quality=90)
+    assert index.canonical('original.jpg', original) == 'original.jpg'
+    copy = encode(photo().resize((200, 150)), 'JPEG', quality=60)
+    assert index.canonical('copy.jpg', copy) == 'original.jpg'
+
+
+def test_smaller_rendition_is_not_reused(index):
+    index.canonical('small.jpg', encode(photo().resize((200, 150)), 'JPEG', quality=90))
+    assert index.canonical('large.jpg', encode(photo(), 'JPEG', quality=90)) == 'large.jpg'
+
+
+def test_colour_variants_are_not_near_duplicates(index):
+    blue = image_hashes(encode(icon(COLOURS['blue'])))
+    for name in ('red', 'green'):
+        # Same shape, so close enough on dHash and pHash to match on brightness alone
+        dhash, phash, *_ = image_hashes(encode(icon(COLOURS[name])))
+        assert hamming(dhash, blue[0]) <= index.distance and hamming(phash, blue[1]) <= index.distance
+
+    keys = {name: index.canonical(f'{name}.png', encode(icon(colour))) for name, colour in COLOURS.items()}
+    assert keys == {name: f'{name}.png' for name in COLOURS}
+    resized = encode(icon(COLOURS['red']).resize((128, 128)))
+    assert index.canonical('red-small.png', resized) == 'red.png'
+
+
+def test_different_type_is_not_reused(index):
+    index.canonical('photo.png', encode(photo()))
+    assert index.canonical('photo.jpg', encode(photo(), 'JPEG', quality=95)) == 'photo.jpg'
+
+
+def test_index_file_round_trip(tmp_path):
+    path = str(tmp_path / 'index.jsonl')
+    writer = PerceptualIndex(path)
+    writer.canonical('blue.png', encode(icon(COLOURS['blue'])))
+    writer.save()
+
+    reader = PerceptualIndex(path)
+    assert reader.canonical('blue-copy.png', encode(icon(COLOURS['blue']).resize((200, 200)))) == 'blue.png'
+    assert reader.canonical('red.png', encode(icon(COLOURS['red']))) == 'red.png'
+
+
+def test_entries_without_colours_never_match(tmp_path):
+    path = tmp_path / 'index.jsonl'
+    dhash, phash, width, height, _ = image_hashes(encode(icon(COLOURS['blue'])))
+    path.write_text(f'{{"key":"old.png","dhash":"{dhash:016x}","phash":"{phash:016x}",'
+                    f'"width":{width},"height":{height}}}\n')
+    index = PerceptualIndex(str(path))
+    assert index.canonical('blue.png', encode(icon(COLOURS['blue']))) == 'blue.png'
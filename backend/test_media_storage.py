@@ -0,0 +1,83 @@
+"""Tests for media_storage: S3Store against LocalS3Client, FilesystemStore and offload_media"""
+
+import base64
+
+import pytest
+
+from media_storage import (IMMUTABLE_CACHE_CONTROL, FilesystemStore, LocalS3Client, S3Store, media_filename,
+                           offload_media)
+
+PNG = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+def data_url(data, mime='image/png'):
+    return f'data:{mime};base64,' + base64.b64encode(data).decode()
+
+
+def deck(*sources):
+    return {'slides': [{'elements': [{'type': 'image', 'src': src} for src in sources]}]}
+
+
+@pytest.fixture
+def s3():
+    return S3Store('bucket', prefix='media/', base_url='https://cdn.example/', client=LocalS3Client())
+
+
+def test_s3_store_put_and_exists(s3):
+    assert not s3.exists('a.png')
+    s3.put('a.png', PNG, 'image/png')
+    assert s3.exists('a.png')
+    data, metadata = s3.client.objects[('bucket', 'media/a.png')]
+    assert data == PNG
+    assert metadata == {'ContentType': 'image/png', 'CacheControl': IMMUTABLE_CACHE_CONTROL}
+    assert s3.url('a.png') == 'https://cdn.example/media/a.png'
+
+
+def test_s3_store_base_url_defaults():
+    client = LocalS3Client()
+    assert S3Store('b', region='eu-west-1', client=client).base_url == 'https://b.s3.eu-west-1.amazonaws.com/'
+    assert S3Store('b', endpoint_url='http://minio:9000/', client=client).base_url == 'http://minio:9000/b/'
+
+
+def test_s3_store_reraises_other_errors():
+    class Denied(Exception):
+        response = {'Error': {'Code': '403'}}
+
+    class DeniedClient(LocalS3Client):
+        def head_object(self, Bucket, Key):
+            raise Denied()
+
+    with pytest.raises(Denied):
+        S3Store('b', client=DeniedClient()).exists('a.png')
+
+
+def test_put_missing_skips_present_keys(s3):
+    s3.put('a.png', PNG, 'image/png')
+    written = s3.put_missing([('a.png', PNG, 'image/png'), ('b.png', PNG, 'image/png')])
+    assert written == ['b.png']
+
+
+def test_offload_media_stores_each_image_once(s3):
+    other = PNG + b'\0'
+    result = deck(data_url(PNG), data_url(PNG), data_url(other), 'https://elsewhere/x.png')
+    stats = offload_media(result, s3)
+
+    key = media_filename(PNG, 'image/png')
+    sources = [element['src'] for element in result['slides'][0]['elements']]
+    assert sources[:2] == [s3.url(key)] * 2
+    assert sources[2] == s3.url(media_filename(other, 'image/png'))
+    assert sources[3] == 'https://elsewhere/x.png'
+    assert stats['media'] == 2 and stats['uploaded'] == 2 and stats['skipped'] == 0
+
+    again = offload_media(deck(data_url(PNG)), s3)
+    assert again['uploaded'] == 0 and again['skipped'] == 1 and again['bytes_uploaded'] == 0
+
+
+def test_filesystem_store(tmp_path):
+    store = FilesystemStore(root=str(tmp_path), base_url='/media/')
+    result = deck(data_url(PNG))
+    offload_media(result, store)
+    key = media_filename(PNG, 'image/png')
+    assert (tmp_path / key).read_bytes() == PNG
+    assert result['slides'][0]['elements'][0]['src'] == '/media/' + key
+    assert store.exists(key)
@@ -0,0 +1,151 @@
+"""Tests for parse_diff and element IDs"""
+
+import os
+import re
+import zipfile
+from collections import Counter
+from io import BytesIO
+
+from PIL import Image
+from pptx import Presentation
+from pptx.enum.dml import MSO_THEME_COLOR
+from pptx.util import Inches
+
+import firestore_shards
+from app import parse_pptx_to_json
+from binary_transport import binary_media
+from compact_schema import compact
+from element_ids import element_key
+from parse_diff import diff
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def element(element_id, **fields):
+    return dict({'id': element_id, 'type': element_id.split('-')[0]}, **fields)
+
+
+def result(*slides, **fields):
+    return dict({'slides': [{'id': f'slide-{n + 1}', 'background': '#ffffff', 'elements': list(elements)}
+                            for n, elements in enumerate(slides)]}, **fields)
+
+
+def test_identical_results_are_unchanged():
+    parse = result([element('text-256-2-aaaa0000'), element('image-256-3-bbbb0000')])
+    patch = diff(parse, parse)
+    assert patch['unchanged'] == 2
+    assert patch['added'] == patch['removed'] == patch['changed'] == patch['order'] == []
+
+
+def test_added_removed_and_changed_elements():
+    previous = result([element('text-256-2-aaaa0000'), element('image-256-3-bbbb0000')])
+    current = result([element('text-256-2-cccc0000', content='New'), element('rectangle-256-4-dddd0000')])
+    patch = diff(previous, current)
+    assert patch['changed'] == [{'slide': 0, 'previous': 'text-256-2-aaaa0000', 'element': current['slides'][0]['elements'][0]}]
+    assert patch['added'] == [{'slide': 0, 'element': current['slides'][0]['elements'][1]}]
+    assert patch['removed'] == [{'slide': 0, 'id': 'image-256-3-bbbb0000'}]
+    assert patch['order'] == [{'slide': 0, 'ids': ['text-256-2-cccc0000', 'rectangle-256-4-dddd0000']}]
+
+
+def test_moved_slide_and_slide_properties():
+    text = element('text-257-2-aaaa0000')
+    previous = result([], [text])
+    current = result([text], [])
+    current['slides'][1]['background'] = '#112233'
+    patch = diff(previous, current)
+    assert patch['changed'] == [{'slide': 0, 'previous': text['id'], 'element': text, 'previous_slide': 1}]
+    assert patch['slides']['changed'] == [{'slide': 1, 'background': '#112233'}]
+
+
+def test_appended_slides_carry_their_properties():
+    current = result([], [element('text-257-2-aaaa0000')])
+    current['slides'][1].update(title='Summary', background='#112233', backgroundImage='abc.jpg')
+    patch = diff(result([]), current)
+    assert patch['slides']['changed'] == [{'slide': 1, 'id': 'slide-2', 'title': 'Summary',
+                                           'background': '#112233', 'backgroundImage': 'abc.jpg'}]
+    assert patch['added'] == [{'slide': 1, 'element': current['slides'][1]['elements'][0]}]
+
+
+def test_previous_can_be_compact_or_sharded():
+    previous = result([element('text-256-2-aaaa0000', content='Hi', x=1, y=2, width=3, height=4)],
+                      title='Deck', metadata={'total_slides': 1})
+    current = result([element('text-256-2-aaaa0000', content='Hi', x=1, y=2, width=3, height=4)])
+    for form in (compact(previous), firestore_shards.shard(previous)):
+        assert diff(form, current)['unchanged'] == 1
+
+
+def test_new_backgrounds_are_listed():
+    background = {'id': 'abc.jpg', 'src': 'data:image/jpeg;base64,', 'width': 960, 'height': 540}
+    patch = diff(result([]), result([], backgrounds=[background]))
+    assert patch['backgrounds'] == [background]
+
+
+def _png():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 48), (200, 30, 30)).save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def _deck(path):
+    """A theme-coloured text box and a picture on one slide"""
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    run = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(3), Inches(1)).text_frame.paragraphs[0].add_run()
+    run.text = 'Accent'
+    run.font.color.theme_color = MSO_THEME_COLOR.ACCENT_1
+    slide.shapes.add_picture(_png(), Inches(5), Inches(1))
+    prs.save(path)
+
+
+def test_theme_edit_changes_ids(tmp_path):
+    original, edited = tmp_path / 'original.pptx', tmp_path / 'edited.pptx'
+    _deck(original)
+    with zipfile.ZipFile(original) as source, zipfile.ZipFile(edited, 'w') as target:
+        for info in source.infolist():
+            data = source.read(info.filename)
+            if info.filename.startswith('ppt/theme/'):
+                data = re.sub(rb'(<a:accent1>\s*<a:srgbClr val=")[0-9A-Fa-f]{6}', rb'\g<1>FF00AA', data)
+            target.writestr(info, data)
+
+    before, after = parse_pptx_to_json(str(original)), parse_pptx_to_json(str(edited))
+    assert diff(before, parse_pptx_to_json(str(original)))['changed'] == []
+    patch = diff(before, after)
+    assert [change['element']['color'] for change in patch['changed']] == ['#ff00aa']
+
+
+def test_ids_are_unique(tmp_path):
+    path = tmp_path / 'deck.pptx'
+    _deck(path)
+    ids = [element['id'] for slide in parse_pptx_to_json(str(path))['slides'] for element in slide['elements']]
+    assert not [element_id for element_id, count in Counter(ids).items() if count > 1]
+    assert len({element_key(element_id) for element_id in ids}) == len(ids)
+
+
+def _image_ids(parsed):
+    return [[element['id'] for element in slide['elements'] if element['type'] == 'image']
+            for slide in parsed['slides']]
+
+
+def test_json_and_binary_parses_agree_on_ids():
+    path = os.path.join(REPO_ROOT, 'test_presentation_with_image.pptx')
+    parsed = parse_pptx_to_json(path)
+    with binary_media():
+        binary = parse_pptx_to_json(path)
+    assert any(_image_ids(parsed))
+    assert _image_ids(binary) == _image_ids(parsed)
+
+
+def test_moving_a_slide_keeps_image_ids(tmp_path):
+    original, moved = tmp_path / 'original.pptx', tmp_path / 'moved.pptx'
+    prs = Presentation()
+    prs.slides.add_slide(prs.slide_layouts[6])
+    prs.slides.add_slide(prs.slide_layouts[6]).shapes.add_picture(_png(), Inches(1), Inches(1))
+    prs.save(original)
+    slide_ids = prs.slides._sldIdLst
+    slide_ids.insert(0, slide_ids[1])
+    prs.save(moved)
+
+    before, after = _image_ids(parse_pptx_to_json(str(original))), _image_ids(parse_pptx_to_json(str(moved)))
+    assert before[1] and after[0] == before[1]
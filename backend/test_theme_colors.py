@@ -0,0 +1,68 @@
+"""Tests for theme_colors: DrawingML colour transforms and theme resolution"""
+
+import pytest
+from pptx import Presentation
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls
+
+from theme_colors import ThemeResolver, apply_transforms, css_color, solid_fill
+
+LUM_MOD, LUM_OFF, TINT, SHADE, ALPHA = (
+    '{http://schemas.openxmlformats.org/drawingml/2006/main}' + tag
+    for tag in ('lumMod', 'lumOff', 'tint', 'shade', 'alpha'))
+
+ACCENT = (0x44, 0x72, 0xC4)
+
+
+@pytest.mark.parametrize('transforms, expected', [
+    # The "Darker 25%", "Lighter 80%" and "Lighter 40%" swatches PowerPoint offers for 4472C4
+    ([(LUM_MOD, 75000)], '#2f5597'),
+    ([(LUM_MOD, 20000), (LUM_OFF, 80000)], '#dae3f3'),
+    ([(LUM_MOD, 60000), (LUM_OFF, 40000)], '#8faadc'),
+    ([], '#4472c4'),
+])
+def test_luminance_transforms(transforms, expected):
+    assert css_color(*apply_transforms(ACCENT, transforms)) == expected
+
+
+def test_tint_shade_and_alpha():
+    assert apply_transforms((200, 100, 50), [(TINT, 50000)]) == (227, 178, 152, 1.0)
+    assert apply_transforms((200, 100, 50), [(SHADE, 50000), (ALPHA, 25000)]) == (100, 50, 25, 0.25)
+    assert css_color(*apply_transforms((200, 100, 50), [(ALPHA, 50000)])) == 'rgba(200, 100, 50, 0.5)'
+
+
+def test_luminance_is_clamped():
+    assert apply_transforms((255, 255, 255), [(LUM_OFF, 50000)])[:3] == (255, 255, 255)
+    assert apply_transforms((10, 10, 10), [(LUM_OFF, -50000)])[:3] == (0, 0, 0)
+
+
+def color(xml):
+    return solid_fill(parse_xml(f'<a:spPr {nsdecls("a")}><a:solidFill>{xml}</a:solidFill></a:spPr>'))
+
+
+@pytest.fixture
+def master():
+    return Presentation().slide_masters[0]
+
+
+def test_scheme_colours_go_through_the_colour_map(master):
+    theme = ThemeResolver()
+    # Default template: tx1 -> dk1 (windowText, 000000), accent1 4F81BD
+    assert theme.resolve(color('<a:schemeClr val="tx1"/>'), master) == '#000000'
+    assert theme.resolve(color('<a:schemeClr val="accent1"><a:lumMod val="75000"/></a:schemeClr>'),
+                         master) == css_color(*apply_transforms((0x4F, 0x81, 0xBD), [(LUM_MOD, 75000)]))
+    assert theme.resolve(color('<a:schemeClr val="unknown"/>'), master) is None
+
+
+def test_literal_colours(master):
+    theme = ThemeResolver()
+    assert theme.resolve(color('<a:srgbClr val="FF8800"/>'), master) == '#ff8800'
+    assert theme.resolve(color('<a:prstClr val="red"/>'), master) == '#ff0000'
+    assert theme.resolve(color('<a:scrgbClr r="100000" g="0" b="50000"/>'), master) == '#ff0080'
+    assert theme.resolve(None, master) is None
+
+
+def test_theme_fonts(master):
+    theme = ThemeResolver()
+    assert theme.font('+mj-lt', master) == 'Calibri'
+    assert theme.font('Georgia', master) == 'Georgia'
@@ -0,0 +1,44 @@
+"""Tests for thumbnails: thumbnail sizes and /api/slide-thumbnail validation"""
+
+import pytest
+
+import app
+from app import create_app
+from media_storage import FilesystemStore
+from thumbnails import MAX_THUMBNAIL_HEIGHT, ThumbnailRenderer
+
+
+@pytest.fixture
+def client():
+    return create_app({'TESTING': True}).test_client()
+
+
+def test_renderer_keeps_the_aspect_ratio():
+    renderer = ThumbnailRenderer((960, 540), width=320)
+    assert (renderer.width, renderer.height) == (320, 180)
+
+
+def test_tall_slides_fit_the_height():
+    renderer = ThumbnailRenderer((1, 500), width=1920)
+    assert (renderer.width, renderer.height) == (3, 1500)
+    renderer = ThumbnailRenderer((1, 5000), width=320)
+    assert (renderer.width, renderer.height) == (1, MAX_THUMBNAIL_HEIGHT)
+
+
+@pytest.mark.parametrize('sizes', [
+    {'slide_width': 1, 'slide_height': 500, 'width': 1920},
+    {'slide_width': -960, 'slide_height': 540},
+    {'width': 'wide'},
+])
+def test_oversized_or_invalid_sizes_are_rejected(client, sizes):
+    response = client.post('/api/slide-thumbnail', json=dict({'slide': {'elements': []}}, **sizes))
+    assert response.status_code == 400
+
+
+def test_known_thumbnail_is_a_failed_precondition(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'get_media_store', lambda: FilesystemStore(str(tmp_path)))
+    body = {'slide': {'background': '#112233', 'elements': []}}
+    first = client.post('/api/slide-thumbnail', json=body)
+    assert first.status_code == 200 and first.headers['ETag']
+    repeat = client.post('/api/slide-thumbnail', json=body, headers={'If-None-Match': first.headers['ETag']})
+    assert repeat.status_code == 412
@@ -0,0 +1,175 @@
+"""
+Theme colour (and font) resolution
+
+Most colours in a deck aren't RGB values but references into the theme:
+``<a:schemeClr val="tx1"><a:lumMod val="75000"/></a:schemeClr>``. To resolve
+one, the master's ``p:clrMap`` maps the name (tx1 -> dk1) to a colour in
+``ppt/theme/themeN.xml``, and then the DrawingML transforms are applied. Each
+theme and each master's colour map are parsed once per presentation. The
+resolved colours are cached by (theme, colour, transforms), so resolving a run
+or a shape's colour is a dict lookup after the first time a combination
+appears:
+
+    theme = ThemeResolver()
+    theme.resolve(color_element, master)          # '#1f3864', 'rgba(...)' or None
+    theme.fill(shape_element, master)             # solid fill of a shape (own or from its style)
+    theme.font('+mj-lt', master)                  # 'Calibri Light'
+
+Supported transforms are lumMod, lumOff, tint, shade and alpha; any other
+transform is ignored. A colour with alpha below 100% comes back as
+``rgba(r, g, b, a)``.
+"""
+
+import colorsys
+
+from lxml import etree
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+
+_SRGB, _SCHEME, _SYS, _SCRGB, _PRESET = (qn(tag) for tag in ('a:srgbClr', 'a:schemeClr', 'a:sysClr', 'a:scrgbClr', 'a:prstClr'))
+_LUM_MOD, _LUM_OFF, _TINT, _SHADE, _ALPHA = (qn(tag) for tag in ('a:lumMod', 'a:lumOff', 'a:tint', 'a:shade', 'a:alpha'))
+_SOLID_FILL, _NO_FILL, _SP_PR, _STYLE, _LN = (qn(tag) for tag in ('a:solidFill', 'a:noFill', 'p:spPr', 'p:style', 'a:ln'))
+_FILLS = tuple(qn(tag) for tag in ('a:noFill', 'a:solidFill', 'a:gradFill', 'a:blipFill', 'a:pattFill', 'a:grpFill'))
+
+TRANSFORMS = (_LUM_MOD, _LUM_OFF, _TINT, _SHADE, _ALPHA)
+
+PRESET_COLORS = {'black': (0, 0, 0), 'white': (255, 255, 255), 'red': (255, 0, 0), 'green': (0, 128, 0),
+                 'blue': (0, 0, 255), 'yellow': (255, 255, 0), 'gray': (128, 128, 128)}
+
+FONT_REFERENCES = {'+mj-lt': 'major', '+mn-lt': 'minor'}
+
+
+def _hex_rgb(value):
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+
+def solid_fill(parent):
+    """Colour element of parent's a:solidFill child, or None"""
+    fill = parent.find(_SOLID_FILL) if parent is not None else None
+    return fill[0] if fill is not None and len(fill) else None
+
+
+def _parse_theme(blob):
+    root = etree.fromstring(blob)
+    colors = {}
+    scheme = root.find(f"{qn('a:themeElements')}/{qn('a:clrScheme')}")
+    for entry in (scheme if scheme is not None else ()):
+        if not len(entry):
+            continue
+        value = entry[0].get('lastClr') if entry[0].tag == _SYS else entry[0].get('val')
+        if value and len(value) == 6:
+            colors[etree.QName(entry).localname] = _hex_rgb(value)
+    fonts = {}
+    font_scheme = root.find(f"{qn('a:themeElements')}/{qn('a:fontScheme')}")
+    for kind in ('major', 'minor'):
+        latin = font_scheme.find(f"{qn(f'a:{kind}Font')}/{qn('a:latin')}") if font_scheme is not None else None
+        if latin is not None and latin.get('typeface'):
+            fonts[kind] = latin.get('typeface')
+    return colors, fonts
+
+
+def apply_transforms(rgb, transforms):
+    """rgb (0-255 ints) with DrawingML transforms applied; returns (r, g, b, alpha)"""
+    red, green, blue = (channel / 255 for channel in rgb)
+    alpha = 1.0
+    for tag, value in transforms:
+        amount = value / 100000
+        if tag == _LUM_MOD or tag == _LUM_OFF:
+            hue, lightness, saturation = colorsys.rgb_to_hls(red, green, blue)
+            lightness = lightness * amount if tag == _LUM_MOD else lightness + amount
+            red, green, blue = colorsys.hls_to_rgb(hue, min(max(lightness, 0.0), 1.0), saturation)
+        elif tag == _TINT:
+            red, green, blue = (1 - (1 - channel) * amount for channel in (red, green, blue))
+        elif tag == _SHADE:
+            red, green, blue = (channel * amount for channel in (red, green, blue))
+        elif tag == _ALPHA:
+            alpha = amount
+    return tuple(min(max(round(channel * 255), 0), 255) for channel in (red, green, blue)) + (alpha,)
+
+
+def css_color(red, green, blue, alpha=1.0):
+    if alpha < 1.0:
+        return f'rgba({red}, {green}, {blue}, {round(alpha, 3)})'
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+class ThemeResolver:
+    """Theme colours and fonts of one presentation, per slide master"""
+
+    def __init__(self):
+        self._themes = {}
+        self._masters = {}
+        self._cache = {}
+
+    def _master(self, master):
+        """(theme key, scheme colours, theme fonts, colour map) of a slide master"""
+        key = master.part.partname
+        if key not in self._masters:
+            try:
+                theme_part = master.part.part_related_by(RT.THEME)
+                theme_key = theme_part.partname
+                if theme_key not in self._themes:
+                    self._themes[theme_key] = _parse_theme(theme_part.blob)
+                colors, fonts = self._themes[theme_key]
+            except (KeyError, etree.XMLSyntaxError):
+                theme_key, colors, fonts = None, {}, {}
+            clr_map = master._element.find(qn('p:clrMap'))
+            self._masters[key] = (theme_key, colors, fonts, dict(clr_map.attrib) if clr_map is not None else {})
+        return self._masters[key]
+
+    def resolve(self, color, master):
+        """CSS colour for a DrawingML colour element (a:srgbClr, a:schemeClr, ...), or None"""
+        if color is None:
+            return None
+        transforms = tuple((child.tag, int(child.get('val', 0))) for child in color if child.tag in TRANSFORMS)
+        tag = color.tag
+        if tag == _SCHEME:
+            theme_key, colors, _, clr_map = self._master(master)
+            name = clr_map.get(color.get('val'), color.get('val'))
+            key = (theme_key, name, transforms)
+            if key not in self._cache:
+                rgb = colors.get(name)
+                self._cache[key] = css_color(*apply_transforms(rgb, transforms)) if rgb else None
+            return self._cache[key]
+
+        if tag == _SRGB:
+            value = color.get('val', '')
+        elif tag == _SYS:
+            value = color.get('lastClr', '')
+        elif tag == _SCRGB:
+            value = ''.join(f"{round(int(color.get(channel, 0)) / 100000 * 255):02x}" for channel in 'rgb')
+        elif tag == _PRESET and color.get('val') in PRESET_COLORS:
+            value = '%02x%02x%02x' % PRESET_COLORS[color.get('val')]
+        else:
+            return None
+        key = (None, value, transforms)
+        if key not in self._cache:
+            self._cache[key] = css_color(*apply_transforms(_hex_rgb(value), transforms)) if len(value) == 6 else None
+        return self._cache[key]
+
+    def font(self, typeface, master):
+        """Typeface with theme references (+mj-lt, +mn-lt) resolved"""
+        if typeface in FONT_REFERENCES:
+            return self._master(master)[2].get(FONT_REFERENCES[typeface])
+        return typeface
+
+    def _styled(self, properties, shape_element, reference, master):
+        """Solid colour set on properties, else the one from the shape style's reference"""
+        if properties is not None:
+            for child in properties:
+                if child.tag in _FILLS:
+                    return self.resolve(solid_fill(properties), master) if child.tag == _SOLID_FILL else None
+        style = shape_element.find(_STYLE)
+        ref = style.find(qn(reference)) if style is not None else None
+        if ref is None or ref.get('idx') == '0' or not len(ref):
+            return None
+        return self.resolve(ref[0], master)
+
+    def fill(self, shape_element, master):
+        """Solid fill colour of a shape, or None (no fill, or a gradient/picture/pattern fill)"""
+        return self._styled(shape_element.find(_SP_PR), shape_element, 'a:fillRef', master)
+
+    def line(self, shape_element, master):
+        """Solid outline colour of a shape, or None"""
+        sp_pr = shape_element.find(_SP_PR)
+        return self._styled(sp_pr.find(_LN) if sp_pr is not None else None, shape_element, 'a:lnRef', master)
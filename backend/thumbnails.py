@@ -0,0 +1,301 @@
+"""
+Slide thumbnails rendered from the editor JSON
+
+ThumbnailRenderer rasterises a parsed slide with PIL: background colour and
+picture, then its elements in order. It draws text (wrapped to the box), shapes
+(rectangles, circles, lines), images, table grids and chart frames. The result
+is a small WebP. It is an approximation for admin pages and the slide sorter;
+the editor remains the reference rendering.
+
+A thumbnail is stored in the media store (see media_storage.py) under a hash of
+the slide's JSON, its background picture and the thumbnail size, so an
+unchanged slide is never rendered twice:
+
+- ``?thumbnails=1`` on /api/parse-pptx renders every slide in a thread pool
+  during the import (PIL releases the GIL while decoding, resizing and
+  encoding) and sets ``"thumbnail": <url>`` on each slide
+- ``POST /api/slide-thumbnail`` renders one slide on first request and
+  redirects to the stored copy after that
+
+    PPTX_THUMBNAIL_WIDTH     thumbnail width in px (default 320)
+    PPTX_THUMBNAIL_QUALITY   WebP quality (default 70)
+    PPTX_THUMBNAIL_WORKERS   render threads per import (default 4)
+"""
+
+import functools
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from binary_transport import RawMedia
+from media_guard import MediaGuard
+from media_storage import FilesystemStore, inline_media
+from parser_logging import get_logger
+import compact_schema
+
+log = get_logger('media')
+
+THUMBNAIL_WIDTH = int(os.environ.get('PPTX_THUMBNAIL_WIDTH', 320))
+THUMBNAIL_QUALITY = int(os.environ.get('PPTX_THUMBNAIL_QUALITY', 70))
+THUMBNAIL_WORKERS = int(os.environ.get('PPTX_THUMBNAIL_WORKERS', 4))
+THUMBNAIL_MIME = 'image/webp'
+# Largest width /api/slide-thumbnail renders, and largest height of any thumbnail
+MAX_THUMBNAIL_WIDTH = 1920
+MAX_THUMBNAIL_HEIGHT = 1920
+
+# Drawn where an image can't be loaded, and as the frame of charts and empty tables
+PLACEHOLDER_FILL = (221, 221, 221)
+GRID_COLOR = (160, 160, 160)
+# Text smaller than this (in thumbnail px) is drawn as bars; average glyph width per px of font size
+GREEK_BELOW_PX = 10
+GREEK_CHAR_WIDTH = 0.5
+
+
+def _canonical(value):
+    """JSON fallback for hashing: raw image bytes by their digest"""
+    if isinstance(value, RawMedia):
+        return 'raw:' + hashlib.blake2b(value.data, digest_size=16).hexdigest()
+    return str(value)
+
+
+def _color(value, default=None):
+    """RGBA tuple for a CSS colour ('#hex', 'rgba(...)', ...), default for none or 'transparent'"""
+    if not value or value == 'transparent':
+        return default
+    try:
+        rgba = ImageColor.getrgb(value)
+    except ValueError:
+        return default
+    return rgba if len(rgba) == 4 else rgba + (255,)
+
+
+@functools.lru_cache(maxsize=64)
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single bitmap size
+        return ImageFont.load_default()
+
+
+def _wrap(text, measure, width):
+    """Lines of text greedily wrapped to width px, measure(line) giving a line's width"""
+    lines = []
+    for paragraph in text.replace('\v', '\n').split('\n'):
+        line = ''
+        for word in paragraph.split(' '):
+            candidate = f'{line} {word}' if line else word
+            if line and measure(candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def thumbnail_height(slide_size, width):
+    """Height in px of a thumbnail width px wide of a slide_size (width, height) slide"""
+    slide_width, slide_height = slide_size
+    return max(1, round(slide_height * width / slide_width))
+
+
+class ThumbnailRenderer:
+    """
+    Renders slides of one presentation; slide_size is the slide size in px
+    (metadata slide_width/slide_height), backgrounds the result's background
+    table, store the media store that external image URLs may point into
+    """
+
+    def __init__(self, slide_size, backgrounds=None, store=None, width=THUMBNAIL_WIDTH):
+        self.slide_width, self.slide_height = slide_size
+        height = thumbnail_height(slide_size, width)
+        if height > MAX_THUMBNAIL_HEIGHT:
+            # Very tall slides: fit the height instead of the width
+            width = max(1, int(MAX_THUMBNAIL_HEIGHT * self.slide_width / self.slide_height))
+            height = min(thumbnail_height(slide_size, width), MAX_THUMBNAIL_HEIGHT)
+        self.width, self.height = width, height
+        self.scale = width / self.slide_width
+        self.backgrounds = {background['id']: background['src'] for background in backgrounds or ()}
+        self.store = store
+        self.guard = MediaGuard()
+        self._decoded = {}
+
+    def key(self, slide):
+        """Media store key of slide's thumbnail: a hash of everything that shapes it"""
+        slide = {key: value for key, value in slide.items() if key != 'thumbnail'}
+        background = self.backgrounds.get(slide.get('backgroundImage'))
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps([slide, background, self.width, self.slide_width, self.slide_height],
+                                 sort_keys=True, separators=(',', ':'), default=_canonical).encode('utf-8'))
+        return f'thumb-{digest.hexdigest()}.webp'
+
+    def _source(self, src):
+        """Image bytes for an element src: inline data, or a file in a filesystem store"""
+        inline = inline_media(src)
+        if inline is not None:
+            return inline[0]
+        if isinstance(self.store, FilesystemStore) and isinstance(src, str) and src.startswith(self.store.base_url):
+            path = os.path.join(self.store.root, os.path.basename(src[len(self.store.base_url):]))
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    return f.read()
+        return None
+
+    def _image(self, src, size):
+        """RGBA image for src scaled to size, None if it can't be loaded; decoded once per size"""
+        cache_key = (src if isinstance(src, str) else id(src), size)
+        if cache_key in self._decoded:
+            return self._decoded[cache_key]
+        image = None
+        data = self._source(src)
+        if data and self.guard.admit('thumbnail source', data).accepted:
+            try:
+                image = Image.open(BytesIO(data))
+                if image.format == 'JPEG':
+                    image.draft('RGB', size)
+                image = image.convert('RGBA').resize(size, Image.Resampling.BILINEAR)
+            except Exception as e:
+                log.debug("Could not decode thumbnail source: %s", e)
+                image = None
+        self._decoded[cache_key] = image
+        return image
+
+    def _box(self, element):
+        x = round(element.get('x', 0) * self.scale)
+        y = round(element.get('y', 0) * self.scale)
+        return x, y, max(1, round(element.get('width', 0) * self.scale)), max(1, round(element.get('height', 0) * self.scale))
+
+    def _text(self, draw, box, text, element):
+        x, y, width, height = box
+        size = max(1, round(element.get('fontSize', 24) * self.scale))
+        color = _color(element.get('color'), (0, 0, 0, 255))
+        align = element.get('textAlign', 'left')
+        line_height = round(size * 1.2) or 1
+        # Text too small to read is drawn as bars ("greeked"), which is also far cheaper
+        greeked = size < GREEK_BELOW_PX
+        if greeked:
+            font = None
+            measure = lambda line: len(line) * size * GREEK_CHAR_WIDTH
+            color = color[:3] + (color[3] * 2 // 3,)
+        else:
+            font = _font(size)
+            measure = lambda line: draw.textlength(line, font=font)
+        for number, line in enumerate(_wrap(text, measure, width)):
+            top = y + number * line_height
+            if top > y + height:
+                break
+            length = min(measure(line), width)
+            left = x
+            if align in ('center', 'right'):
+                left += (width - length) / 2 if align == 'center' else width - length
+            if not greeked:
+                draw.text((left, top), line, fill=color, font=font)
+            elif line.strip():
+                draw.rectangle((left, top + size * 0.3, left + length, top + size * 0.8), fill=color)
+
+    def _table(self, draw, box, element):
+        x, y, width, height = box
+        columns = [round(column * self.scale) for column in element.get('columns', [])]
+        rows = [round(row * self.scale) for row in element.get('rows', [])]
+        if not columns or not rows:
+            draw.rectangle((x, y, x + width, y + height), outline=GRID_COLOR)
+            return
+        styles = element.get('cellStyles', [])
+        cell_styles = [index for count, index in element.get('styleRuns', []) for _ in range(count)]
+        cells = element.get('cells', [])
+        top = y
+        for row, row_height in enumerate(rows):
+            left = x
+            for column, column_width in enumerate(columns):
+                cell = row * len(columns) + column
+                style = styles[cell_styles[cell]] if cell < len(cell_styles) else {}
+                draw.rectangle((left, top, left + column_width, top + row_height),
+                               fill=_color(style.get('fill')), outline=GRID_COLOR)
+                if cell < len(cells) and cells[cell]:
+                    self._text(draw, (left + 1, top, column_width - 2, row_height), cells[cell], style)
+                left += column_width
+            top += row_height
+
+    def render(self, slide):
+        """WebP bytes of slide's thumbnail"""
+        canvas = Image.new('RGB', (self.width, self.height), _color(slide.get('background'), (255, 255, 255, 255))[:3])
+        background = self.backgrounds.get(slide.get('backgroundImage'))
+        if background is not None:
+            image = self._image(background, (self.width, self.height))
+            if image is not None:
+                canvas.paste(image, (0, 0), image)
+        draw = ImageDraw.Draw(canvas, 'RGBA')
+
+        for element in sorted(slide.get('elements', []), key=lambda element: element.get('zIndex', 1)):
+            box = x, y, width, height = self._box(element)
+            kind = element.get('type')
+            if kind == 'text':
+                self._text(draw, box, element.get('content', ''), element)
+            elif kind == 'image':
+                image = self._image(element.get('src'), (width, height))
+                if image is None:
+                    draw.rectangle((x, y, x + width, y + height), fill=PLACEHOLDER_FILL)
+                else:
+                    canvas.paste(image, (x, y), image)
+            elif kind == 'table':
+                self._table(draw, box, element)
+            elif kind == 'chart':
+                draw.rectangle((x, y, x + width, y + height), fill=PLACEHOLDER_FILL + (96,), outline=GRID_COLOR)
+            elif kind == 'line':
+                draw.line((x, y, x + width, y + height), fill=_color(element.get('stroke'), (0, 0, 0, 255)),
+                          width=max(1, round(element.get('strokeWidth', 1) * self.scale)))
+            else:
+                shape = draw.ellipse if kind == 'circle' else draw.rectangle
+                stroke = element.get('strokeWidth', 1)
+                shape((x, y, x + width, y + height), fill=_color(element.get('fill')),
+                      outline=_color(element.get('stroke')) if stroke else None,
+                      width=max(1, round(stroke * self.scale)))
+
+        output = BytesIO()
+        canvas.save(output, format='WEBP', quality=THUMBNAIL_QUALITY, method=4)
+        return output.getvalue()
+
+
+def renderer_for(result, store=None, width=THUMBNAIL_WIDTH):
+    """ThumbnailRenderer for the slides of a (full or compact) parse result"""
+    metadata = result.get('metadata', {})
+    return ThumbnailRenderer((metadata.get('slide_width') or 960, metadata.get('slide_height') or 540),
+                             result.get('backgrounds'), store, width)
+
+
+def attach_thumbnails(result, store, workers=THUMBNAIL_WORKERS, width=THUMBNAIL_WIDTH):
+    """
+    Render the thumbnails of result's slides that store doesn't have yet, in a
+    thread pool, and set each slide's "thumbnail" URL. Returns
+    {'slides', 'rendered', 'cached'}.
+    """
+    slides = compact_schema.expand(result).get('slides', [])
+    if not slides:
+        return {'slides': 0, 'rendered': 0, 'cached': 0}
+    renderer = renderer_for(result, store, width)
+    keys = [renderer.key(slide) for slide in slides]
+
+    def ensure(index):
+        key = keys[index]
+        if store.exists(key):
+            return False
+        store.put(key, renderer.render(slides[index]), THUMBNAIL_MIME)
+        return True
+
+    # Slides with identical content share one thumbnail
+    first = {}
+    for index, key in enumerate(keys):
+        first.setdefault(key, index)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(first)))) as pool:
+        rendered = sum(pool.map(ensure, first.values()))
+
+    for slide, key in zip(result['slides'], keys):
+        slide['thumbnail'] = store.url(key)
+    stats = {'slides': len(slides), 'rendered': rendered, 'cached': len(first) - rendered}
+    log.info("Thumbnails for %d slides (%d rendered, %d cached)", stats['slides'], stats['rendered'],
+             stats['cached'], extra=stats)
+    return stats